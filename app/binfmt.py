@@ -0,0 +1,204 @@
+# app/binfmt.py
+# ------------------------------------------------------------
+# Formato binario columnar para /ingest (gateways de alto volumen).
+#
+# Content-Type: application/vnd.smartnet.readings
+# Todo en little-endian:
+#
+#   offset  tamaño  campo
+#   0       4       magic  = b"SNR1"
+#   4       4       n_rows (uint32)
+#   8       4       n_nodes (uint32)
+#   12      ...     diccionario de nodos: n_nodes × [len (uint8) + node_id UTF-8]
+#   ...     0-7     relleno con ceros hasta múltiplo de 8
+#   ...     32×n    n_rows registros RECORD_DTYPE:
+#                     ts_us      int64   µs desde epoch UTC (TS_NULL = sin ts)
+#                     latency_ms float32
+#                     jitter_ms  float32
+#                     rssi_dbm   float32
+#                     noise_dbm  float32
+#                     node       uint16  índice en el diccionario
+#                     failure    int8    1 / 0 / -1 (= null)
+#                     (5 bytes de relleno)
+#
+# Los registros se leen con np.frombuffer sobre el cuerpo (sin copiar).
+# Las métricas viajan en float32: ~7 cifras significativas, de sobra
+# para latencias/dBm de sensores.
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+CONTENT_TYPE = "application/vnd.smartnet.readings"
+MAGIC = b"SNR1"
+TS_NULL = np.iinfo(np.int64).min
+
+RECORD_DTYPE = np.dtype([
+    ("ts_us", "<i8"),
+    ("latency_ms", "<f4"),
+    ("jitter_ms", "<f4"),
+    ("rssi_dbm", "<f4"),
+    ("noise_dbm", "<f4"),
+    ("node", "<u2"),
+    ("failure", "i1"),
+    ("_pad", "V5"),
+])
+
+_HEADER = struct.Struct("<4sII")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NODE_ID_MAX = 64
+_MAX_NODES = np.iinfo(np.uint16).max + 1        # `node` es uint16
+# ts_us representable como Timestamp de pandas (años 1677-2262)
+_TS_MIN_US = pd.Timestamp.min.value // 1000 + 1
+_TS_MAX_US = pd.Timestamp.max.value // 1000
+
+
+class BinaryFormatError(ValueError):
+    """El cuerpo no respeta el formato (cabecera, diccionario o tamaño)."""
+
+
+def _check_node_count(n: int) -> None:
+    if n > _MAX_NODES:
+        raise BinaryFormatError(f"{n} nodos distintos; el índice uint16 admite {_MAX_NODES} por cuerpo")
+
+
+def _ts_to_us(ts: Any) -> int:
+    if ts is None:
+        return TS_NULL
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - _EPOCH) // timedelta(microseconds=1)
+
+
+def encode(readings: Iterable[Dict[str, Any]]) -> bytes:
+    """
+    Codifica lecturas (dicts como los de /ingest JSON) en el formato binario.
+    `ts` puede ser string ISO-8601, datetime o None.
+    """
+    readings = list(readings)
+    nodes: Dict[str, int] = {}
+    for r in readings:
+        nodes.setdefault(r["node_id"], len(nodes))
+    _check_node_count(len(nodes))
+
+    rec = np.zeros(len(readings), dtype=RECORD_DTYPE)
+    rec["ts_us"] = [_ts_to_us(r.get("ts")) for r in readings]
+    for col in ("latency_ms", "jitter_ms", "rssi_dbm", "noise_dbm"):
+        rec[col] = [r[col] for r in readings]
+    rec["node"] = [nodes[r["node_id"]] for r in readings]
+    rec["failure"] = [-1 if r.get("failure") is None else int(bool(r["failure"])) for r in readings]
+    return encode_records(list(nodes), rec)
+
+
+def encode_records(nodes: List[str], rec: np.ndarray) -> bytes:
+    """
+    Codifica registros ya construidos (RECORD_DTYPE, `node` = índice en `nodes`).
+    Evita pasar por dicts cuando el emisor ya genera columnas (simulador en modo carga).
+    """
+    _check_node_count(len(nodes))
+    head = bytearray(_HEADER.pack(MAGIC, len(rec), len(nodes)))
+    for name in nodes:
+        raw = name.encode("utf-8")
+        if len(raw) > 255:
+            raise BinaryFormatError(f"node_id demasiado largo: {name[:20]!r}...")
+        head += bytes([len(raw)]) + raw
+    head += b"\0" * (-len(head) % 8)
+    return bytes(head) + np.ascontiguousarray(rec, dtype=RECORD_DTYPE).tobytes()
+
+
+def decode(body: bytes) -> Tuple[List[str], np.ndarray]:
+    """
+    Decodifica el cuerpo: devuelve (diccionario de node_ids, registros).
+    Los registros son una vista (np.frombuffer) sobre `body`.
+    """
+    if len(body) < _HEADER.size:
+        raise BinaryFormatError("cabecera incompleta")
+    magic, n_rows, n_nodes = _HEADER.unpack_from(body, 0)
+    if magic != MAGIC:
+        raise BinaryFormatError(f"magic inválido {magic!r}")
+
+    pos = _HEADER.size
+    nodes: List[str] = []
+    for _ in range(n_nodes):
+        if pos >= len(body):
+            raise BinaryFormatError("diccionario de nodos truncado")
+        size = body[pos]
+        raw = body[pos + 1: pos + 1 + size]
+        if len(raw) != size:
+            raise BinaryFormatError("diccionario de nodos truncado")
+        nodes.append(raw.decode("utf-8", errors="strict"))
+        pos += 1 + size
+    pos += -pos % 8
+
+    expected = pos + n_rows * RECORD_DTYPE.itemsize
+    if len(body) != expected:
+        raise BinaryFormatError(f"tamaño {len(body)} != {expected} esperado para {n_rows} registros")
+
+    records = np.frombuffer(body, dtype=RECORD_DTYPE, count=n_rows, offset=pos)
+    return nodes, records
+
+
+def validate_records(nodes: List[str], rec: np.ndarray) -> Tuple[List[dict], List[dict]]:
+    """
+    Aplica las reglas de ReadingIn en bloque y devuelve (rows, errors).
+    - rows: dicts planos para crud.insert_rows.
+    - errors: formato Pydantic con loc ("records", i, campo) / ("nodes", j).
+    """
+    errors: List[dict] = []
+    if len(rec) == 0:
+        errors.append({"type": "too_short", "loc": ("records",), "msg": "List should have at least 1 item after validation, not 0", "input": []})
+    for j, name in enumerate(nodes):
+        if not 1 <= len(name) <= _NODE_ID_MAX:
+            errors.append({"type": "string_length", "loc": ("nodes", j), "msg": f"node_id debe tener entre 1 y {_NODE_ID_MAX} caracteres", "input": name})
+
+    checks = (
+        ("latency_ms", ~(rec["latency_ms"] >= 0), "greater_than_equal", "Input should be greater than or equal to 0"),
+        ("jitter_ms", ~(rec["jitter_ms"] >= 0), "greater_than_equal", "Input should be greater than or equal to 0"),
+        ("node", rec["node"] >= len(nodes), "dict_index", "Índice de nodo fuera del diccionario"),
+        ("failure", ~np.isin(rec["failure"], (-1, 0, 1)), "bool_parsing", "Input should be a valid boolean"),
+    )
+    for field, mask, etype, msg in checks:
+        for i in np.flatnonzero(mask).tolist():
+            errors.append({"type": etype, "loc": ("records", i, field), "msg": msg, "input": rec[field][i].item()})
+    has_ts = rec["ts_us"] != TS_NULL
+    bad_ts = has_ts & ((rec["ts_us"] < _TS_MIN_US) | (rec["ts_us"] > _TS_MAX_US))
+    for i in np.flatnonzero(bad_ts).tolist():
+        errors.append({"type": "datetime_range", "loc": ("records", i, "ts"), "msg": "ts fuera de rango (años 1677-2262)", "input": rec["ts_us"][i].item()})
+    if errors:
+        return [], errors
+
+    # Columnas → listas de Python (una pasada vectorizada por columna).
+    ts = pd.to_datetime(np.where(has_ts, rec["ts_us"], 0), unit="us", utc=True)
+    ts = list(ts.to_pydatetime())
+    if not has_ts.all():
+        now = datetime.now(timezone.utc)
+        for i in np.flatnonzero(~has_ts).tolist():
+            ts[i] = now
+
+    names = np.asarray(nodes, dtype=object)[rec["node"]].tolist()
+    failure = rec["failure"].astype(object)
+    failure[rec["failure"] < 0] = None
+    failure[rec["failure"] == 0] = False
+    failure[rec["failure"] == 1] = True
+
+    keys = ("ts", "node_id", "latency_ms", "jitter_ms", "rssi_dbm", "noise_dbm", "failure")
+    rows = [
+        dict(zip(keys, values))
+        for values in zip(
+            ts,
+            names,
+            rec["latency_ms"].astype(np.float64).tolist(),
+            rec["jitter_ms"].astype(np.float64).tolist(),
+            rec["rssi_dbm"].astype(np.float64).tolist(),
+            rec["noise_dbm"].astype(np.float64).tolist(),
+            failure.tolist(),
+        )
+    ]
+    return rows, errors
@@ -0,0 +1,203 @@
+# app/columnar.py
+# ------------------------------------------------------------
+# Validación columnar de lotes para /ingest:
+#  - en vez de construir un ReadingIn por lectura, se validan las
+#    columnas completas con NumPy/pandas (ge=0, longitud de node_id,
+#    parseo ISO-8601 → UTC de ts)
+#  - sólo las filas marcadas como sospechosas pasan por ReadingIn,
+#    así los errores 422 son EXACTAMENTE los de Pydantic
+#  - el resultado son dicts planos listos para crud.insert_rows
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import re
+from datetime import datetime, timezone
+from operator import itemgetter
+from typing import Any, List, Tuple
+
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+
+from .schemas import IngestBatch, ReadingIn
+from .crud import reading_rows
+
+# Columnas numéricas y su cota inferior (None = sin cota), como en ReadingIn.
+_FLOAT_COLS = {
+    "latency_ms": 0.0,
+    "jitter_ms": 0.0,
+    "rssi_dbm": None,
+    "noise_dbm": None,
+}
+
+_NODE_ID_MAX = 64
+# Forma de ts que pandas y Pydantic interpretan igual: fecha y hora completas
+# (segundos y fracción opcionales) con 'Z' o desfase opcional. El resto
+# ("2024", "2024-01", fechas sin hora, epoch...) se marca y lo valida ReadingIn.
+_TS_RE = re.compile(
+    r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?(?:Z|[+-]\d{2}:?\d{2})?"
+)
+_MISSING = object()
+
+
+def _float_column(values: List[Any], ge: float | None, bad: np.ndarray) -> np.ndarray:
+    """
+    Convierte una columna a float64 y marca en `bad` las filas inválidas.
+    Sólo se aceptan en bloque ints/floats; cualquier otra cosa (None,
+    strings, ausentes...) marca la fila para que la valide Pydantic.
+    """
+    arr = np.asarray(values) if None not in values else None
+    if arr is None or arr.ndim != 1 or arr.dtype.kind not in "if":
+        # Columna mixta: resolvemos tipo a tipo (rápido, sin Pydantic).
+        ok = np.fromiter(
+            (type(v) is float or type(v) is int for v in values), dtype=bool, count=len(values)
+        )
+        bad |= ~ok
+        arr = np.fromiter(
+            (v if ok_i else 0.0 for v, ok_i in zip(values, ok)), dtype=np.float64, count=len(values)
+        )
+    else:
+        arr = arr.astype(np.float64, copy=False)
+
+    if ge is not None:
+        bad |= ~(arr >= ge)   # también atrapa NaN, como Pydantic
+    return arr
+
+
+def _column(readings: List[dict], key: str) -> List[Any]:
+    """Extrae una columna; las claves ausentes quedan como _MISSING."""
+    try:
+        return list(map(itemgetter(key), readings))
+    except KeyError:
+        return [r.get(key, _MISSING) for r in readings]
+
+
+def _node_id_column(values: List[Any], bad: np.ndarray) -> None:
+    n = len(values)
+    if set(map(type, values)) == {str}:
+        lengths = np.fromiter(map(len, values), dtype=np.int64, count=n)
+        bad |= (lengths < 1) | (lengths > _NODE_ID_MAX)
+        return
+    is_str = np.fromiter((type(v) is str for v in values), dtype=bool, count=n)
+    lengths = np.fromiter(
+        (len(v) if s else 0 for v, s in zip(values, is_str)), dtype=np.int64, count=n
+    )
+    bad |= ~is_str | (lengths < 1) | (lengths > _NODE_ID_MAX)
+
+
+def _ts_shape(values: List[str]) -> np.ndarray:
+    return np.fromiter(map(bool, map(_TS_RE.fullmatch, values)), dtype=bool, count=len(values))
+
+
+def _ts_column(values: List[Any], bad: np.ndarray) -> List[datetime | None]:
+    """
+    Normaliza `ts` en bloque a datetime UTC-aware (naive ⇒ UTC, 'Z' ⇒ +00:00).
+    None/ausente se deja en None (se completa con 'ahora' al insertar).
+    """
+    n = len(values)
+    if set(map(type, values)) == {str}:
+        # Caso habitual: todas traen ts como string.
+        parsed = pd.to_datetime(pd.Series(values, dtype=object), utc=True, format="ISO8601", errors="coerce")
+        nat = parsed.isna().to_numpy() | ~_ts_shape(values)
+        bad |= nat
+        out = list(parsed.dt.to_pydatetime())
+        if nat.any():
+            for i in np.flatnonzero(nat).tolist():
+                out[i] = None
+        return out
+
+    is_none = np.fromiter((v is None or v is _MISSING for v in values), dtype=bool, count=n)
+    is_str = np.fromiter((type(v) is str for v in values), dtype=bool, count=n)
+    bad |= ~(is_none | is_str)
+
+    out: List[datetime | None] = [None] * n
+    idx = np.flatnonzero(is_str)
+    if len(idx):
+        strs = pd.Series([values[i] for i in idx], dtype=object)
+        parsed = pd.to_datetime(strs, utc=True, format="ISO8601", errors="coerce")
+        nat = parsed.isna().to_numpy() | ~_ts_shape(strs.tolist())
+        bad[idx[nat]] = True
+        pydt = list(parsed.dt.to_pydatetime())
+        for j, i in enumerate(idx):
+            if not nat[j]:
+                out[i] = pydt[j]
+    return out
+
+
+def _failure_column(values: List[Any], bad: np.ndarray) -> List[Any]:
+    if set(map(type, values)) <= {bool, type(None)}:
+        return values
+    ok = np.fromiter(
+        (v is True or v is False or v is None or v is _MISSING for v in values),
+        dtype=bool,
+        count=len(values),
+    )
+    bad |= ~ok
+    return [None if v is _MISSING else v for v in values]
+
+
+def validate_columnar(data: Any, min_rows: int = 0) -> Tuple[List[dict], List[dict]]:
+    """
+    Valida el cuerpo ya decodificado de /ingest ({"readings": [...]}).
+    Lotes con menos de `min_rows` lecturas se validan con IngestBatch:
+    con pocos datos el coste fijo de NumPy/pandas no compensa.
+
+    Devuelve (rows, errors):
+      - rows: dicts planos con las columnas de sensor_readings.
+      - errors: errores con el formato de Pydantic y loc relativo al cuerpo
+        (p.ej. ("readings", 3, "latency_ms")); vacío si todo es válido.
+    """
+    readings = data.get("readings") if isinstance(data, dict) else None
+    if (
+        not isinstance(readings, list)
+        or len(readings) < max(min_rows, 1)
+        or not all(type(r) is dict for r in readings)
+    ):
+        # Lote pequeño o estructura inesperada: Pydantic valida (y genera
+        # el error exacto si lo hay).
+        try:
+            batch = IngestBatch.model_validate(data, from_attributes=True)
+        except ValidationError as e:
+            return [], e.errors(include_url=False)
+        return reading_rows(batch.readings), []
+
+    n = len(readings)
+    bad = np.zeros(n, dtype=bool)
+
+    # 1) Extraemos columnas (una pasada por clave, sin modelos).
+    node_ids = _column(readings, "node_id")
+    _node_id_column(node_ids, bad)
+
+    floats = {
+        col: _float_column(_column(readings, col), ge, bad)
+        for col, ge in _FLOAT_COLS.items()
+    }
+    ts = _ts_column(_column(readings, "ts"), bad)
+    failure = _failure_column(_column(readings, "failure"), bad)
+
+    # 2) Filas sospechosas: las valida Pydantic (coerciones "lax" incluidas)
+    #    y, si son inválidas, sus errores salen idénticos a los de IngestBatch.
+    errors: List[dict] = []
+    fixed = {}
+    for i in np.flatnonzero(bad).tolist():
+        try:
+            fixed[i] = ReadingIn.model_validate(readings[i], from_attributes=True)
+        except ValidationError as e:
+            for err in e.errors(include_url=False):
+                errors.append({**err, "loc": ("readings", i, *err["loc"])})
+    if errors:
+        return [], errors
+
+    # 3) Ensamblamos filas planas para el INSERT de Core.
+    now = datetime.now(timezone.utc)
+    if any(t is None for t in ts):
+        ts = [t or now for t in ts]
+    keys = ("ts", "node_id", *_FLOAT_COLS, "failure")
+    rows = [
+        dict(zip(keys, values))
+        for values in zip(ts, node_ids, *(floats[c].tolist() for c in _FLOAT_COLS), failure)
+    ]
+    for i, r in fixed.items():
+        rows[i] = {**r.model_dump(), "ts": r.ts or now}
+
+    return rows, errors
@@ -0,0 +1,214 @@
+# app/config.py
+# ------------------------------------------------------------
+# Configuración de la API leída desde variables de entorno.
+# Todo tiene un valor por defecto razonable para desarrollo local,
+# así que la app arranca igual que antes sin definir nada.
+# ------------------------------------------------------------
+import os
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Lee una variable de entorno como booleano ("1", "true", "yes", "on")."""
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
+
+
+# 1) Modo de escritura de /ingest:
+#    - "orm":  un objeto SensorReading por lectura + add_all (comportamiento original).
+#    - "bulk": INSERT de SQLAlchemy Core con executemany sobre dicts planos.
+INGEST_MODE = os.getenv("INGEST_MODE", "orm").strip().lower()
+
+# 2) PRAGMAs de SQLite (sólo aplican si DB_URL es sqlite):
+#    - journal_mode=WAL: lectores no bloquean al escritor y viceversa.
+#    - synchronous=NORMAL: en WAL es seguro ante caídas del proceso y evita
+#      un fsync por commit.
+SQLITE_PRAGMAS = _env_bool("SQLITE_PRAGMAS", True)
+
+# 3) Buffer write-behind de /ingest (desactivado por defecto):
+#    - INGEST_BUFFER: activa el buffer (responde tras encolar).
+#    - INGEST_BUFFER_MAX_ROWS: capacidad; si se supera, /ingest responde 503.
+#    - INGEST_BUFFER_FLUSH_ROWS / INGEST_BUFFER_FLUSH_INTERVAL: umbral de
+#      tamaño (filas) o de tiempo (segundos) para volcar a la BD.
+#    - INGEST_BUFFER_FLUSH_RETRIES: reintentos de un volcado fallido; si
+#      se agotan, las filas (ya confirmadas al cliente) se guardan como
+#      NDJSON en INGEST_BUFFER_SPILL_DIR para reenviarlas a /ingest/stream.
+INGEST_BUFFER = _env_bool("INGEST_BUFFER", False)
+INGEST_BUFFER_MAX_ROWS = int(os.getenv("INGEST_BUFFER_MAX_ROWS", "50000"))
+INGEST_BUFFER_FLUSH_ROWS = int(os.getenv("INGEST_BUFFER_FLUSH_ROWS", "1000"))
+INGEST_BUFFER_FLUSH_INTERVAL = float(os.getenv("INGEST_BUFFER_FLUSH_INTERVAL", "0.5"))
+INGEST_BUFFER_FLUSH_RETRIES = int(os.getenv("INGEST_BUFFER_FLUSH_RETRIES", "5"))
+INGEST_BUFFER_SPILL_DIR = os.getenv("INGEST_BUFFER_SPILL_DIR", "ingest_spill")
+
+# 4) Caché en memoria de /status (cargada desde node_latest al arrancar).
+#    Con varios workers de uvicorn cada proceso sólo ve sus propias
+#    ingestas: en ese caso compártela entre workers (STATUS_SHARED, más
+#    abajo) o desactívala para leer siempre node_latest.
+STATUS_CACHE = _env_bool("STATUS_CACHE", True)
+
+# 5) Ingesta en streaming (POST /ingest/stream, NDJSON):
+#    - INGEST_STREAM_CHUNK_ROWS: filas por commit.
+#    - INGEST_STREAM_MAX_LINE_BYTES: líneas más largas se descartan como error.
+#    - INGEST_STREAM_MAX_ERRORS: errores por línea que se detallan en la respuesta
+#      (el resto sólo se cuenta), para que la memoria no dependa del payload.
+INGEST_STREAM_CHUNK_ROWS = int(os.getenv("INGEST_STREAM_CHUNK_ROWS", "5000"))
+INGEST_STREAM_MAX_LINE_BYTES = int(os.getenv("INGEST_STREAM_MAX_LINE_BYTES", "65536"))
+INGEST_STREAM_MAX_ERRORS = int(os.getenv("INGEST_STREAM_MAX_ERRORS", "100"))
+
+# 6) Validación del cuerpo JSON de /ingest:
+#    - "pydantic": un ReadingIn por lectura (comportamiento original).
+#    - "columnar": validación por columnas con NumPy/pandas y escritura
+#      directa con el INSERT bulk (mismos errores 422).
+#    - INGEST_COLUMNAR_MIN_ROWS: por debajo de este tamaño de lote se usa
+#      Pydantic igualmente (el coste fijo de NumPy/pandas no compensa).
+INGEST_VALIDATION = os.getenv("INGEST_VALIDATION", "pydantic").strip().lower()
+INGEST_COLUMNAR_MIN_ROWS = int(os.getenv("INGEST_COLUMNAR_MIN_ROWS", "2000"))
+
+# 7) Serving del modelo (/predict):
+#    - MODEL_PATH / FEATURE_SPEC_PATH: artefactos de ml/train.py (ARTIFACTS).
+#    - PREDICT_WINDOW: ventana de agregación con la que se entrenó el modelo.
+#    - PREDICT_THRESHOLD: umbral de probabilidad para marcar fallo.
+#    - PREDICT_MAX_BATCH / PREDICT_MAX_WAIT_MS: micro-batching; las peticiones
+#      concurrentes se agrupan hasta N filas o hasta esperar M ms. Con 0
+#      (por defecto) se toma lo ya encolado: mientras un predict_proba está
+#      en curso se acumula el siguiente lote, sin añadir espera.
+_ART_DIR = os.getenv("ARTIFACTS", "artifacts")
+MODEL_PATH = os.getenv("MODEL_PATH", os.path.join(_ART_DIR, "model.joblib"))
+FEATURE_SPEC_PATH = os.getenv("FEATURE_SPEC_PATH", os.path.join(_ART_DIR, "feature_spec.json"))
+PREDICT_WINDOW = os.getenv("PREDICT_WINDOW", "15min")
+PREDICT_THRESHOLD = float(os.getenv("PREDICT_THRESHOLD", "0.5"))
+PREDICT_MAX_BATCH = int(os.getenv("PREDICT_MAX_BATCH", "256"))
+PREDICT_MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "0"))
+
+# 8) Registro de modelos y recarga en caliente:
+#    - MODEL_REGISTRY: directorio de versiones (ml/registry.py); si tiene una
+#      versión publicada en LATEST se usa en vez de MODEL_PATH.
+#    - MODEL_POLL_INTERVAL: segundos entre consultas de LATEST (0 = sin recarga).
+#    - MODEL_MMAP: carga los arrays del modelo con mmap (joblib mmap_mode="r").
+MODEL_REGISTRY = os.getenv("MODEL_REGISTRY", os.path.join(_ART_DIR, "models"))
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "2"))
+MODEL_MMAP = _env_bool("MODEL_MMAP", True)
+
+# 9) Mantenimiento en segundo plano (ml/maintenance.py, desactivado por defecto):
+#    - MAINTENANCE: arranca el hilo que refresca los rollups cada
+#      MAINTENANCE_INTERVAL segundos.
+#    - ROLLUP_WINDOWS: resoluciones agregadas en feature_windows (coma).
+#    - RETENTION: antigüedad máxima de las lecturas crudas (p.ej. "30D");
+#      vacío = no se borra nada.
+#    - RETENTION_BATCH_ROWS: filas por transacción de borrado.
+#    - RETENTION_ARCHIVE_DIR: si se indica, cada lote se archiva en CSV.gz
+#      antes de borrarlo.
+MAINTENANCE = _env_bool("MAINTENANCE", False)
+MAINTENANCE_INTERVAL = float(os.getenv("MAINTENANCE_INTERVAL", "300"))
+ROLLUP_WINDOWS = [w.strip() for w in os.getenv("ROLLUP_WINDOWS", "1min,15min,1h").split(",") if w.strip()]
+RETENTION = os.getenv("RETENTION", "").strip() or None
+RETENTION_BATCH_ROWS = int(os.getenv("RETENTION_BATCH_ROWS", "5000"))
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "").strip() or None
+
+# 10) Histórico por nodo (GET /nodes/{node_id}/readings):
+#    - HISTORY_PAGE_LIMIT: puntos por página si no se indica ?limit=.
+#    - HISTORY_MAX_LIMIT: máximo de ?limit= (lecturas o buckets).
+#    - HISTORY_SCAN_ROWS: filas por consulta del escaneo por rango (keyset).
+HISTORY_PAGE_LIMIT = int(os.getenv("HISTORY_PAGE_LIMIT", "1000"))
+HISTORY_MAX_LIMIT = int(os.getenv("HISTORY_MAX_LIMIT", "10000"))
+HISTORY_SCAN_ROWS = int(os.getenv("HISTORY_SCAN_ROWS", "5000"))
+
+# 11) Acceso asíncrono a la BD (desactivado por defecto):
+#    - DB_ASYNC: /ingest, /ingest/stream y /status usan AsyncSession
+#      (SQLAlchemy asyncio) en el event loop, sin ocupar un hilo del
+#      threadpool mientras esperan a la BD. Driver según DB_URL:
+#      sqlite → aiosqlite, postgresql → asyncpg.
+#    - En modo async la escritura usa siempre la ruta bulk (Core).
+DB_ASYNC = _env_bool("DB_ASYNC", False)
+
+# 12) Escritor único para SQLite (desactivado por defecto):
+#    - SQLITE_WRITER: las escrituras de /ingest (y del buffer write-behind)
+#      las aplica un único hilo con su propia conexión, en orden y con
+#      group commit; /status, el histórico y /predict leen de un pool
+#      aparte de conexiones de sólo lectura.
+#    - SQLITE_WRITER_MAX_PENDING: peticiones en cola; si se supera, 503.
+#    - SQLITE_WRITER_MAX_BATCH_ROWS: filas máximas por transacción de grupo.
+#    - SQLITE_READ_POOL: conexiones del pool de lectura.
+#    - SQLITE_BUSY_TIMEOUT_MS: espera del escritor ante locks de otros procesos.
+SQLITE_WRITER = _env_bool("SQLITE_WRITER", False)
+SQLITE_WRITER_MAX_PENDING = int(os.getenv("SQLITE_WRITER_MAX_PENDING", "10000"))
+SQLITE_WRITER_MAX_BATCH_ROWS = int(os.getenv("SQLITE_WRITER_MAX_BATCH_ROWS", "5000"))
+SQLITE_READ_POOL = int(os.getenv("SQLITE_READ_POOL", "8"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# 13) Métricas Prometheus (GET /metrics, activadas por defecto):
+#    - METRICS: middleware con histogramas de latencia por ruta y el
+#      endpoint /metrics. Los contadores de BD de app/crud.py (filas,
+#      tamaño de lote, tiempos de insert/commit) se registran siempre:
+#      cuestan unos µs por lote, no por fila.
+METRICS = _env_bool("METRICS", True)
+
+# 14) Profiling bajo demanda (desactivado por defecto):
+#    - PROFILING: activa el middleware de app/profiling.py.
+#    - PROFILE_HEADER / PROFILE_TOKEN: una petición con esa cabecera se
+#      perfila; con token, sólo si el valor de la cabecera coincide.
+#    - PROFILE_SAMPLE_RATE: fracción de peticiones perfiladas al azar (0-1).
+#    - PROFILE_SLOW_MS: guarda el SQL y la duración de toda petición que
+#      supere el umbral (0 = desactivado).
+#    - PROFILE_INTERVAL_MS: periodo de muestreo de las pilas.
+#    - PROFILE_DIR / PROFILE_MAX_FILES: directorio de capturas y cuántas se
+#      conservan (se borran las más antiguas).
+PROFILING = _env_bool("PROFILING", False)
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "").strip() or None
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "100"))
+
+# 15) Stream de estado (GET /status/stream por SSE y /status/ws):
+#    - STATUS_STREAM: activa los endpoints; sin suscriptores, publicar tras
+#      cada commit es una comprobación y nada más.
+#    - STATUS_STREAM_INTERVAL: segundos mínimos entre envíos a un mismo
+#      suscriptor (las actualizaciones de un nodo entre medias se fusionan).
+#    - STATUS_STREAM_HEARTBEAT: segundos sin cambios tras los que se manda
+#      un ping (mantiene vivos proxies y detecta clientes caídos).
+#    - STATUS_STREAM_MAX_SUBSCRIBERS: suscriptores por proceso; si se
+#      supera, 503 (SSE) o cierre 1013 (WebSocket).
+#    - STATUS_STREAM_MAX_PENDING / STATUS_STREAM_MAX_LAG: nodos pendientes
+#      por suscriptor y segundos sin consumirlos antes de darlo de baja.
+STATUS_STREAM = _env_bool("STATUS_STREAM", True)
+STATUS_STREAM_INTERVAL = float(os.getenv("STATUS_STREAM_INTERVAL", "0.25"))
+STATUS_STREAM_HEARTBEAT = float(os.getenv("STATUS_STREAM_HEARTBEAT", "15"))
+STATUS_STREAM_MAX_SUBSCRIBERS = int(os.getenv("STATUS_STREAM_MAX_SUBSCRIBERS", "10000"))
+STATUS_STREAM_MAX_PENDING = int(os.getenv("STATUS_STREAM_MAX_PENDING", "10000"))
+STATUS_STREAM_MAX_LAG = float(os.getenv("STATUS_STREAM_MAX_LAG", "30"))
+
+# 16) Ingesta idempotente (desactivada por defecto):
+#    - INGEST_DEDUP: índice único (node_id, ts) en sensor_readings (se crea
+#      al arrancar; si ya hay duplicados, el arranque falla y hay que
+#      limpiarlos con `python -m ml.maintenance --dedup`), INSERT ... ON
+#      CONFLICT DO NOTHING y cabecera de idempotencia por lote en /ingest.
+#      Con dedup, el modo "orm" de INGEST_MODE escribe por la ruta bulk.
+#    - INGEST_DEDUP_RECENT_KEYS: claves (node_id, ts) recientes en memoria
+#      para descartar reintentos sin ir a la BD (~200 B por clave).
+#    - INGEST_IDEMPOTENCY_HEADER: cabecera con la clave del lote.
+#    - INGEST_IDEMPOTENCY_MAX_KEYS / INGEST_IDEMPOTENCY_TTL: respuestas de
+#      lote guardadas (LRU) y segundos que se recuerdan.
+INGEST_DEDUP = _env_bool("INGEST_DEDUP", False)
+INGEST_DEDUP_RECENT_KEYS = int(os.getenv("INGEST_DEDUP_RECENT_KEYS", "100000"))
+INGEST_IDEMPOTENCY_HEADER = os.getenv("INGEST_IDEMPOTENCY_HEADER", "Idempotency-Key")
+INGEST_IDEMPOTENCY_MAX_KEYS = int(os.getenv("INGEST_IDEMPOTENCY_MAX_KEYS", "10000"))
+INGEST_IDEMPOTENCY_TTL = float(os.getenv("INGEST_IDEMPOTENCY_TTL", "300"))
+
+# 17) Estado de /status compartido entre workers (desactivado por defecto):
+#    - STATUS_SHARED: la caché de STATUS_CACHE vive en memoria compartida
+#      (app/shm_state.py): todos los workers de uvicorn la actualizan al
+#      ingerir y la leen en /status, así que con --workers N no hace falta
+#      desactivar la caché. Sólo POSIX (shared_memory + flock). Las lecturas
+#      sin lock (seqlock) dependen del orden de escrituras de x86-64 (TSO);
+#      en otras arquitecturas (aarch64: Graviton, Apple silicon) /status
+#      toma también el lock entre procesos para leer.
+#    - STATUS_SHM_NAME: nombre del segmento (por defecto, derivado de DB_URL).
+#    - STATUS_SHM_CAPACITY: nodos como máximo (~300 B por nodo); si hay más,
+#      /status vuelve a leer node_latest.
+STATUS_SHARED = _env_bool("STATUS_SHARED", False)
+STATUS_SHM_NAME = os.getenv("STATUS_SHM_NAME", "").strip() or None
+STATUS_SHM_CAPACITY = int(os.getenv("STATUS_SHM_CAPACITY", "4096"))
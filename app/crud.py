@@ -1,5 +1,5 @@
 # 1) Tipos y utilidades de typing y fechas.
-from typing import List
+from typing import Dict, List, Optional
 from datetime import datetime, timezone
 
 # 2) Pydantic schemas (entrada/salida).
@@ -7,15 +7,33 @@ from .schemas import ReadingIn, StatusItem
 
 # 3) ORM: Session (conexión viva) y nuestro modelo.
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, and_, insert
 
-from .models import SensorReading
+from .models import SensorReading, NodeLatest
+from .config import INGEST_MODE, INGEST_DEDUP, INGEST_DEDUP_RECENT_KEYS
+from .metrics import INGEST_BATCH_ROWS, INGEST_DEDUPLICATED, INGEST_ROWS, db_timer
+from .idempotency import RecentKeys
+from . import state, status_stream
 
-def insert_readings(db: Session, readings: List[ReadingIn]) -> int:
+# Columnas que se guardan en node_latest (y que expone StatusItem).
+_LATEST_COLS = ("node_id", "ts", "latency_ms", "jitter_ms", "rssi_dbm", "noise_dbm")
+
+# Claves (node_id, ts) confirmadas hace poco (sólo con INGEST_DEDUP).
+_recent_keys: Optional[RecentKeys] = RecentKeys(INGEST_DEDUP_RECENT_KEYS) if INGEST_DEDUP else None
+
+def insert_readings(db: Session, readings: List[ReadingIn], mode: Optional[str] = None) -> int:
     """
     Inserta un lote de lecturas en la tabla SensorReading.
     Devuelve el número de filas insertadas.
+
+    `mode` elige la ruta de escritura ("orm" o "bulk"); por defecto
+    se usa INGEST_MODE de la configuración. Con INGEST_DEDUP siempre bulk
+    (add_all no sabe hacer ON CONFLICT DO NOTHING).
     """
+    if (mode or INGEST_MODE) == "bulk" or INGEST_DEDUP:
+        return insert_readings_bulk(db, readings)
+
     # 4) Transformamos `ReadingIn` (Pydantic) a objetos ORM.
     rows = []
     for r in readings:
@@ -31,17 +49,285 @@ def insert_readings(db: Session, readings: List[ReadingIn]) -> int:
             )
         )
 
-    # 5) Añadimos todas las filas en bloque y confirmamos.
+    # 5) Añadimos todas las filas en bloque, actualizamos node_latest
+    #    en la misma transacción y confirmamos (el INSERT de los objetos
+    #    ORM se emite al volcar en el commit: su tiempo cuenta en "commit").
     db.add_all(rows)
-    db.commit()
+    with db_timer("upsert_latest"):
+        latest = upsert_node_latest(db, [{c: getattr(o, c) for c in _LATEST_COLS} for o in rows])
+    with db_timer("commit"):
+        db.commit()
+    _cache_latest(latest)
+    _record_write(len(rows))
 
     return len(rows)
 
 
+def reading_rows(readings: List[ReadingIn]) -> List[dict]:
+    """
+    Convierte lecturas validadas en dicts planos con las columnas de
+    sensor_readings (lo que espera un INSERT de Core con executemany).
+    """
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "ts": r.ts or now,
+            "node_id": r.node_id,
+            "latency_ms": r.latency_ms,
+            "jitter_ms": r.jitter_ms,
+            "rssi_dbm": r.rssi_dbm,
+            "noise_dbm": r.noise_dbm,
+            "failure": r.failure,
+        }
+        for r in readings
+    ]
+
+
+def insert_readings_bulk(db: Session, readings: List[ReadingIn]) -> int:
+    """
+    Ruta rápida de inserción: INSERT de SQLAlchemy Core sobre la tabla
+    con executemany, sin construir un objeto ORM por fila.
+    Devuelve el número de filas insertadas (mismo contrato que insert_readings).
+    """
+    return insert_rows(db, reading_rows(readings))
+
+
+def insert_rows(db: Session, rows: List[dict]) -> int:
+    """
+    Escribe dicts planos (ver `reading_rows`) en sensor_readings en una sola
+    transacción. Es la pieza común de la ruta bulk y del buffer write-behind.
+    Devuelve las filas insertadas (con INGEST_DEDUP, sin las repetidas).
+    """
+    return insert_row_groups(db, [rows])[0]
+
+
+def insert_row_groups(db: Session, groups: List[List[dict]]) -> List[int]:
+    """
+    Como `insert_rows` para varios lotes en UNA transacción (group commit del
+    escritor único). Devuelve las filas insertadas de cada lote.
+    """
+    received = sum(len(g) for g in groups)
+    if INGEST_DEDUP:
+        groups = _recent_keys.filter_groups(groups)
+    rows = groups[0] if len(groups) == 1 else [r for g in groups for r in g]
+    if not rows:
+        _record_dedup(received)
+        return [0] * len(groups)
+
+    # Usamos la Table (no la clase ORM) para que sea un executemany puro de Core.
+    with db_timer("insert"):
+        if INGEST_DEDUP:
+            # Un executemany por lote: su rowcount dice cuántas entraron
+            stmt = _insert_stmt(db.get_bind().dialect.name)
+            counts = [db.execute(stmt, g).rowcount if g else 0 for g in groups]
+        else:
+            db.execute(insert(SensorReading.__table__), rows)
+            counts = [len(g) for g in groups]
+    with db_timer("upsert_latest"):
+        latest = upsert_node_latest(db, rows)
+    with db_timer("commit"):
+        db.commit()
+    _cache_latest(latest)
+    _record_write(sum(counts))
+    if INGEST_DEDUP:
+        _recent_keys.add(rows)
+        _record_dedup(received - sum(counts))
+
+    return counts
+
+
+async def insert_rows_async(db: AsyncSession, rows: List[dict]) -> int:
+    """
+    Versión async de `insert_rows` (DB_ASYNC): mismo INSERT de Core y mismo
+    upsert de node_latest en una transacción, sin bloquear un hilo.
+    """
+    received = len(rows)
+    if INGEST_DEDUP:
+        rows = _recent_keys.filter_groups([rows])[0]
+    if not rows:
+        _record_dedup(received)
+        return 0
+
+    with db_timer("insert"):
+        result = await db.execute(_insert_stmt(db.bind.dialect.name), rows)
+    inserted = result.rowcount if INGEST_DEDUP else len(rows)
+    # upsert_node_latest es código sync: run_sync lo ejecuta sobre la
+    # conexión async (sin hilo extra) dentro de la misma transacción.
+    with db_timer("upsert_latest"):
+        latest = await db.run_sync(upsert_node_latest, rows)
+    with db_timer("commit"):
+        await db.commit()
+    _cache_latest(latest)
+    _record_write(inserted)
+    if INGEST_DEDUP:
+        _recent_keys.add(rows)
+        _record_dedup(received - inserted)
+
+    return inserted
+
+
+def _insert_stmt(dialect: str):
+    """
+    INSERT de sensor_readings; con INGEST_DEDUP, ON CONFLICT (node_id, ts)
+    DO NOTHING sobre el índice único (SQLite y PostgreSQL; en el resto de
+    motores una repetida no filtrada en memoria hace fallar el lote).
+    """
+    table = SensorReading.__table__
+    if not INGEST_DEDUP or dialect not in ("sqlite", "postgresql"):
+        return insert(table)
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    return dialect_insert(table).on_conflict_do_nothing(index_elements=[table.c.node_id, table.c.ts])
+
+
+def _record_write(n: int) -> None:
+    """Métricas de una escritura confirmada (filas totales y tamaño del lote)."""
+    INGEST_ROWS.inc(n)
+    INGEST_BATCH_ROWS.observe(n)
+
+
+def _record_dedup(n: int) -> None:
+    """Lecturas repetidas descartadas (por el filtro en memoria o por la BD)."""
+    if n:
+        INGEST_DEDUPLICATED.inc(n)
+
+
+def drop_recent_duplicates(rows: List[dict]) -> List[dict]:
+    """Filtro en memoria sin escribir (p.ej. antes de encolar en el buffer); sin dedup, `rows` tal cual."""
+    if not INGEST_DEDUP:
+        return rows
+    kept = _recent_keys.filter_groups([rows])[0]
+    _record_dedup(len(rows) - len(kept))
+    return kept
+
+
+async def insert_readings_async(db: AsyncSession, readings: List[ReadingIn]) -> int:
+    """Versión async de `insert_readings`: siempre por la ruta bulk (Core)."""
+    return await insert_rows_async(db, reading_rows(readings))
+
+
+def _as_utc(dt: datetime) -> datetime:
+    """SQLite devuelve datetimes naive (guardados en UTC): les ponemos tz explícita."""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def _latest_per_node(rows: List[dict]) -> Dict[str, dict]:
+    """
+    Reduce un lote a la lectura más reciente de cada nodo.
+    Con empate de ts gana la última del lote (igual que state.upsert_reading).
+    """
+    latest: Dict[str, dict] = {}
+    for row in rows:
+        current = latest.get(row["node_id"])
+        if current is None or _as_utc(current["ts"]) <= _as_utc(row["ts"]):
+            latest[row["node_id"]] = row
+    return latest
+
+
+def upsert_node_latest(db: Session, rows: List[dict]) -> List[dict]:
+    """
+    Actualiza node_latest con las lecturas de `rows` SIN confirmar: se llama
+    dentro de la transacción que inserta en sensor_readings.
+    Las lecturas más antiguas que la guardada se ignoran (llegadas fuera de orden).
+    Devuelve la última lectura de cada nodo del lote (para la caché en memoria).
+    """
+    latest = [{c: row[c] for c in _LATEST_COLS} for row in _latest_per_node(rows).values()]
+    if not latest:
+        return latest
+
+    table = NodeLatest.__table__
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        # 6) UPSERT nativo: INSERT ... ON CONFLICT(node_id) DO UPDATE
+        #    sólo si la lectura entrante no es más antigua.
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.node_id],
+            set_={c: stmt.excluded[c] for c in _LATEST_COLS if c != "node_id"},
+            where=stmt.excluded.ts >= table.c.ts,
+        )
+        db.execute(stmt, latest)
+    else:
+        # 7) Resto de motores: leer-comparar-escribir por nodo.
+        for row in latest:
+            current = db.get(NodeLatest, row["node_id"])
+            if current is None:
+                db.add(NodeLatest(**row))
+            elif _as_utc(current.ts) <= _as_utc(row["ts"]):
+                for c in _LATEST_COLS[1:]:
+                    setattr(current, c, row[c])
+
+    return latest
+
+
+def _cache_latest(latest: List[dict]) -> None:
+    """Refleja en la caché en memoria (y en el stream de estado) lo ya confirmado en node_latest."""
+    state.upsert_rows([{**row, "ts": _as_utc(row["ts"])} for row in latest])
+    status_stream.publish(latest)
+
+
 def latest_status(db: Session) -> List[StatusItem]:
     """
-    Devuelve el último registro por node_id como lista de StatusItem.
-    Implementación: subconsulta con MAX(ts) y join.
+    Devuelve el último registro por node_id como lista de StatusItem,
+    leyendo la tabla node_latest (una fila por nodo).
+    """
+    with db_timer("status_query"):
+        rows = db.execute(select(NodeLatest).order_by(NodeLatest.node_id.asc())).scalars().all()
+    return [_status_item(row) for row in rows]
+
+
+async def latest_status_async(db: AsyncSession) -> List[StatusItem]:
+    """Versión async de `latest_status` (DB_ASYNC)."""
+    with db_timer("status_query"):
+        rows = (await db.execute(select(NodeLatest).order_by(NodeLatest.node_id.asc()))).scalars().all()
+    return [_status_item(row) for row in rows]
+
+
+def _status_item(row: NodeLatest) -> StatusItem:
+    return StatusItem(
+        node_id=row.node_id,
+        ts=_as_utc(row.ts),
+        latency_ms=row.latency_ms,
+        jitter_ms=row.jitter_ms,
+        rssi_dbm=row.rssi_dbm,
+        noise_dbm=row.noise_dbm,
+    )
+
+
+def warm_status_cache(db: Session) -> int:
+    """
+    Carga la caché en memoria de /status desde node_latest (al arrancar).
+    Si node_latest está vacía pero ya hay histórico (BD anterior a esta
+    tabla), la rellena una vez con `latest_status_scan`.
+    Devuelve el número de nodos cargados.
+    """
+    if db.execute(select(func.count()).select_from(NodeLatest)).scalar_one() == 0:
+        scanned = latest_status_scan(db)
+        if scanned:
+            upsert_node_latest(db, [item.model_dump() for item in scanned])
+            db.commit()
+
+    state.clear()
+    items = latest_status(db)
+    state.upsert_rows([item.model_dump() for item in items])
+    state.mark_warm()
+
+    return len(items)
+
+
+def latest_status_scan(db: Session) -> List[StatusItem]:
+    """
+    Último registro por node_id calculado sobre TODO el histórico.
+    Implementación: subconsulta con MAX(ts) y join. Es O(tamaño de la tabla):
+    sólo se usa para rellenar node_latest en BDs existentes.
     """
     # 6) Subconsulta: para cada node_id, el timestamp máximo (el más reciente).
     subq = (
@@ -73,7 +359,7 @@ def latest_status(db: Session) -> List[StatusItem]:
     return [
         StatusItem(
             node_id=row.node_id,
-            ts=row.ts,
+            ts=_as_utc(row.ts),
             latency_ms=row.latency_ms,
             jitter_ms=row.jitter_ms,
             rssi_dbm=row.rssi_dbm,
@@ -0,0 +1,114 @@
+# app/data/recording.py
+# ------------------------------------------------------------
+# Grabaciones de tráfico de /ingest (record & replay del simulador).
+#
+# Fichero gzip con una cabecera y una secuencia de frames:
+#
+#   cabecera  MAGIC (8 bytes) + start_us (int64): µs desde epoch UTC del
+#             inicio de la grabación
+#   frame     t_s (float64): segundos desde el inicio en que se envió el lote
+#             n   (uint32):  bytes del cuerpo
+#             cuerpo en formato binario de app/binfmt.py (un POST /ingest)
+#
+# Todo en little-endian. La lectura es en streaming (un frame cada vez):
+# reproducir millones de lecturas no depende de la memoria.
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import gzip
+import struct
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from app import binfmt
+
+MAGIC = b"SNREC\x00\x00\x01"
+_HEADER = struct.Struct("<8sq")
+_FRAME = struct.Struct("<dI")
+_HEADER_ROWS = struct.Struct("<I")  # n_rows dentro de la cabecera binfmt (offset 4)
+
+
+class RecordingFormatError(ValueError):
+    """El fichero no es una grabación válida o está truncado."""
+
+
+class Frame(NamedTuple):
+    t_s: float             # segundos desde el inicio de la grabación
+    nodes: List[str]       # diccionario de node_ids del lote
+    rec: np.ndarray        # registros RECORD_DTYPE (vista de sólo lectura)
+
+
+class RecordingWriter:
+    """Escribe frames en un fichero gzip; usar como context manager."""
+
+    def __init__(self, path: str, start_us: int, compresslevel: int = 6) -> None:
+        self.path = path
+        self.start_us = int(start_us)
+        self.frames = 0
+        self.rows = 0
+        self._f: BinaryIO = gzip.open(path, "wb", compresslevel=compresslevel)
+        self._f.write(_HEADER.pack(MAGIC, self.start_us))
+
+    def write(self, t_s: float, body: bytes) -> None:
+        """Añade un cuerpo binario ya codificado (binfmt) enviado en `t_s`."""
+        self._f.write(_FRAME.pack(t_s, len(body)))
+        self._f.write(body)
+        self.frames += 1
+        self.rows += _HEADER_ROWS.unpack_from(body, 4)[0]
+
+    def write_records(self, t_s: float, nodes: List[str], rec: np.ndarray) -> None:
+        self.write(t_s, binfmt.encode_records(nodes, rec))
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "RecordingWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class RecordingReader:
+    """
+    Lee una grabación frame a frame.
+    - start_us: inicio de la grabación (µs UTC).
+    - iterar devuelve Frame(t_s, nodes, rec) en orden de grabación.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._f: Optional[BinaryIO] = gzip.open(path, "rb")
+        head = self._f.read(_HEADER.size)
+        if len(head) < _HEADER.size:
+            raise RecordingFormatError("cabecera incompleta")
+        magic, self.start_us = _HEADER.unpack(head)
+        if magic != MAGIC:
+            raise RecordingFormatError(f"magic inválido {magic!r}")
+
+    def __iter__(self) -> Iterator[Frame]:
+        f = self._f
+        while True:
+            head = f.read(_FRAME.size)
+            if not head:
+                return
+            if len(head) < _FRAME.size:
+                raise RecordingFormatError("frame truncado")
+            t_s, n = _FRAME.unpack(head)
+            body = f.read(n)
+            if len(body) < n:
+                raise RecordingFormatError("frame truncado")
+            nodes, rec = binfmt.decode(body)
+            yield Frame(t_s, nodes, rec)
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def __enter__(self) -> "RecordingReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -5,17 +5,40 @@
 #  - eventos de degradación (lat/jitter↑, RSSI↓, ruido↑)
 #  - etiqueta de fallo probabilística
 #  - múltiples nodos en paralelo (simple)
+#  - modo carga (--load): lotes vectorizados + envíos concurrentes
+#    (asyncio, conexiones keep-alive) a un ritmo objetivo, con
+#    throughput, p50/p95/p99 y errores al final
+#  - record & replay (--record / --replay): grabar lotes (generados o
+#    capturados) y reproducirlos con la temporización original, a N× o
+#    a máxima velocidad
 # ------------------------------------------------------------
 
 from __future__ import annotations
 import time
+import gzip
+import json
+import asyncio
 import argparse
+import itertools
+from collections import Counter
 from datetime import datetime, timezone
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 
+import httpx
 import numpy as np
 import requests
 
+# El formato binario vive en la app; al ejecutar este script como fichero
+# (python app/data/synthetic_generator.py) añadimos la raíz del repo al path.
+try:
+    from app import binfmt
+except ImportError:  # pragma: no cover - sólo fuera del paquete
+    import os
+    import sys
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+    from app import binfmt
+from app.data.recording import RecordingReader, RecordingWriter
+
 
 def utcnow() -> datetime:
     """Devuelve un datetime timezone-aware en UTC (forma correcta en Python 3.12+)."""
@@ -76,6 +99,330 @@ def build_batch(node_ids: List[str], degrade_chance: float, failure_bias: float)
     }
 
 
+def generate_batch(
+    node_ids: List[str],
+    n: int,
+    degrade_chance: float,
+    failure_bias: float,
+    rng: np.random.Generator,
+    start: int = 0,
+) -> Dict[str, np.ndarray]:
+    """
+    Versión vectorizada de `generate_reading`: `n` lecturas en columnas NumPy.
+    - Mismas distribuciones, degradación, score, sigmoide + sesgo y clamps.
+    - Nodos en round-robin a partir de `start` (lotes consecutivos reparten
+      las lecturas entre todos los nodos).
+    - ts = ahora (µs UTC) + i µs: lecturas distintas y en orden dentro del lote.
+    """
+    # --- base saludable ---
+    lat = rng.normal(20, 5, n)
+    jit = rng.normal(3, 1, n)
+    rssi = rng.normal(-65, 4, n)
+    noise = rng.normal(-90, 3, n)
+
+    # --- degradación: sólo para las lecturas sorteadas ---
+    deg = rng.random(n) < degrade_chance
+    k = int(deg.sum())
+    lat[deg] += rng.exponential(20, k)
+    jit[deg] += rng.exponential(5, k)
+    rssi[deg] += rng.normal(-6, 2, k)
+    noise[deg] += rng.normal(6, 2, k)
+
+    # --- prob. de fallo (idéntica a generate_reading) ---
+    score = 0.04 * lat + 0.07 * jit - 0.06 * rssi + 0.05 * noise
+    p_fail = 1.0 / (1.0 + np.exp(-(score - 2.5)))
+    p_fail = 0.7 * p_fail + 0.3 * failure_bias
+
+    now_us = time.time_ns() // 1000
+    return {
+        "node": (start + np.arange(n)) % len(node_ids),
+        "ts_us": now_us + np.arange(n, dtype=np.int64),
+        "latency_ms": np.maximum(lat, 0.0),
+        "jitter_ms": np.maximum(jit, 0.0),
+        "rssi_dbm": rssi,
+        "noise_dbm": noise,
+        "failure": rng.random(n) < p_fail,
+    }
+
+
+def to_records(cols) -> np.ndarray:
+    """Columnas de `generate_batch` -> registros RECORD_DTYPE (binfmt / grabaciones)."""
+    if isinstance(cols, np.ndarray):
+        return cols
+    rec = np.zeros(len(cols["node"]), dtype=binfmt.RECORD_DTYPE)
+    for name in ("ts_us", "latency_ms", "jitter_ms", "rssi_dbm", "noise_dbm", "node", "failure"):
+        rec[name] = cols[name]
+    return rec
+
+
+_FAILURE_JSON = {-1: None, 0: False, 1: True}
+
+
+def encode_batch(node_ids: List[str], cols, fmt: str) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Cuerpo + cabeceras de POST /ingest para un lote en columnas: el dict de
+    `generate_batch` o registros RECORD_DTYPE (frames de una grabación).
+    """
+    if fmt == "binary":
+        return binfmt.encode_records(node_ids, to_records(cols)), {"Content-Type": binfmt.CONTENT_TYPE}
+
+    # JSON: columnas -> listas Python de una vez (no fila a fila con np.float64)
+    ts_us = cols["ts_us"]
+    ts = [t + "+00:00" for t in np.datetime_as_string(ts_us.astype("datetime64[us]"), unit="us").tolist()]
+    for i in np.flatnonzero(ts_us == binfmt.TS_NULL).tolist():
+        ts[i] = None
+    names = [node_ids[i] for i in cols["node"].tolist()]
+    failure = [_FAILURE_JSON[f] for f in cols["failure"].astype(np.int8).tolist()]
+    readings = [
+        {"node_id": nid, "ts": t, "latency_ms": lat, "jitter_ms": jit,
+         "rssi_dbm": rssi, "noise_dbm": noise, "failure": f}
+        for nid, t, lat, jit, rssi, noise, f in zip(
+            names, ts, cols["latency_ms"].tolist(), cols["jitter_ms"].tolist(),
+            cols["rssi_dbm"].tolist(), cols["noise_dbm"].tolist(), failure,
+        )
+    ]
+    return json.dumps({"readings": readings}).encode("utf-8"), {"Content-Type": "application/json"}
+
+
+def rewrite_ts(rec: np.ndarray, now_us: int) -> np.ndarray:
+    """Desplaza los ts del lote para que el primero sea `now_us` (respeta los huecos internos y los nulos)."""
+    rec = rec.copy()
+    ts = rec["ts_us"]
+    valid = ts != binfmt.TS_NULL
+    if valid.any():
+        ts[valid] += now_us - ts[valid].min()
+    return rec
+
+
+# (due_s, node_ids, columnas): due_s = segundos desde el inicio en que debe
+# salir el lote (None = en cuanto haya un emisor libre).
+Job = Tuple[Optional[float], List[str], Any]
+
+
+async def send_jobs(
+    endpoint: str,
+    jobs: Iterator[Job],
+    concurrency: int,
+    fmt: str = "json",
+    duration: Optional[float] = None,
+    timeout: float = 30.0,
+    rewrite: bool = False,
+    recorder: Optional[RecordingWriter] = None,
+    tag: str = "load",
+) -> Dict[str, Any]:
+    """
+    Núcleo de los modos carga y replay: `concurrency` emisores comparten un
+    httpx.AsyncClient (conexiones keep-alive) y consumen `jobs` en orden.
+
+    - Bucle abierto: cada lote sale en t0 + due_s aunque el servidor vaya
+      retrasado (los emisores no bajan el ritmo, lo recuperan).
+    - `jobs` se consume de forma perezosa: en memoria sólo están los lotes
+      en vuelo (uno por emisor).
+    - rewrite=True: los ts de cada lote se desplazan a la hora de envío.
+    - recorder: graba cada lote enviado (con su instante de envío real).
+    - Devuelve (e imprime) throughput conseguido, p50/p95/p99 de latencia
+      (envío -> respuesta), retraso respecto al plan y errores por tipo.
+    """
+    latencies: List[float] = []
+    lags: List[float] = []
+    errors: Counter = Counter()
+    rows_ok = 0
+    bytes_sent = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        t0 = time.perf_counter()
+        t0_us = time.time_ns() // 1000
+        deadline = t0 + duration if duration is not None else float("inf")
+        if recorder is not None:
+            recorder.start_us = t0_us
+
+        async def sender() -> None:
+            nonlocal rows_ok, bytes_sent
+            while True:
+                # 1) Siguiente lote (se genera/lee aquí: la CPU no cuenta en la latencia)
+                job = next(jobs, None)
+                if job is None:
+                    return
+                due_s, node_ids, cols = job
+                due = t0 + due_s if due_s is not None else time.perf_counter()
+                if due >= deadline:
+                    return
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                # 2) Ajustar ts / grabar y codificar en el instante de envío
+                t = time.perf_counter()
+                if rewrite:
+                    cols = rewrite_ts(to_records(cols), t0_us + int((t - t0) * 1e6))
+                if recorder is not None:
+                    recorder.write_records(t - t0, node_ids, to_records(cols))
+                body, headers = encode_batch(node_ids, cols, fmt)
+
+                # 3) Enviar y medir
+                t = time.perf_counter()
+                lags.append(t - due)
+                try:
+                    r = await client.post(endpoint, content=body, headers=headers)
+                    if r.status_code >= 400:
+                        errors[f"HTTP {r.status_code}"] += 1
+                    else:
+                        rows_ok += len(cols["node"])
+                except httpx.HTTPError as e:
+                    errors[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - t)
+                bytes_sent += len(body)
+
+        await asyncio.gather(*(sender() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    n = len(latencies)
+    lat_ms = np.asarray(latencies) * 1000 if n else np.zeros(1)
+    p50, p95, p99 = np.percentile(lat_ms, [50, 95, 99])
+    stats = {
+        "requests": n,
+        "errors": sum(errors.values()),
+        "errors_by_type": dict(errors),
+        "seconds": elapsed,
+        "req_per_s": n / elapsed,
+        "rows_per_s": rows_ok / elapsed,
+        "mb_per_s": bytes_sent / elapsed / 1e6,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(lat_ms.max()),
+        "lag_p99_ms": float(np.percentile(lags, 99) * 1000) if lags else 0.0,
+    }
+    print(f"[{tag}] {n} peticiones en {elapsed:.1f}s | {stats['req_per_s']:.1f} req/s | "
+          f"{stats['rows_per_s']:.0f} lecturas/s aceptadas | {stats['mb_per_s']:.2f} MB/s")
+    print(f"[{tag}] latencia ms: p50={p50:.1f} p95={p95:.1f} p99={p99:.1f} máx={stats['max_ms']:.1f} | "
+          f"retraso p99 sobre el plan: {stats['lag_p99_ms']:.1f} ms")
+    print(f"[{tag}] errores: {stats['errors']} {dict(errors) if errors else ''}")
+    return stats
+
+
+async def run_load(
+    api_url: str,
+    nodes: int,
+    batch_rows: int,
+    concurrency: int,
+    degrade_chance: float,
+    failure_bias: float,
+    seed: int | None,
+    rps: Optional[float] = None,
+    rows_rate: Optional[float] = None,
+    duration: Optional[float] = 10.0,
+    max_requests: Optional[int] = None,
+    fmt: str = "json",
+    timeout: float = 30.0,
+    record: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Modo carga: lotes de `batch_rows` lecturas generados con `generate_batch`.
+
+    - Ritmo: `rps` peticiones/s o `rows_rate` lecturas/s (= rows_rate / batch_rows
+      peticiones/s); la petición i se programa en t0 + i/rps. Sin objetivo, cada
+      emisor envía en cuanto recibe respuesta.
+    - Termina al cumplirse `duration` segundos o `max_requests` peticiones.
+    - record: graba los lotes enviados en ese fichero (ver `run_replay`).
+    """
+    if rows_rate is not None:
+        rps = rows_rate / batch_rows
+    if duration is None and max_requests is None:
+        raise ValueError("indica duration o max_requests")
+
+    rng = np.random.default_rng(seed)
+    node_ids = [f"node-{i:02d}" for i in range(1, nodes + 1)]
+    endpoint = api_url.rstrip("/") + "/ingest"
+    goal = f"{rps:.1f} req/s ({rps * batch_rows:.0f} lecturas/s)" if rps else "sin límite"
+    print(f"[load] enviando a: {endpoint}")
+    print(f"[load] nodos: {nodes} | lote: {batch_rows} | emisores: {concurrency} | objetivo: {goal} | formato: {fmt}")
+
+    def jobs() -> Iterator[Job]:
+        for i in itertools.count():
+            if max_requests is not None and i >= max_requests:
+                return
+            cols = generate_batch(node_ids, batch_rows, degrade_chance, failure_bias, rng, start=i * batch_rows)
+            yield (i / rps if rps else None), node_ids, cols
+
+    if record is None:
+        return await send_jobs(endpoint, jobs(), concurrency, fmt, duration, timeout)
+    with RecordingWriter(record, start_us=time.time_ns() // 1000) as rw:
+        stats = await send_jobs(endpoint, jobs(), concurrency, fmt, duration, timeout, recorder=rw)
+    print(f"[load] grabados {rw.frames} lotes ({rw.rows} lecturas) en {record}")
+    return stats
+
+
+async def run_replay(
+    api_url: str,
+    path: str,
+    speed: float = 1.0,
+    rewrite: bool = False,
+    concurrency: int = 32,
+    fmt: str = "binary",
+    duration: Optional[float] = None,
+    max_requests: Optional[int] = None,
+    timeout: float = 30.0,
+) -> Dict[str, Any]:
+    """
+    Reproduce una grabación contra /ingest.
+
+    - speed=1: tiempos originales; speed=N: N veces más rápido;
+      speed=0: lo más rápido posible (sólo limitan los emisores).
+    - rewrite=False: ts originales (mismas filas que la grabación);
+      rewrite=True: cada lote se desplaza a su hora de envío.
+    - La grabación se lee en streaming: memoria constante.
+    """
+    endpoint = api_url.rstrip("/") + "/ingest"
+    with RecordingReader(path) as reader:
+        print(f"[replay] {path} -> {endpoint} | velocidad: {'máx' if speed <= 0 else f'{speed}x'} | "
+              f"ts: {'reescritos' if rewrite else 'originales'} | emisores: {concurrency} | formato: {fmt}")
+        jobs = ((f.t_s / speed if speed > 0 else None, f.nodes, f.rec) for f in reader)
+        return await send_jobs(
+            endpoint, itertools.islice(jobs, max_requests), concurrency, fmt, duration, timeout, rewrite=rewrite, tag="replay",
+        )
+
+
+def record_capture(src: str, dst: str, batch_rows: int = 500) -> Tuple[int, int]:
+    """
+    Convierte lecturas reales capturadas (NDJSON como el de /ingest/stream,
+    opcionalmente .gz) en una grabación: lotes de `batch_rows` lecturas, cada
+    uno en el instante de su primera lectura respecto a la primera del fichero.
+    Devuelve (lotes, lecturas).
+    """
+    opener = gzip.open if src.endswith(".gz") else open
+
+    def batches() -> Iterator[List[Dict[str, Any]]]:
+        batch: List[Dict[str, Any]] = []
+        with opener(src, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= batch_rows:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    rw: Optional[RecordingWriter] = None
+    t_s = 0.0
+    for batch in batches():
+        body = binfmt.encode(batch)
+        _, rec = binfmt.decode(body)
+        ts = rec["ts_us"][rec["ts_us"] != binfmt.TS_NULL]
+        if rw is None:
+            rw = RecordingWriter(dst, start_us=int(ts.min()) if len(ts) else time.time_ns() // 1000)
+        if len(ts):
+            # Lotes sin ts salen junto al anterior; nunca antes (orden de captura).
+            t_s = max(t_s, (int(ts.min()) - rw.start_us) / 1e6)
+        rw.write(t_s, body)
+    if rw is None:
+        rw = RecordingWriter(dst, start_us=time.time_ns() // 1000)
+    rw.close()
+    return rw.frames, rw.rows
+
+
 def run_stream(
     api_url: str,
     nodes: int,
@@ -84,11 +431,14 @@ def run_stream(
     failure_bias: float,
     seed: int | None,
     max_batches: int | None,
+    fmt: str = "json",
 ) -> None:
     """
     Bucle de envío:
       - Cada 'period' segundos, envía un lote con N lecturas (una por nodo).
       - Si 'max_batches' es None, corre indefinidamente.
+      - fmt="json" envía el cuerpo JSON de siempre; fmt="binary" el formato
+        binario de app/binfmt.py (mismo contenido, menos bytes y sin floats en texto).
     """
     if seed is not None:
         np.random.seed(seed)
@@ -97,14 +447,25 @@ def run_stream(
     endpoint = api_url.rstrip("/") + "/ingest"
 
     print(f"[sim] enviando a: {endpoint}")
-    print(f"[sim] nodos: {node_ids} | periodo: {period}s | degrade_chance: {degrade_chance} | failure_bias: {failure_bias}")
+    print(f"[sim] nodos: {node_ids} | periodo: {period}s | degrade_chance: {degrade_chance} | failure_bias: {failure_bias} | formato: {fmt}")
 
     sent = 0
+    rows_sent = 0
+    bytes_sent = 0
+    t_start = time.perf_counter()
     while True:
         payload = build_batch(node_ids, degrade_chance, failure_bias)
 
         try:
-            r = requests.post(endpoint, json=payload, timeout=5)
+            if fmt == "binary":
+                body = binfmt.encode(payload["readings"])
+                headers = {"Content-Type": binfmt.CONTENT_TYPE}
+            else:
+                body = json.dumps(payload).encode("utf-8")
+                headers = {"Content-Type": "application/json"}
+            r = requests.post(endpoint, data=body, headers=headers, timeout=5)
+            rows_sent += len(payload["readings"])
+            bytes_sent += len(body)
             ok = r.status_code
             print(f"[sim] {utcnow().isoformat()} -> HTTP {ok} :: {r.text[:120]}")
 
@@ -113,7 +474,9 @@ def run_stream(
 
         sent += 1
         if max_batches is not None and sent >= max_batches:
+            elapsed = time.perf_counter() - t_start
             print("[sim] fin: alcanzado max_batches")
+            print(f"[sim] {rows_sent} lecturas | {bytes_sent} bytes ({bytes_sent / max(rows_sent, 1):.1f} B/lectura) | {rows_sent / elapsed:.0f} lecturas/s")
             break
 
         time.sleep(period)
@@ -129,17 +492,70 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument("--failure-bias", type=float, default=0.05, help="Sesgo mínimo de probabilidad de fallo")
     ap.add_argument("--seed", type=int, default=42, help="Semilla para reproducibilidad (None para aleatorio)")
     ap.add_argument("--max-batches", type=int, default=None, help="Número de lotes y salir (None = infinito)")
+    ap.add_argument("--format", choices=["json", "binary"], default="json", help="Formato del cuerpo enviado a /ingest")
+
+    # Modo carga
+    ap.add_argument("--load", action="store_true", help="Modo carga: lotes vectorizados y envíos concurrentes a ritmo objetivo")
+    ap.add_argument("--batch-rows", type=int, default=500, help="[load] Lecturas por petición")
+    ap.add_argument("--concurrency", type=int, default=32, help="[load] Emisores concurrentes (= conexiones keep-alive)")
+    ap.add_argument("--rps", type=float, default=None, help="[load] Peticiones/s objetivo (sin --rps ni --rows-rate: sin límite)")
+    ap.add_argument("--rows-rate", type=float, default=None, help="[load] Lecturas/s objetivo (alternativa a --rps)")
+    ap.add_argument("--duration", type=float, default=None, help="[load/replay] Segundos de envío (load: 10 si tampoco hay --max-batches)")
+    ap.add_argument("--timeout", type=float, default=30.0, help="[load/replay] Timeout por petición (s)")
+
+    # Record & replay
+    ap.add_argument("--record", default=None, help="[load] Graba los lotes enviados en este fichero (.snrec, gzip)")
+    ap.add_argument("--record-from", default=None, help="Con --record: convierte lecturas capturadas (NDJSON, .gz opcional) en grabación, sin enviar")
+    ap.add_argument("--replay", default=None, help="Reproduce una grabación contra /ingest")
+    ap.add_argument("--speed", type=float, default=1.0, help="[replay] 1 = tiempos originales, N = N veces más rápido, 0 = lo más rápido posible")
+    ap.add_argument("--rewrite-ts", action="store_true", help="[replay] Desplaza los ts de cada lote a su hora de envío")
     return ap.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    run_stream(
-        api_url=args.api,
-        nodes=args.nodes,
-        period=args.period,
-        degrade_chance=args.degrade,
-        failure_bias=args.failure_bias,
-        seed=args.seed,
-        max_batches=args.max_batches,
-    )
\ No newline at end of file
+    if args.record_from:
+        if not args.record:
+            raise SystemExit("--record-from necesita --record")
+        frames, rows = record_capture(args.record_from, args.record, args.batch_rows)
+        print(f"[record] {frames} lotes ({rows} lecturas) en {args.record}")
+    elif args.replay:
+        asyncio.run(run_replay(
+            api_url=args.api,
+            path=args.replay,
+            speed=args.speed,
+            rewrite=args.rewrite_ts,
+            concurrency=args.concurrency,
+            fmt=args.format,
+            duration=args.duration,
+            max_requests=args.max_batches,
+            timeout=args.timeout,
+        ))
+    elif args.load:
+        asyncio.run(run_load(
+            api_url=args.api,
+            nodes=args.nodes,
+            batch_rows=args.batch_rows,
+            concurrency=args.concurrency,
+            degrade_chance=args.degrade,
+            failure_bias=args.failure_bias,
+            seed=args.seed,
+            rps=args.rps,
+            rows_rate=args.rows_rate,
+            duration=args.duration if args.duration or args.max_batches else 10.0,
+            max_requests=args.max_batches,
+            fmt=args.format,
+            timeout=args.timeout,
+            record=args.record,
+        ))
+    else:
+        run_stream(
+            api_url=args.api,
+            nodes=args.nodes,
+            period=args.period,
+            degrade_chance=args.degrade,
+            failure_bias=args.failure_bias,
+            seed=args.seed,
+            max_batches=args.max_batches,
+            fmt=args.format,
+        )
\ No newline at end of file
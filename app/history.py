@@ -0,0 +1,259 @@
+# app/history.py
+# ------------------------------------------------------------
+# Histórico de un nodo (GET /nodes/{node_id}/readings):
+#  - escaneo por rango sobre ix_sensor_readings_node_ts en orden (ts, id)
+#    con paginación keyset: cada chunk es una consulta corta
+#    (node_id = ? AND (ts, id) > cursor), nunca OFFSET
+#  - downsampling en el servidor: avg/min/max/p95 por bucket de `step`
+#    (alineados a la época, como window_agg), calculado por chunks con NumPy
+#  - la respuesta se genera como un iterador de bytes (StreamingResponse):
+#    la memoria depende del chunk, no del tamaño de la página
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import json
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, or_, select
+from sqlalchemy.engine import Engine
+
+from .models import SensorReading
+
+METRICS = ["latency_ms", "jitter_ms", "rssi_dbm", "noise_dbm"]
+_EPOCH = datetime(1970, 1, 1)
+
+_COLS = [SensorReading.id, SensorReading.ts, *(getattr(SensorReading, m) for m in METRICS), SensorReading.failure]
+
+
+class HistoryQueryError(ValueError):
+    """Parámetros de consulta inválidos (step, cursor o rango) ⇒ 422."""
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Última fila entregada: (ts en µs desde la época UTC, id)."""
+    ts_us: int
+    id: int
+
+    def encode(self) -> str:
+        return f"{self.ts_us}-{self.id}"
+
+    @classmethod
+    def decode(cls, raw: str) -> "Cursor":
+        try:
+            ts_us, id_ = raw.rsplit("-", 1)     # ts_us < 0 antes de 1970
+            return cls(int(ts_us), int(id_))
+        except ValueError:
+            raise HistoryQueryError(f"cursor inválido: {raw!r}") from None
+
+
+def parse_step(step: Optional[str]) -> Optional[int]:
+    """'15min' → µs; None = lecturas crudas sin agregar. Sólo pasos fijos (no meses)."""
+    if step is None:
+        return None
+    try:
+        td = pd.Timedelta(step)
+    except (ValueError, TypeError):
+        raise HistoryQueryError(f"step inválido: {step!r} (usa p.ej. 1min, 15min, 1h, 1D)") from None
+    if td <= pd.Timedelta(0):
+        raise HistoryQueryError("step debe ser positivo")
+    return td.value // 1000
+
+
+def _naive_utc(dt: datetime) -> datetime:
+    """ts para comparar con la BD: UTC sin tz (SQLite guarda UTC naive)."""
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def _to_us(ts: List[datetime]) -> np.ndarray:
+    return np.array([_naive_utc(t) for t in ts], dtype="datetime64[us]").view(np.int64)
+
+
+def _iso(us: int) -> str:
+    return (_EPOCH + timedelta(microseconds=int(us))).replace(tzinfo=timezone.utc).isoformat()
+
+
+def scan_readings(
+    engine: Engine,
+    node_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[Cursor] = None,
+    chunk_rows: int = 5000,
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Lecturas de `node_id` con ts en [start, end) posteriores a `after`,
+    en orden (ts, id) y por chunks de como mucho `chunk_rows`.
+    Cada chunk: (ids int64, ts µs int64, métricas float64 [n, 4], failure bool).
+    Una conexión por chunk: no se mantiene una transacción de lectura
+    abierta mientras el cliente consume la respuesta.
+    """
+    t = SensorReading
+    where = [t.node_id == node_id]
+    if start is not None:
+        where.append(t.ts >= _naive_utc(start))
+    if end is not None:
+        where.append(t.ts < _naive_utc(end))
+
+    last = after
+    while True:
+        stmt = select(*_COLS).where(*where)
+        if last is not None:
+            # ts >= cursor acota el rango del índice; el OR resuelve empates de ts.
+            ts = (_EPOCH + timedelta(microseconds=last.ts_us))
+            stmt = stmt.where(t.ts >= ts, or_(t.ts > ts, and_(t.ts == ts, t.id > last.id)))
+        stmt = stmt.order_by(t.ts, t.id).limit(chunk_rows)
+        with engine.connect() as conn:
+            rows = conn.execute(stmt).all()
+        if not rows:
+            return
+        ids, ts_col, *cols = zip(*rows)
+        ts_us = _to_us(ts_col)
+        values = np.column_stack([np.asarray(c, dtype=np.float64) for c in cols[:-1]])
+        failure = np.array([bool(f) for f in cols[-1]])
+        yield np.asarray(ids, dtype=np.int64), ts_us, values, failure
+        if len(rows) < chunk_rows:
+            return
+        last = Cursor(int(ts_us[-1]), int(ids[-1]))
+
+
+def _num(x: float) -> Optional[float]:
+    """NaN/inf no son JSON válido: salen como null."""
+    return x if math.isfinite(x) else None
+
+
+def _raw_items(ids, ts_us, values, failure) -> List[dict]:
+    to_num = float if np.isfinite(values).all() else (lambda x: _num(float(x)))
+    return [
+        {"id": int(i), "ts": _iso(t), **dict(zip(METRICS, map(to_num, v))), "failure": bool(f)}
+        for i, t, v, f in zip(ids, ts_us, values, failure)
+    ]
+
+
+def _merged_bucket(start_us: int, parts: List[Tuple[np.ndarray, ...]]) -> dict:
+    if len(parts) == 1:
+        return _bucket_item(start_us, parts[0][2], parts[0][3])
+    return _bucket_item(
+        start_us, np.concatenate([p[2] for p in parts]), np.concatenate([p[3] for p in parts])
+    )
+
+
+def _bucket_item(start_us: int, values: np.ndarray, failure: np.ndarray) -> dict:
+    item = {"ts": _iso(start_us), "n": int(len(values))}
+    p95 = np.percentile(values, 95, axis=0)
+    for j, m in enumerate(METRICS):
+        col = values[:, j]
+        item[f"{m}_avg"] = _num(float(col.mean()))
+        item[f"{m}_min"] = _num(float(col.min()))
+        item[f"{m}_max"] = _num(float(col.max()))
+        item[f"{m}_p95"] = _num(float(p95[j]))
+    item["failures"] = int(failure.sum())
+    return item
+
+
+def iter_page(
+    engine: Engine,
+    node_id: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    step_us: Optional[int],
+    limit: int,
+    after: Optional[Cursor] = None,
+    chunk_rows: int = 5000,
+) -> Iterator[Tuple[List[dict], Optional[Cursor]]]:
+    """
+    Genera la página como lotes de items. El último lote lleva el cursor
+    de la página siguiente (None si no hay más datos).
+    - step_us None: lecturas crudas, `limit` lecturas por página.
+    - step_us: buckets de step, `limit` buckets por página. Un bucket sólo
+      se emite completo (al ver una lectura del siguiente o el final), así
+      el cursor cae siempre en un borde de bucket.
+    """
+    # 1) Crudas: con chunks de limit+1 filas sabemos si hay página siguiente
+    #    sin una consulta extra.
+    if step_us is None:
+        sent, last = 0, after
+        for ids, ts_us, values, failure in scan_readings(
+            engine, node_id, start, end, after, chunk_rows=min(chunk_rows, limit + 1)
+        ):
+            take = min(len(ids), limit - sent)
+            if take:
+                yield _raw_items(ids[:take], ts_us[:take], values[:take], failure[:take]), None
+                sent += take
+                last = Cursor(int(ts_us[take - 1]), int(ids[take - 1]))
+            if take < len(ids):
+                yield [], last
+                return
+        return
+
+    # 2) Downsampling: los trozos del bucket abierto (uno por chunk que
+    #    toca) se guardan y se concatenan una sola vez, al cerrarlo.
+    sent = 0
+    open_b: Optional[int] = None
+    parts: List[Tuple[np.ndarray, ...]] = []
+    for ids, ts_us, values, failure in scan_readings(engine, node_id, start, end, after, chunk_rows=chunk_rows):
+        buckets = ts_us // step_us
+        bounds = np.flatnonzero(np.diff(buckets)) + 1
+        starts = np.concatenate([[0], bounds])
+        ends = np.concatenate([bounds, [len(ids)]])
+
+        items = []
+        for s, e in zip(starts, ends):
+            b = int(buckets[s])
+            if parts and b != open_b:
+                # Empieza otro bucket: el abierto está completo.
+                items.append(_merged_bucket(open_b * step_us, parts))
+                sent += 1
+                if sent == limit:
+                    last_ids, last_ts = parts[-1][0], parts[-1][1]
+                    yield items, Cursor(int(last_ts[-1]), int(last_ids[-1]))
+                    return
+                parts = []
+            open_b = b
+            parts.append((ids[s:e], ts_us[s:e], values[s:e], failure[s:e]))
+        if items:
+            yield items, None
+
+    if parts:
+        yield [_merged_bucket(open_b * step_us, parts)], None
+
+
+def stream_page(
+    engine: Engine,
+    node_id: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    step: Optional[str],
+    limit: int,
+    cursor: Optional[str] = None,
+    chunk_rows: int = 5000,
+) -> Iterator[bytes]:
+    """
+    Cuerpo JSON de la página, por trozos:
+    {"node_id", "step", "items": [...], "next_cursor"}.
+    Valida step y cursor ANTES de empezar a emitir (para poder responder 422).
+    """
+    step_us = parse_step(step)
+    after = Cursor.decode(cursor) if cursor else None
+    start = _naive_utc(start) if start is not None else None
+    end = _naive_utc(end) if end is not None else None
+    if start is not None and end is not None and start >= end:
+        raise HistoryQueryError("'from' debe ser anterior a 'to'")
+
+    def body() -> Iterator[bytes]:
+        head = {"node_id": node_id, "step": step}
+        yield json.dumps(head)[:-1].encode() + b', "items": ['
+        first, nxt = True, None
+        for items, nxt in iter_page(engine, node_id, start, end, step_us, limit, after, chunk_rows):
+            if items:
+                part = ", ".join(json.dumps(i, allow_nan=False) for i in items)
+                yield (part if first else ", " + part).encode()
+                first = False
+        yield b'], "next_cursor": ' + json.dumps(nxt.encode() if nxt else None).encode() + b"}"
+
+    return body()
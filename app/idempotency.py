@@ -0,0 +1,135 @@
+# app/idempotency.py
+# ------------------------------------------------------------
+# Ingesta idempotente (INGEST_DEDUP=1): los gateways y el simulador
+# reintentan tras un timeout y el lote puede llegar dos veces.
+#  - IdempotencyCache: respuesta de /ingest por clave de lote (cabecera
+#    Idempotency-Key) en un LRU acotado con TTL, junto a la huella del
+#    cuerpo: la misma clave con otro cuerpo es un error del cliente (422),
+#    no un reintento. Un reintento que llega mientras el original sigue en
+#    curso espera a su resultado en vez de escribir otra vez; si el
+#    original falla, el reintento se ejecuta
+#  - RecentKeys: claves (node_id, ts) confirmadas hace poco (FIFO acotado)
+#    para descartar lecturas repetidas sin ir a la BD; la garantía la da el
+#    índice único (node_id, ts) con INSERT ... ON CONFLICT DO NOTHING
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+
+class IdempotencyConflict(Exception):
+    """Clave de idempotencia reutilizada con un cuerpo distinto."""
+
+
+class RecentKeys:
+    """
+    Conjunto FIFO de claves (node_id, ts) ya escritas; al superar `max_keys`
+    se olvidan las más antiguas. Es sólo un atajo: un fallo (clave olvidada,
+    otro proceso) acaba en el índice único de la BD.
+    """
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        self._keys: "OrderedDict[tuple, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter_groups(self, groups: List[List[dict]]) -> List[List[dict]]:
+        """
+        Quita de cada lote las lecturas ya vistas: en `groups` anteriores, en el
+        propio lote o en el filtro. No apunta nada (ver `add`, tras el commit).
+        """
+        seen = set()
+        out: List[List[dict]] = []
+        with self._lock:
+            keys = self._keys
+            for rows in groups:
+                kept = []
+                for row in rows:
+                    key = (row["node_id"], row["ts"])
+                    if key in seen or key in keys:
+                        continue
+                    seen.add(key)
+                    kept.append(row)
+                out.append(kept)
+        return out
+
+    def add(self, rows: List[dict]) -> None:
+        """Apunta las claves de filas ya confirmadas (node_id internado: hay pocos nodos)."""
+        with self._lock:
+            keys = self._keys
+            for row in rows:
+                keys[(sys.intern(row["node_id"]), row["ts"])] = None
+            for _ in range(len(keys) - self.max_keys):
+                keys.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class IdempotencyCache:
+    """
+    Respuestas por clave de idempotencia (sólo las correctas): LRU de
+    `max_keys` entradas que caducan a los `ttl` segundos. Se usa desde el
+    event loop (sin locks).
+    """
+
+    def __init__(self, max_keys: int = 10_000, ttl: float = 300.0) -> None:
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._done: "OrderedDict[str, Tuple[float, str, dict]]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self.replayed = 0
+
+    def _lookup(self, key: str, now: float):
+        hit = self._done.get(key)
+        if hit is None:
+            return None
+        if hit[0] <= now:
+            del self._done[key]
+            return None
+        self._done.move_to_end(key)
+        return hit[1:]
+
+    async def run(self, key: str, fingerprint: str, fn: Callable[[], Awaitable[dict]]) -> Tuple[dict, bool]:
+        """
+        Devuelve (respuesta, repetida). Con la clave ya resuelta, la respuesta
+        guardada; si no, ejecuta `fn` (una sola vez por clave a la vez).
+        `fingerprint` identifica el cuerpo: si la clave ya se usó (o está en
+        curso) con otro, lanza IdempotencyConflict.
+        """
+        while True:
+            hit = self._lookup(key, time.monotonic())
+            if hit is not None:
+                if hit[0] != fingerprint:
+                    raise IdempotencyConflict(key)
+                self.replayed += 1
+                return hit[1], True
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            if pending[0] != fingerprint:
+                raise IdempotencyConflict(key)
+            # shield: si cancelan a quien espera, no se cancela al original
+            await asyncio.shield(pending[1])
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (fingerprint, fut)
+        try:
+            result = await fn()
+            now = time.monotonic()
+            self._done[key] = (now + self.ttl, fingerprint, result)
+            self._done.move_to_end(key)
+            while self._done and (len(self._done) > self.max_keys or next(iter(self._done.values()))[0] <= now):
+                self._done.popitem(last=False)
+            return result, False
+        finally:
+            del self._inflight[key]
+            fut.set_result(None)
+
+    def stats(self) -> dict:
+        return {"keys": len(self._done), "in_flight": len(self._inflight), "replayed": self.replayed}
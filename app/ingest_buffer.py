@@ -0,0 +1,258 @@
+# app/ingest_buffer.py
+# ------------------------------------------------------------
+# Buffer write-behind para /ingest:
+#  - /ingest encola las filas y responde sin esperar al commit
+#  - un hilo de fondo vuelca la cola a sensor_readings en UNA
+#    transacción cuando se alcanza un tamaño o un tiempo máximo
+#  - si la cola (más el lote que se está volcando) está llena, `put`
+#    lanza BufferFull (el router lo traduce a HTTP 503 con Retry-After)
+#  - un volcado fallido se reintenta `flush_retries` veces con espera
+#    creciente; si sigue fallando, las filas (ya respondidas con 200) se
+#    guardan como NDJSON en `spill_dir` para reenviarlas a /ingest/stream
+#    y la cola sigue avanzando
+#  - al apagar la app, `stop` vacía la cola antes de salir
+#  - con SQLITE_WRITER, cada volcado se entrega al escritor único
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from .crud import insert_rows
+
+if TYPE_CHECKING:
+    from .sqlite_writer import SQLiteWriter
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFull(Exception):
+    """La cola write-behind no admite más filas (backpressure)."""
+
+
+class IngestBuffer:
+    """
+    Cola en memoria de filas pendientes de escribir.
+
+    - max_rows: capacidad total (cola + lote en vuelo); por encima, `put`
+      rechaza el lote entero.
+    - flush_rows: al llegar a este nº de filas se despierta al hilo de volcado.
+    - flush_interval: segundos máximos que una fila puede esperar en la cola.
+    - flush_retries: intentos extra de un volcado fallido.
+    - spill_dir: dónde guardar lo que no se pudo volcar tras los reintentos.
+    - writer: escritor único de SQLite; si se indica, los volcados se le
+      entregan en vez de abrir una Session propia.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_rows: int = 50_000,
+        flush_rows: int = 1_000,
+        flush_interval: float = 0.5,
+        flush_retries: int = 5,
+        spill_dir: str = "ingest_spill",
+        writer: Optional["SQLiteWriter"] = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self._writer = writer
+        self.max_rows = max_rows
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.flush_retries = flush_retries
+        self.spill_dir = spill_dir
+
+        self._rows: List[dict] = []
+        self._inflight = 0              # filas del lote que se está volcando
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+        # Métricas para ajustar los umbrales.
+        self._flushes = 0
+        self._flushed_rows = 0
+        self._deduplicated_rows = 0     # repetidas descartadas al volcar (INGEST_DEDUP)
+        self._rejected_batches = 0
+        self._flush_errors = 0
+        self._spilled_rows = 0
+        self._last_flush_rows = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    # --- ciclo de vida ---
+    def start(self) -> None:
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="ingest-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Pide parar al hilo de fondo y espera a que vacíe la cola."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # --- productor (/ingest) ---
+    def put(self, rows: List[dict]) -> int:
+        """
+        Encola `rows` (dicts planos de `crud.reading_rows`).
+        Lanza BufferFull si no caben o si el buffer se está apagando.
+        """
+        with self._cond:
+            if self._stopping or len(self._rows) + self._inflight + len(rows) > self.max_rows:
+                self._rejected_batches += 1
+                raise BufferFull()
+            self._rows.extend(rows)
+            if len(self._rows) >= self.flush_rows:
+                self._cond.notify()
+        return len(rows)
+
+    # --- consumidor (hilo de fondo) ---
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopping and len(self._rows) < self.flush_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._rows = self._rows, []
+                self._inflight = len(batch)
+                stopping = self._stopping
+
+            if batch:
+                # El lote sigue contando para la capacidad mientras se
+                # reintenta (backpressure); si no entra, a disco.
+                if not self._flush(batch):
+                    for attempt in range(self.flush_retries):
+                        time.sleep(self.flush_interval * (attempt + 1))
+                        if self._flush(batch):
+                            break
+                    else:
+                        self._spill(batch)
+                with self._cond:
+                    self._inflight = 0
+
+            if stopping:
+                with self._cond:
+                    if not self._rows:
+                        return
+
+    def _flush(self, batch: List[dict]) -> bool:
+        t = time.perf_counter()
+        if self._writer is not None:
+            try:
+                inserted = self._writer.submit(batch).result()
+            except Exception:
+                self._record_error(len(batch))
+                return False
+            self._record_flush(len(batch), inserted, t)
+            return True
+
+        db = self._session_factory()
+        try:
+            inserted = insert_rows(db, batch)
+        except Exception:
+            db.rollback()
+            self._record_error(len(batch))
+            return False
+        finally:
+            db.close()
+
+        self._record_flush(len(batch), inserted, t)
+        return True
+
+    def _record_flush(self, n: int, inserted: int, t0: float) -> None:
+        ms = (time.perf_counter() - t0) * 1000.0
+        with self._cond:
+            self._flushes += 1
+            self._flushed_rows += inserted
+            self._deduplicated_rows += n - inserted
+            self._last_flush_rows = n
+            self._last_flush_ms = ms
+            self._max_flush_ms = max(self._max_flush_ms, ms)
+            self._total_flush_ms += ms
+
+    def _record_error(self, n: int) -> None:
+        with self._cond:
+            self._flush_errors += 1
+        logger.exception("ingest-buffer: fallo al volcar %d filas", n)
+
+    def _spill(self, batch: List[dict]) -> None:
+        """Guarda en NDJSON (formato de /ingest/stream) lo que no se pudo volcar."""
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = os.path.join(self.spill_dir, f"ingest-{stamp}-{os.getpid()}.ndjson")
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                for row in batch:
+                    f.write(json.dumps({**row, "ts": row["ts"].isoformat() if row["ts"] is not None else None}))
+                    f.write("\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError:
+            logger.critical("ingest-buffer: se pierden %d filas: no se pudieron volcar ni guardar en %s",
+                            len(batch), path, exc_info=True)
+            return
+        with self._cond:
+            self._spilled_rows += len(batch)
+        logger.error("ingest-buffer: %d filas sin volcar guardadas en %s (reenvíalas a /ingest/stream)", len(batch), path)
+
+    # --- observabilidad ---
+    @property
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._rows)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "depth": len(self._rows),
+                "inflight_rows": self._inflight,
+                "max_rows": self.max_rows,
+                "flush_rows": self.flush_rows,
+                "flush_interval_s": self.flush_interval,
+                "flushes": self._flushes,
+                "flushed_rows": self._flushed_rows,
+                "deduplicated_rows": self._deduplicated_rows,
+                "rejected_batches": self._rejected_batches,
+                "flush_errors": self._flush_errors,
+                "spilled_rows": self._spilled_rows,
+                "last_flush_rows": self._last_flush_rows,
+                "last_flush_ms": round(self._last_flush_ms, 3),
+                "max_flush_ms": round(self._max_flush_ms, 3),
+                "avg_flush_ms": round(self._total_flush_ms / self._flushes, 3) if self._flushes else 0.0,
+            }
+
+
+# Instancia única del proceso (None si el buffer está desactivado).
+_buffer: Optional[IngestBuffer] = None
+
+
+def get_buffer() -> Optional[IngestBuffer]:
+    return _buffer
+
+
+def start_buffer(session_factory: Callable[[], Session], **kwargs) -> IngestBuffer:
+    global _buffer
+    _buffer = IngestBuffer(session_factory, **kwargs)
+    _buffer.start()
+    return _buffer
+
+
+def stop_buffer() -> None:
+    global _buffer
+    if _buffer is not None:
+        _buffer.stop()
+        _buffer = None
@@ -1,14 +1,68 @@
 # app/main.py
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, Response
 from pydantic import BaseModel
 from datetime import datetime, timezone
 
 # 1) Importamos engine y Base para poder crear las tablas
-from .db import engine
+from .db import engine, read_engine, async_engine, SessionLocal, DB_URL
 from .models import Base
+from .config import (
+    INGEST_BUFFER,
+    INGEST_BUFFER_MAX_ROWS,
+    INGEST_BUFFER_FLUSH_ROWS,
+    INGEST_BUFFER_FLUSH_INTERVAL,
+    INGEST_BUFFER_FLUSH_RETRIES,
+    INGEST_BUFFER_SPILL_DIR,
+    MODEL_PATH,
+    FEATURE_SPEC_PATH,
+    PREDICT_MAX_BATCH,
+    PREDICT_MAX_WAIT_MS,
+    MODEL_REGISTRY,
+    MODEL_POLL_INTERVAL,
+    MODEL_MMAP,
+    MAINTENANCE,
+    MAINTENANCE_INTERVAL,
+    ROLLUP_WINDOWS,
+    RETENTION,
+    RETENTION_BATCH_ROWS,
+    RETENTION_ARCHIVE_DIR,
+    SQLITE_WRITER,
+    SQLITE_WRITER_MAX_PENDING,
+    SQLITE_WRITER_MAX_BATCH_ROWS,
+    SQLITE_BUSY_TIMEOUT_MS,
+    METRICS,
+    PROFILING,
+    PROFILE_HEADER,
+    PROFILE_TOKEN,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_SLOW_MS,
+    PROFILE_INTERVAL_MS,
+    PROFILE_DIR,
+    PROFILE_MAX_FILES,
+    STATUS_STREAM,
+    STATUS_STREAM_MAX_SUBSCRIBERS,
+    STATUS_STREAM_MAX_PENDING,
+    STATUS_STREAM_MAX_LAG,
+    INGEST_DEDUP,
+    STATUS_SHARED,
+    STATUS_SHM_NAME,
+    STATUS_SHM_CAPACITY,
+)
+from .crud import warm_status_cache
+from .ingest_buffer import start_buffer, stop_buffer
+from .sqlite_writer import start_writer, stop_writer
+from .serving import start_serving, stop_serving
+from .maintenance import get_job, start_maintenance, stop_maintenance
+from . import metrics, state
+from .profiling import ProfileStore, ProfilingMiddleware, install_sql_hooks
+from .status_stream import close_on_exit_signals, start_broker, stop_broker
+from .shm_state import SharedNodeTable, default_name
+from ml.maintenance import ensure_dedup_index
 
 # 2) Routers (ya actualizados a BD)
-from .routers import ingest, status
+from .routers import ingest, status, predict, nodes
 
 app = FastAPI(
     title="SmartNet Predictor",
@@ -26,9 +80,105 @@ class HealthResponse(BaseModel):
 def on_startup():
     """
     Hook de arranque:
-    - Crea las tablas si no existen (idempotente).
+    - Crea las tablas si no existen (idempotente) y, con INGEST_DEDUP, el
+      índice único (node_id, ts) (falla si ya hay lecturas repetidas).
+    - Rellena node_latest si hace falta y carga la caché de /status (con
+      STATUS_SHARED, la tabla en memoria compartida entre workers).
+    - Arranca el escritor único de SQLite si está activado (antes que el
+      buffer, que le entrega sus volcados).
+    - Arranca el buffer write-behind de /ingest si está activado.
+    - Arranca el mantenimiento periódico (rollups + retención) si está activado.
     """
     Base.metadata.create_all(bind=engine)
+    if INGEST_DEDUP:
+        ensure_dedup_index(engine)
+    if STATUS_SHARED:
+        state.use_shared(SharedNodeTable(STATUS_SHM_NAME or default_name(DB_URL), STATUS_SHM_CAPACITY))
+    db = SessionLocal()
+    try:
+        warm_status_cache(db)
+    finally:
+        db.close()
+    writer = None
+    if SQLITE_WRITER:
+        writer = start_writer(
+            DB_URL,
+            max_pending=SQLITE_WRITER_MAX_PENDING,
+            max_batch_rows=SQLITE_WRITER_MAX_BATCH_ROWS,
+            busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS,
+        )
+    if INGEST_BUFFER:
+        start_buffer(
+            SessionLocal,
+            max_rows=INGEST_BUFFER_MAX_ROWS,
+            flush_rows=INGEST_BUFFER_FLUSH_ROWS,
+            flush_interval=INGEST_BUFFER_FLUSH_INTERVAL,
+            flush_retries=INGEST_BUFFER_FLUSH_RETRIES,
+            spill_dir=INGEST_BUFFER_SPILL_DIR,
+            writer=writer,
+        )
+    if MAINTENANCE:
+        start_maintenance(
+            db_url=DB_URL,
+            interval=MAINTENANCE_INTERVAL,
+            windows=ROLLUP_WINDOWS,
+            retention=RETENTION,
+            batch_rows=RETENTION_BATCH_ROWS,
+            archive_dir=RETENTION_ARCHIVE_DIR,
+        )
+
+@app.on_event("startup")
+async def on_startup_serving():
+    """
+    Carga el modelo de /predict una sola vez (versión publicada del registro
+    o artefactos sueltos), arranca el micro-batcher y el watcher de versiones.
+    """
+    await start_serving(
+        MODEL_REGISTRY,
+        MODEL_PATH,
+        FEATURE_SPEC_PATH,
+        max_batch=PREDICT_MAX_BATCH,
+        max_wait_ms=PREDICT_MAX_WAIT_MS,
+        poll_interval=MODEL_POLL_INTERVAL,
+        mmap=MODEL_MMAP,
+    )
+
+@app.on_event("startup")
+async def on_startup_stream():
+    """
+    Enlaza el broker del stream de estado al event loop que sirve la app y
+    cierra los streams abiertos cuando uvicorn recibe la señal de apagado.
+    """
+    if STATUS_STREAM:
+        broker = start_broker(
+            asyncio.get_running_loop(),
+            max_subscribers=STATUS_STREAM_MAX_SUBSCRIBERS,
+            max_pending=STATUS_STREAM_MAX_PENDING,
+            max_lag=STATUS_STREAM_MAX_LAG,
+        )
+        close_on_exit_signals(broker)
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """
+    Hook de apagado:
+    - Vacía el buffer write-behind (si existe) antes de salir.
+    - Escribe lo pendiente en el escritor único y lo para.
+    - Para el mantenimiento (termina el lote de borrado en curso).
+    - Suelta la tabla compartida de /status (el segmento sigue para los
+      demás workers).
+    """
+    stop_buffer()
+    stop_writer()
+    stop_maintenance()
+    state.use_shared(None)
+
+@app.on_event("shutdown")
+async def on_shutdown_serving():
+    stop_broker()
+    await stop_serving()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 @app.get("/", summary="Welcome endpoint")
 def root():
@@ -43,6 +193,37 @@ def health() -> HealthResponse:
         time_utc=datetime.now(timezone.utc),
     )
 
+@app.get("/maintenance", summary="Estado del mantenimiento (rollups + retención)")
+def maintenance_stats() -> dict:
+    job = get_job()
+    if job is None:
+        return {"enabled": False}
+    return {"enabled": True, **job.stats()}
+
+if METRICS:
+    # Middleware ASGI puro: ~µs por petición (ver bench/bench_metrics.py)
+    app.add_middleware(metrics.MetricsMiddleware, stream_paths=status.STREAM_PATHS)
+
+    @app.get("/metrics", summary="Métricas en formato texto de Prometheus")
+    def metrics_endpoint() -> Response:
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+if PROFILING:
+    # SQL de la petición en curso desde los engines de app/db.py
+    install_sql_hooks(engine, read_engine, async_engine.sync_engine if async_engine is not None else None)
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=ProfileStore(PROFILE_DIR, PROFILE_MAX_FILES),
+        header=PROFILE_HEADER,
+        token=PROFILE_TOKEN,
+        sample_rate=PROFILE_SAMPLE_RATE,
+        slow_ms=PROFILE_SLOW_MS,
+        interval_ms=PROFILE_INTERVAL_MS,
+        stream_paths=status.STREAM_PATHS,
+    )
+
 # Montaje de routers (API modular)
 app.include_router(ingest.router)
 app.include_router(status.router)
+app.include_router(predict.router)
+app.include_router(nodes.router)
@@ -0,0 +1,120 @@
+# app/maintenance.py
+# ------------------------------------------------------------
+# Trabajo de mantenimiento en segundo plano (opcional):
+#  - cada `interval` segundos ejecuta ml.maintenance.run_maintenance
+#    (rollups 1min/15min/1h + retención de lecturas crudas)
+#  - corre en un hilo propio: el event loop y /ingest no esperan; la
+#    retención borra por lotes cortos para no bloquear al escritor
+#  - guarda el resumen de la última ejecución para GET /maintenance
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from ml.maintenance import run_maintenance
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceJob:
+    """
+    Hilo que lanza run_maintenance periódicamente.
+
+    - windows: resoluciones de rollup.
+    - retention: antigüedad máxima de las lecturas crudas ("30D"); None = no borrar.
+    - batch_rows / archive_dir: ver ml.maintenance.apply_retention.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        interval: float,
+        windows: Sequence[str],
+        retention: Optional[str] = None,
+        batch_rows: int = 5000,
+        archive_dir: Optional[str] = None,
+    ) -> None:
+        self.db_url = db_url
+        self.interval = interval
+        self.windows: List[str] = list(windows)
+        self.retention = retention
+        self.batch_rows = batch_rows
+        self.archive_dir = archive_dir
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self.runs = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 30.0) -> None:
+        """
+        Pide parar; si hay una ejecución en curso, termina su lote (o rollup)
+        actual. Espera como mucho `timeout` s: el hilo es daemon.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning("maintenance: la ejecución en curso no terminó en %.1f s", timeout)
+            self._thread = None
+
+    def run_once(self) -> Dict[str, Any]:
+        result = run_maintenance(
+            windows=self.windows,
+            retention=self.retention,
+            db_url=self.db_url,
+            batch_rows=self.batch_rows,
+            archive_dir=self.archive_dir,
+            stop=self._stop,
+        )
+        self.last_run = {"finished_at": time.time(), **result}
+        self.runs += 1
+        return result
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = repr(e)
+                logger.exception("maintenance: fallo en la ejecución periódica")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "windows": self.windows,
+            "retention": self.retention,
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
+
+
+# Instancia del proceso (None si el mantenimiento está desactivado).
+_job: Optional[MaintenanceJob] = None
+
+
+def get_job() -> Optional[MaintenanceJob]:
+    return _job
+
+
+def start_maintenance(**kwargs: Any) -> MaintenanceJob:
+    global _job
+    _job = MaintenanceJob(**kwargs)
+    _job.start()
+    return _job
+
+
+def stop_maintenance() -> None:
+    global _job
+    if _job is not None:
+        _job.stop()
+        _job = None
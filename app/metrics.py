@@ -0,0 +1,288 @@
+# app/metrics.py
+# ------------------------------------------------------------
+# Métricas en formato texto de Prometheus (GET /metrics), sin dependencias:
+#  - Counter / Gauge / Histogram con etiquetas; cada serie guarda sus
+#    contadores en listas y un lock propio (observe < 1 µs)
+#  - MetricsMiddleware: middleware ASGI puro (sin BaseHTTPMiddleware) que
+#    mide cada petición por método + plantilla de ruta (/nodes/{node_id}/...,
+#    no la URL concreta: la cardinalidad no crece con los node_id)
+#  - métricas de la app definidas aquí: HTTP, filas ingeridas, tamaño de
+#    lote, tiempos de BD por operación, sesiones abiertas y suscriptores del
+#    stream de estado
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latencias (segundos): de 0.5 ms a 10 s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Tamaños de lote (filas)
+SIZE_BUCKETS = (1, 10, 50, 100, 500, 1_000, 5_000, 10_000, 50_000)
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labels)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()  # sin etiquetas: la serie existe (a 0) desde el principio
+        REGISTRY.append(self)
+
+    def labels(self, *values: str):
+        """Serie de estas etiquetas (se crea la primera vez)."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        # Métricas sin etiquetas: una única serie
+        return self.labels()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self, name: str, labelnames, values) -> List[str]:
+        return [f"{name}{_label_str(labelnames, values)} {_fmt(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+
+class _HistogramSeries:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # el último es +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+    def render(self, name: str, labelnames, values) -> List[str]:
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines, acc = [], 0
+        for bound, c in zip((*self.bounds, math.inf), counts):
+            acc += c
+            le = 'le="' + _fmt(bound) + '"'
+            lines.append(f"{name}_bucket{_label_str(labelnames, values, le)} {acc}")
+        lines.append(f"{name}_sum{_label_str(labelnames, values)} {_fmt(total)}")
+        lines.append(f"{name}_count{_label_str(labelnames, values)} {acc}")
+        return lines
+
+
+class _Timer:
+    """Context manager que observa la duración del bloque (más barato que @contextmanager)."""
+    __slots__ = ("series", "t")
+
+    def __init__(self, series: _HistogramSeries) -> None:
+        self.series = series
+
+    def __enter__(self) -> None:
+        self.t = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.series.observe(time.perf_counter() - self.t)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, doc, labels)
+
+    def _new_child(self) -> _HistogramSeries:
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render() -> str:
+    """Todas las métricas registradas en formato texto de Prometheus."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ------------------------------------------------------------
+# Métricas de la app
+# ------------------------------------------------------------
+HTTP_LATENCY = Histogram(
+    "smartnet_http_request_duration_seconds", "Latencia de las peticiones HTTP por método y ruta.", ("method", "route"),
+)
+HTTP_REQUESTS = Counter(
+    "smartnet_http_requests_total", "Peticiones HTTP por método, ruta y código de estado.", ("method", "route", "status"),
+)
+HTTP_IN_PROGRESS = Gauge("smartnet_http_requests_in_progress", "Peticiones HTTP en curso.")
+
+INGEST_ROWS = Counter("smartnet_ingest_rows_total", "Lecturas confirmadas en sensor_readings.")
+INGEST_DEDUPLICATED = Counter(
+    "smartnet_ingest_deduplicated_total", "Lecturas descartadas por repetidas (node_id, ts) con INGEST_DEDUP.",
+)
+INGEST_BATCH_ROWS = Histogram(
+    "smartnet_ingest_batch_rows", "Filas por transacción de escritura en sensor_readings.", buckets=SIZE_BUCKETS,
+)
+DB_SECONDS = Histogram(
+    "smartnet_db_operation_seconds",
+    "Tiempo de BD por operación (insert, upsert_latest, commit, status_query).",
+    ("op",),
+)
+DB_SESSIONS = Gauge("smartnet_db_sessions_active", "Sesiones de BD abiertas por las dependencias de FastAPI.", ("kind",))
+STREAM_SUBSCRIBERS = Gauge("smartnet_status_stream_subscribers", "Suscriptores del stream de estado (SSE + WebSocket).")
+STREAM_DROPPED = Counter("smartnet_status_stream_dropped_total", "Suscriptores del stream dados de baja por lentos.")
+
+
+def db_timer(op: str) -> _Timer:
+    """`with db_timer("commit"): db.commit()` -> smartnet_db_operation_seconds{op="commit"}."""
+    return _Timer(DB_SECONDS.labels(op))
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latencia y código de cada petición HTTP. La ruta es la
+    plantilla que resolvió el router (scope["route"]); sin coincidencia
+    (404) se agrupa en "<unmatched>". Las rutas de `stream_paths` (SSE)
+    sólo cuentan la petición: su duración es la de la conexión.
+    """
+
+    def __init__(self, app, stream_paths: Iterable[str] = ()) -> None:
+        self.app = app
+        self.stream_paths = frozenset(stream_paths)
+        self._in_progress = HTTP_IN_PROGRESS.labels()
+        # (método, ruta, código) -> (serie de latencia, contador): una sola
+        # búsqueda en dict por petición en lugar de dos labels()
+        self._series: Dict[Tuple[str, str, int], Tuple[_HistogramSeries, _Value]] = {}
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        if scope["path"] in self.stream_paths:
+            try:
+                await self.app(scope, receive, send_status)
+            finally:
+                HTTP_REQUESTS.labels(scope["method"], getattr(scope.get("route"), "path", "<unmatched>"), str(status)).inc()
+            return
+
+        self._in_progress.inc()
+        t = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = time.perf_counter() - t
+            self._in_progress.dec()
+            key = (scope["method"], getattr(scope.get("route"), "path", "<unmatched>"), status)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series.setdefault(key, (
+                    HTTP_LATENCY.labels(key[0], key[1]),
+                    HTTP_REQUESTS.labels(key[0], key[1], str(status)),
+                ))
+            series[0].observe(elapsed)
+            series[1].inc()
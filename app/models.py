@@ -26,4 +26,19 @@ class SensorReading(Base):
     # 5) Índice compuesto para acelerar consultas por (node_id, ts)
     __table_args__ = (
         Index("ix_sensor_readings_node_ts", "node_id", "ts"),
-    )
\ No newline at end of file
+    )
+
+class NodeLatest(Base):
+    """
+    Última lectura conocida por nodo (una fila por node_id).
+    Se actualiza (upsert) en la misma transacción que inserta en
+    sensor_readings, así /status no tiene que recorrer el histórico.
+    """
+    __tablename__ = "node_latest"
+
+    node_id = Column(String(64), primary_key=True)        # nodo/antena
+    ts = Column(DateTime(timezone=True), nullable=False) # ts de la última lectura
+    latency_ms = Column(Float, nullable=False)
+    jitter_ms = Column(Float, nullable=False)
+    rssi_dbm = Column(Float, nullable=False)
+    noise_dbm = Column(Float, nullable=False)
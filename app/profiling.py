@@ -0,0 +1,334 @@
+# app/profiling.py
+# ------------------------------------------------------------
+# Profiling bajo demanda y captura de peticiones lentas (PROFILING=1):
+#  - por petición: cabecera PROFILE_HEADER (con PROFILE_TOKEN si está
+#    definido) o muestreo aleatorio con PROFILE_SAMPLE_RATE
+#  - profiler por muestreo: un hilo recoge la pila de TODOS los hilos cada
+#    PROFILE_INTERVAL_MS (el event loop y el threadpool donde corren las
+#    rutas sync y la BD) y las agrega en formato "folded" (flamegraph.pl,
+#    speedscope). Es un perfil del proceso mientras dura la petición: con
+#    otras peticiones en vuelo, sus pilas también aparecen
+#  - SQL: listeners del engine de app/db.py apuntan cada sentencia con su
+#    duración en la captura de la petición en curso (ContextVar: se propaga
+#    al threadpool)
+#  - lentas: con PROFILE_SLOW_MS > 0 se apunta el SQL de todas las
+#    peticiones y se guarda la captura de las que superan el umbral
+#  - cada captura es un JSON en PROFILE_DIR; se conservan las
+#    PROFILE_MAX_FILES más recientes
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Sentencias más largas se recortan en la captura; por encima de
+# _MAX_SQL_ITEMS sentencias sólo se acumulan en el resumen por sentencia
+_MAX_SQL_CHARS = 2000
+_MAX_SQL_ITEMS = 200
+# Hojas de pila de un hilo en espera (sin trabajo): no son muestras útiles
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+
+class RequestCapture:
+    """Lo que se apunta de una petición mientras se atiende."""
+
+    __slots__ = ("sql", "by_statement", "statements", "total_ms")
+
+    def __init__(self) -> None:
+        self.sql: List[Dict[str, Any]] = []                # en orden (las primeras _MAX_SQL_ITEMS)
+        self.by_statement: Dict[str, List[float]] = {}     # sentencia -> [veces, ms, máx ms, filas]
+        self.statements = 0
+        self.total_ms = 0.0
+
+    def add(self, statement: str, ms: float, rows: int) -> None:
+        statement = statement[:_MAX_SQL_CHARS]
+        self.statements += 1
+        self.total_ms += ms
+        if len(self.sql) < _MAX_SQL_ITEMS:
+            self.sql.append({"ms": round(ms, 3), "statement": statement, "rows": rows})
+        agg = self.by_statement.get(statement)
+        if agg is None:
+            self.by_statement[statement] = [1, ms, ms, rows]
+        else:
+            agg[0] += 1
+            agg[1] += ms
+            agg[2] = max(agg[2], ms)
+            agg[3] += rows
+
+    def summary(self) -> Dict[str, Any]:
+        ranked = sorted(self.by_statement.items(), key=lambda kv: kv[1][1], reverse=True)
+        return {
+            "statements": self.statements,
+            "total_ms": round(self.total_ms, 3),
+            "by_statement": [
+                {"statement": st, "count": int(n), "total_ms": round(ms, 3), "max_ms": round(mx, 3), "rows": int(rows)}
+                for st, (n, ms, mx, rows) in ranked
+            ],
+            "items": self.sql,
+            "items_truncated": self.statements - len(self.sql),
+        }
+
+
+_current: ContextVar[Optional[RequestCapture]] = ContextVar("profiling_capture", default=None)
+
+
+# ------------------------------------------------------------
+# SQL: listeners del engine
+# ------------------------------------------------------------
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("profiling_t0", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    capture = _current.get()
+    if capture is None:
+        return
+    starts = conn.info.get("profiling_t0")
+    if not starts:
+        return
+    ms = (time.perf_counter() - starts.pop()) * 1000.0
+    # executemany: nº de filas del lote (los parámetros no se guardan). Con
+    # "insertmanyvalues" cada llamada trae una tupla (una fila), no una lista.
+    capture.add(statement, ms, len(parameters) if executemany and isinstance(parameters, list) else 1)
+
+
+def install_sql_hooks(*engines: Optional[Engine]) -> None:
+    """Registra los listeners en los engines dados (una vez por engine)."""
+    for eng in {id(e): e for e in engines if e is not None}.values():
+        if not event.contains(eng, "before_cursor_execute", _before_execute):
+            event.listen(eng, "before_cursor_execute", _before_execute)
+            event.listen(eng, "after_cursor_execute", _after_execute)
+
+
+# ------------------------------------------------------------
+# Profiler por muestreo
+# ------------------------------------------------------------
+
+class StackSampler:
+    """
+    Muestrea las pilas de todos los hilos (salvo el propio) cada `interval_s`.
+    `folded()` devuelve {"raíz;...;hoja": muestras}, formato de flamegraph.
+    """
+
+    def __init__(self, interval_s: float) -> None:
+        self.interval_s = interval_s
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            self.samples += 1
+            for tid, frame in sys._current_frames().items():
+                if tid == me or os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def top(self, n: int = 25) -> List[Dict[str, Any]]:
+        """Funciones con más muestras propias (hoja de la pila)."""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [{"frame": f, "samples": c} for f, c in leaves.most_common(n)]
+
+    def folded(self) -> Dict[str, int]:
+        return dict(self.stacks.most_common())
+
+
+# ------------------------------------------------------------
+# Almacén acotado en disco
+# ------------------------------------------------------------
+
+class ProfileStore:
+    """Un JSON por captura en `directory`; borra las más antiguas por encima de `max_files`."""
+
+    def __init__(self, directory: str, max_files: int) -> None:
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, name: str, doc: Dict[str, Any]) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            json.dump(doc, f)
+        with self._lock:
+            files = sorted(
+                (e for e in os.scandir(self.directory) if e.name.endswith(".json")),
+                key=lambda e: e.stat().st_mtime,
+            )
+            for e in files[: max(0, len(files) - self.max_files)]:
+                try:
+                    os.remove(e.path)
+                except FileNotFoundError:
+                    pass
+        return path
+
+
+# ------------------------------------------------------------
+# Middleware
+# ------------------------------------------------------------
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI: decide si perfila la petición (cabecera o muestreo),
+    apunta su SQL y guarda la captura si se perfiló o si superó slow_ms.
+    La respuesta de una petición perfilada lleva la cabecera X-Profile-Id
+    con el nombre del fichero. Las rutas de `stream_paths` (SSE) no se
+    perfilan: retendrían el profiler y serían "lentas" toda la conexión.
+    """
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        header: str = "X-Profile",
+        token: Optional[str] = None,
+        sample_rate: float = 0.0,
+        slow_ms: float = 0.0,
+        interval_ms: float = 2.0,
+        stream_paths: Iterable[str] = (),
+    ) -> None:
+        self.app = app
+        self.stream_paths = frozenset(stream_paths)
+        self.store = store
+        self.header = header.lower().encode("latin-1")
+        self.token = token.encode("utf-8") if token is not None else None
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.interval_s = interval_ms / 1000.0
+        # Un solo profiler a la vez: cada uno ya ve todos los hilos
+        self._sampling = threading.Lock()
+
+    def _requested(self, scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == self.header:
+                if self.token is None or hmac.compare_digest(value, self.token):
+                    return "header"
+                return None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.stream_paths:
+            await self.app(scope, receive, send)
+            return
+
+        reason = self._requested(scope)
+        if reason is None and self.slow_ms <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        sampler: Optional[StackSampler] = None
+        if reason is not None:
+            if self._sampling.acquire(blocking=False):
+                sampler = StackSampler(self.interval_s)
+                sampler.start()
+            else:
+                reason += " (profiler ocupado: sólo SQL)"
+        name = self._file_name(scope) if reason is not None else None
+
+        status = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if name is not None:
+                    message["headers"] = [*message.get("headers", []), (b"x-profile-id", name.encode())]
+            await send(message)
+
+        capture = RequestCapture()
+        token = _current.set(capture)
+        t = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            ms = (time.perf_counter() - t) * 1000.0
+            _current.reset(token)
+            if reason is None and ms >= self.slow_ms:
+                reason = "slow"
+                name = self._file_name(scope)
+            if sampler is not None or reason is not None:
+                # join del sampler y escritura fuera del event loop
+                await run_in_threadpool(self._finish, scope, status, ms, reason, name, capture, sampler)
+
+    def _finish(
+        self, scope, status: int, ms: float, reason: Optional[str], name: Optional[str],
+        capture: RequestCapture, sampler: Optional[StackSampler],
+    ) -> None:
+        if sampler is not None:
+            try:
+                sampler.stop()
+            finally:
+                self._sampling.release()
+        if reason is None:
+            return
+        doc = self._document(scope, status, ms, reason, capture, sampler)
+        try:
+            self.store.write(name, doc)
+        except OSError:
+            logger.exception("profiling: no se pudo guardar %s", name)
+
+    @staticmethod
+    def _file_name(scope) -> str:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_")[:60] or "root"
+        return f"{stamp}_{scope['method']}_{path}.json"
+
+    def _document(
+        self, scope, status: int, ms: float, reason: str, capture: RequestCapture, sampler: Optional[StackSampler],
+    ) -> Dict[str, Any]:
+        doc: Dict[str, Any] = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "reason": reason,
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(scope.get("route"), "path", None),
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "status": status,
+            "duration_ms": round(ms, 3),
+            "sql": capture.summary(),
+        }
+        if sampler is not None:
+            doc["profile"] = {
+                "interval_ms": self.interval_s * 1000.0,
+                "samples": sampler.samples,
+                "top": sampler.top(),
+                "folded": sampler.folded(),
+            }
+        return doc
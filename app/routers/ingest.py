@@ -1,23 +1,350 @@
 # app/routers/ingest.py
-from fastapi import APIRouter, Depends
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 # 1) Contrato de entrada (batch de lecturas)
-from ..schemas import IngestBatch
+from ..schemas import IngestBatch, ReadingIn
 
-# 2) DB: dependencia para obtener Session por petición
-from ..db import get_db
+# 2) DB: Session (sync, en el threadpool) o AsyncSession según DB_ASYNC
+from ..db import get_session
 
 # 3) CRUD que acabamos de definir (insertar lote)
-from ..crud import insert_readings
+from ..crud import drop_recent_duplicates, insert_readings, insert_rows, insert_rows_async, reading_rows
+from ..config import (
+    DB_ASYNC,
+    INGEST_DEDUP,
+    INGEST_IDEMPOTENCY_HEADER,
+    INGEST_IDEMPOTENCY_MAX_KEYS,
+    INGEST_IDEMPOTENCY_TTL,
+    INGEST_STREAM_CHUNK_ROWS,
+    INGEST_STREAM_MAX_LINE_BYTES,
+    INGEST_STREAM_MAX_ERRORS,
+    INGEST_VALIDATION,
+    INGEST_COLUMNAR_MIN_ROWS,
+)
+
+# 4) Validación columnar (INGEST_VALIDATION=columnar) y formato binario
+from ..columnar import validate_columnar
+from .. import binfmt
+
+# 5) Buffer write-behind y escritor único de SQLite (None si están desactivados)
+from ..ingest_buffer import get_buffer, BufferFull
+from ..sqlite_writer import get_writer, WriterFull
+
+# 6) Idempotencia por lote (INGEST_DEDUP): respuestas por Idempotency-Key
+from ..idempotency import IdempotencyCache, IdempotencyConflict
 
 router = APIRouter(tags=["ingest"])
 
-@router.post("/ingest", summary="Ingestar lecturas de sensores (persistencia en SQLite)")
-def ingest(payload: IngestBatch, db: Session = Depends(get_db)) -> dict:
+_idempotency = IdempotencyCache(INGEST_IDEMPOTENCY_MAX_KEYS, INGEST_IDEMPOTENCY_TTL) if INGEST_DEDUP else None
+
+def _body_errors(errors: List[dict]) -> RequestValidationError:
+    """Errores de Pydantic relativos al cuerpo ⇒ 422 con loc ("body", ...), como FastAPI."""
+    return RequestValidationError([{**e, "loc": ("body", *e["loc"])} for e in errors])
+
+
+def _json_body(body: bytes) -> Any:
+    """Decodifica el JSON del cuerpo con los mismos errores 422 que FastAPI."""
+    if not body:
+        raise RequestValidationError(
+            [{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}]
+        )
+    try:
+        return json.loads(body)
+    except json.JSONDecodeError as e:
+        raise RequestValidationError(
+            [{
+                "type": "json_invalid",
+                "loc": ("body", e.pos),
+                "msg": "JSON decode error",
+                "input": {},
+                "ctx": {"error": e.msg},
+            }]
+        )
+
+
+def _ingest_batch_schema() -> dict:
+    """JSON Schema de IngestBatch con ReadingIn en línea (para documentar el cuerpo en /docs)."""
+    schema = IngestBatch.model_json_schema()
+    defs = schema.pop("$defs", {})
+    schema["properties"]["readings"]["items"] = defs.get("ReadingIn", {})
+    return schema
+
+
+@router.post(
+    "/ingest",
+    summary="Ingestar lecturas de sensores (persistencia en SQLite)",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": _ingest_batch_schema()},
+                binfmt.CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
+async def ingest(request: Request, response: Response, db: Session | AsyncSession = Depends(get_session)) -> dict:
     """
     Recibe lecturas, las valida y las inserta en la base de datos (histórico).
-    Devuelve el número de filas insertadas.
+    Devuelve el número de filas insertadas y el de repetidas descartadas.
+
+    La validación depende de INGEST_VALIDATION:
+    - "pydantic": IngestBatch (un ReadingIn por lectura).
+    - "columnar": validación por columnas y escritura bulk directa.
+    En ambos casos un lote inválido responde 422 con los mismos errores.
+
+    Con `Content-Type: application/vnd.smartnet.readings` el cuerpo es el
+    formato binario de `app/binfmt.py` (registros de tamaño fijo + diccionario
+    de node_id), que se decodifica sin copiar y se escribe en bloque.
+
+    Con SQLITE_WRITER las filas las escribe el escritor único (en orden,
+    con group commit); con DB_ASYNC, una AsyncSession en el event loop;
+    si no, una Session en el threadpool.
+
+    Con el buffer write-behind activo, las filas se encolan y se confirman
+    después en bloque; la respuesta lleva `queued: true`. Si la cola está
+    llena se responde 503 para que el cliente reintente.
+
+    Con INGEST_DEDUP, las lecturas con un (node_id, ts) ya guardado no se
+    insertan (cuentan en `deduplicated`) y un lote con la cabecera
+    `Idempotency-Key` repetida devuelve la respuesta del primero, con
+    `Idempotent-Replayed: true`, sin volver a escribir; la misma clave con
+    otro cuerpo responde 422. Con `queued: true`, `inserted` y
+    `deduplicated` son provisionales: las repetidas que aún estaban en la
+    cola se descartan al volcar (ver /ingest/buffer).
+    """
+    key = request.headers.get(INGEST_IDEMPOTENCY_HEADER) if _idempotency is not None else None
+    if not key:
+        return await _ingest(request, db)
+    if len(key) > 255:
+        raise HTTPException(status_code=400, detail=f"{INGEST_IDEMPOTENCY_HEADER} admite como mucho 255 caracteres")
+    fingerprint = await run_in_threadpool(_fingerprint, request.headers.get("content-type", ""), await request.body())
+    try:
+        result, replayed = await _idempotency.run(key, fingerprint, lambda: _ingest(request, db))
+    except IdempotencyConflict:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{INGEST_IDEMPOTENCY_HEADER} ya usada con otro cuerpo; usa una clave nueva por lote",
+        )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+def _parse_body(content_type: str, body: bytes) -> Tuple[Optional[List[dict]], Optional[IngestBatch]]:
+    """
+    Decodifica y valida el cuerpo (en el threadpool: un lote grande no debe
+    parar el event loop). Devuelve (filas, None) por las rutas columnar y
+    binaria o (None, IngestBatch) por la de Pydantic; si no es válido, 422.
+    """
+    if content_type == binfmt.CONTENT_TYPE:
+        try:
+            nodes, records = binfmt.decode(body)
+        except (binfmt.BinaryFormatError, UnicodeDecodeError) as e:
+            raise RequestValidationError(
+                [{"type": "binary_invalid", "loc": ("body",), "msg": str(e), "input": None}]
+            )
+        rows, errors = binfmt.validate_records(nodes, records)
+        if errors:
+            raise _body_errors(errors)
+        return rows, None
+    data = _json_body(body)
+    if INGEST_VALIDATION == "columnar":
+        rows, errors = validate_columnar(data, min_rows=INGEST_COLUMNAR_MIN_ROWS)
+        if errors:
+            raise _body_errors(errors)
+        return rows, None
+    try:
+        return None, IngestBatch.model_validate(data)
+    except ValidationError as e:
+        raise _body_errors(e.errors(include_url=False))
+
+
+def _fingerprint(content_type: str, body: bytes) -> str:
+    """Huella del lote para la caché de idempotencia (tipo de contenido + cuerpo)."""
+    h = hashlib.sha256(content_type.split(";")[0].strip().lower().encode())
+    h.update(b"\0")
+    h.update(body)
+    return h.hexdigest()
+
+
+async def _ingest(request: Request, db: Session | AsyncSession) -> dict:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    body = await request.body()
+    rows, payload = await run_in_threadpool(_parse_body, content_type, body)
+
+    received = len(rows) if rows is not None else len(payload.readings)
+    buffer = get_buffer()
+    if buffer is not None:
+        # Sólo se descartan aquí las ya vistas; el resto, al volcar (índice único)
+        rows = drop_recent_duplicates(rows if rows is not None else reading_rows(payload.readings))
+        try:
+            queued = buffer.put(rows)
+        except BufferFull:
+            raise HTTPException(
+                status_code=503,
+                detail="Buffer de ingesta lleno; reintenta más tarde.",
+                headers={"Retry-After": "1"},
+            )
+        return {"inserted": queued, "deduplicated": received - queued, "queued": True}
+
+    writer = get_writer()
+    if writer is not None:
+        inserted = await _write_serialized(writer, rows if rows is not None else reading_rows(payload.readings))
+    elif DB_ASYNC:
+        inserted = await insert_rows_async(db, rows if rows is not None else reading_rows(payload.readings))
+    elif rows is not None:
+        inserted = await run_in_threadpool(insert_rows, db, rows)
+    else:
+        inserted = await run_in_threadpool(insert_readings, db, payload.readings)
+    return {"inserted": inserted, "deduplicated": received - inserted}
+
+
+async def _write_serialized(writer, rows: List[dict]) -> int:
+    """Encola en el escritor único y espera su commit sin ocupar un hilo."""
+    try:
+        fut = writer.submit(rows)
+    except WriterFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Cola de escritura llena; reintenta más tarde.",
+            headers={"Retry-After": "1"},
+        )
+    return await asyncio.wrap_future(fut)
+
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+async def _iter_lines(
+    chunks: AsyncIterator[bytes], max_line: int
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Parte el cuerpo en líneas según va llegando (sin leerlo entero).
+    Produce (nº de línea, bytes); si una línea supera `max_line` se
+    produce (nº de línea, None) y se descarta hasta el siguiente salto.
+    """
+    buf = bytearray()
+    lineno = 0
+    skipping = False
+
+    async for chunk in chunks:
+        start = 0
+        while True:
+            nl = chunk.find(b"\n", start)
+            if nl < 0:
+                if not skipping:
+                    buf += chunk[start:]
+                    if len(buf) > max_line:
+                        buf.clear()
+                        skipping = True
+                break
+            lineno += 1
+            if skipping:
+                skipping = False
+                yield lineno, None
+            else:
+                buf += chunk[start:nl]
+                yield lineno, (bytes(buf) if len(buf) <= max_line else None)
+                buf.clear()
+            start = nl + 1
+
+    if skipping:
+        yield lineno + 1, None
+    elif buf.strip():
+        yield lineno + 1, bytes(buf)
+
+
+@router.post("/ingest/stream", summary="Ingesta en streaming (NDJSON, una lectura por línea)")
+async def ingest_stream(request: Request, db: Session | AsyncSession = Depends(get_session)) -> dict:
+    """
+    Ingesta para cargas grandes (backfills): el cuerpo es NDJSON con un
+    objeto `ReadingIn` por línea. Se lee y valida línea a línea y se
+    confirma cada INGEST_STREAM_CHUNK_ROWS filas, así la memoria no depende
+    del tamaño del payload.
+
+    Las líneas inválidas no abortan la carga: se devuelven en `errors`
+    (con el mismo formato `loc/msg/type` que un 422) y el resto se inserta.
+    Con INGEST_DEDUP, `deduplicated` cuenta las lecturas repetidas descartadas.
     """
-    inserted = insert_readings(db, payload.readings)
-    return {"inserted": inserted}
\ No newline at end of file
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in NDJSON_TYPES:
+        raise HTTPException(status_code=415, detail=f"Content-Type debe ser uno de {NDJSON_TYPES}")
+
+    chunk: List[ReadingIn] = []
+    chunks: List[int] = []
+    received = 0
+    errors: List[dict] = []
+    error_count = 0
+
+    async def write(chunk: List[ReadingIn]) -> int:
+        nonlocal received
+        received += len(chunk)
+        writer = get_writer()
+        if writer is not None:
+            return await _write_serialized(writer, reading_rows(chunk))
+        if DB_ASYNC:
+            return await insert_rows_async(db, reading_rows(chunk))
+        return await run_in_threadpool(insert_rows, db, reading_rows(chunk))
+
+    def add_error(lineno: int, detail: list) -> None:
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < INGEST_STREAM_MAX_ERRORS:
+            errors.append({"line": lineno, "detail": detail})
+
+    async for lineno, line in _iter_lines(request.stream(), INGEST_STREAM_MAX_LINE_BYTES):
+        if line is None:
+            add_error(lineno, [{"loc": [], "msg": f"Línea mayor que {INGEST_STREAM_MAX_LINE_BYTES} bytes", "type": "line_too_long"}])
+            continue
+        if not line.strip():
+            continue
+        try:
+            chunk.append(ReadingIn.model_validate_json(line))
+        except ValidationError as e:
+            add_error(lineno, e.errors(include_url=False, include_context=False, include_input=False))
+            continue
+
+        if len(chunk) >= INGEST_STREAM_CHUNK_ROWS:
+            chunks.append(await write(chunk))
+            chunk = []
+
+    if chunk:
+        chunks.append(await write(chunk))
+
+    return {
+        "inserted": sum(chunks),
+        "deduplicated": received - sum(chunks),
+        "chunks": chunks,
+        "error_count": error_count,
+        "errors": errors,
+    }
+
+
+@router.get("/ingest/buffer", summary="Estado del buffer write-behind (profundidad y latencia de volcado)")
+def ingest_buffer_stats() -> dict:
+    """
+    Profundidad de la cola y latencias de volcado, para ajustar los umbrales.
+    """
+    buffer = get_buffer()
+    if buffer is None:
+        return {"enabled": False}
+    return {"enabled": True, **buffer.stats()}
+
+
+@router.get("/ingest/writer", summary="Estado del escritor único de SQLite (cola y group commit)")
+def ingest_writer_stats() -> dict:
+    writer = get_writer()
+    if writer is None:
+        return {"enabled": False}
+    return {"enabled": True, **writer.stats()}
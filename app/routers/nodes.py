@@ -0,0 +1,51 @@
+# app/routers/nodes.py
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+# 1) Contrato de salida (sólo para la documentación: la respuesta se emite en streaming)
+from ..schemas import NodeReadingsPage
+
+# 2) DB: Session para comprobar el nodo; engine para el escaneo por chunks
+from ..db import read_engine, get_read_db
+from ..config import HISTORY_PAGE_LIMIT, HISTORY_MAX_LIMIT, HISTORY_SCAN_ROWS
+from ..models import NodeLatest
+
+# 3) Escaneo keyset + downsampling
+from ..history import HistoryQueryError, stream_page
+
+router = APIRouter(tags=["nodes"])
+
+
+@router.get(
+    "/nodes/{node_id}/readings",
+    response_model=NodeReadingsPage,
+    summary="Histórico de un nodo (rango, downsampling y paginación keyset)",
+)
+def node_readings(
+    node_id: str,
+    from_: Optional[datetime] = Query(None, alias="from", description="Inicio (incluido), ISO8601; sin tz = UTC"),
+    to: Optional[datetime] = Query(None, description="Fin (excluido), ISO8601; sin tz = UTC"),
+    step: Optional[str] = Query(None, description="Bucket de agregación (1min, 15min, 1h, 1D...); sin step = lecturas crudas"),
+    limit: int = Query(HISTORY_PAGE_LIMIT, ge=1, le=HISTORY_MAX_LIMIT, description="Lecturas o buckets por página"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    db: Session = Depends(get_read_db),
+) -> StreamingResponse:
+    """
+    Lecturas de un nodo en [from, to), en orden temporal.
+    - Con `step`, cada punto es un bucket con avg/min/max/p95 por métrica
+      (un año a step=1D son 365 puntos).
+    - Paginación por cursor (ts, id): pasa `next_cursor` como `?cursor=`
+      con los mismos from/to/step.
+    - La respuesta se genera por chunks: la memoria no depende de `limit`.
+    """
+    if db.get(NodeLatest, node_id) is None:
+        raise HTTPException(status_code=404, detail=f"Nodo desconocido: {node_id}")
+    try:
+        body = stream_page(read_engine, node_id, from_, to, step, limit, cursor, chunk_rows=HISTORY_SCAN_ROWS)
+    except HistoryQueryError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return StreamingResponse(body, media_type="application/json")
@@ -0,0 +1,101 @@
+# app/routers/predict.py
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+# 1) Contratos de entrada/salida
+from ..schemas import PredictRequest, PredictionItem
+
+# 2) DB: Session de lectura por petición
+from ..db import get_read_db
+from ..config import PREDICT_WINDOW, PREDICT_THRESHOLD
+
+# 3) Modelo cargado al arrancar + micro-batcher
+from ..serving import LoadedModel, MicroBatcher, get_batcher, get_watcher, latest_window_features
+
+router = APIRouter(tags=["predict"])
+
+
+def _require_batcher() -> MicroBatcher:
+    batcher = get_batcher()
+    if batcher is None:
+        raise HTTPException(status_code=503, detail="Modelo no disponible: ejecuta ml/train.py")
+    return batcher
+
+
+def _item(model: LoadedModel, p: float, node_id: Optional[str] = None, window_start=None) -> PredictionItem:
+    item = PredictionItem(node_id=node_id, window_start=window_start, model_version=model.version)
+    if not np.isnan(p):
+        item.p_failure = float(p)
+        item.failure = bool(p >= PREDICT_THRESHOLD)
+    return item
+
+
+async def _predict_nodes(db: Session, node_ids: Optional[List[str]]) -> List[PredictionItem]:
+    """Agrega la última ventana de cada nodo y predice todas las filas en un solo envío al batcher."""
+    batcher = _require_batcher()
+    # Fijamos la versión: features y predicción con el mismo modelo aunque haya un swap.
+    model = batcher.model
+    feats = await run_in_threadpool(latest_window_features, db, model.window or PREDICT_WINDOW, node_ids)
+    cols = model.feature_columns
+
+    # Ventanas con una sola lectura (std NaN) no se predicen.
+    ok = feats[cols].notna().all(axis=1).to_numpy()
+    proba = np.full(len(feats), np.nan)
+    if ok.any():
+        proba[ok] = await batcher.predict(feats.loc[ok, cols].to_numpy(dtype=np.float64), model)
+
+    return [
+        _item(model, p, node_id=node, window_start=ts.to_pydatetime())
+        for p, node, ts in zip(proba, feats["node_id"], feats["ts"])
+    ]
+
+
+@router.get("/predict", response_model=List[PredictionItem], summary="Predicción para todos los nodos (última ventana)")
+async def predict_all(db: Session = Depends(get_read_db)) -> List[PredictionItem]:
+    return await _predict_nodes(db, None)
+
+
+@router.get("/predict/{node_id}", response_model=PredictionItem, summary="Predicción para un nodo (última ventana)")
+async def predict_node(node_id: str, db: Session = Depends(get_read_db)) -> PredictionItem:
+    items = await _predict_nodes(db, [node_id])
+    if not items:
+        raise HTTPException(status_code=404, detail=f"Sin lecturas para el nodo {node_id!r}")
+    return items[0]
+
+
+@router.post("/predict", response_model=List[PredictionItem], summary="Predicción para varios nodos o filas de features")
+async def predict_many(payload: PredictRequest, db: Session = Depends(get_read_db)) -> List[PredictionItem]:
+    """
+    - node_ids: última ventana de cada nodo (los nodos sin lecturas se omiten).
+    - rows: features ya calculadas; se ordenan según feature_spec.json.
+    """
+    if payload.node_ids is not None:
+        return await _predict_nodes(db, payload.node_ids)
+
+    batcher = _require_batcher()
+    model = batcher.model
+    cols = model.feature_columns
+    missing = sorted({c for r in payload.rows for c in cols if c not in r})
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Faltan features: {missing}")
+    X = pd.DataFrame.from_records(payload.rows, columns=cols).to_numpy(dtype=np.float64)
+    proba = await batcher.predict(X, model)
+    return [_item(model, p) for p in proba]
+
+
+@router.get("/model", summary="Versión del modelo servido y sus metadatos")
+def model_info() -> Dict[str, Any]:
+    batcher = _require_batcher()
+    watcher = get_watcher()
+    return {
+        "version": batcher.model.version,
+        "feature_columns": batcher.model.feature_columns,
+        "metadata": batcher.model.metadata,
+        "watching": watcher is not None,
+        "last_error": watcher.last_error if watcher else None,
+    }
@@ -1,22 +1,158 @@
 # app/routers/status.py
-from typing import List
-from fastapi import APIRouter, Depends
+from typing import AsyncIterator, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 # 1) Contrato de salida
 from ..schemas import StatusItem
 
-# 2) DB: dependencia para obtener Session
-from ..db import get_db
+# 2) DB: Session de lectura (sync) o AsyncSession según DB_ASYNC
+from ..db import ReadSessionLocal, get_read_session
+from ..config import DB_ASYNC, STATUS_CACHE, STATUS_STREAM_INTERVAL, STATUS_STREAM_HEARTBEAT
 
 # 3) CRUD: leer el último estado por nodo
-from ..crud import latest_status
+from ..crud import latest_status, latest_status_async
+
+# 4) Caché en memoria (cargada al arrancar)
+from .. import state
+
+# 5) Stream push (SSE / WebSocket)
+from ..status_stream import StatusBroker, Subscriber, TooManySubscribers, get_broker
 
 router = APIRouter(tags=["status"])
 
+# Respuestas HTTP de larga duración (una conexión SSE puede durar horas):
+# fuera de la latencia de /metrics y del profiling (ver app/main.py)
+STREAM_PATHS = frozenset({"/status/stream"})
+
 @router.get("/status", response_model=List[StatusItem], summary="Último estado por nodo (desde BD)")
-def status(db: Session = Depends(get_db)) -> List[StatusItem]:
+async def status(db: Session | AsyncSession = Depends(get_read_session)) -> List[StatusItem]:
+    """
+    Devuelve el último registro por nodo.
+    - Con STATUS_CACHE activo, desde la caché en memoria (O(nº de nodos)).
+    - Si no, desde la tabla node_latest (una fila por nodo): con DB_ASYNC
+      en el event loop, si no en el threadpool.
+    """
+    if STATUS_CACHE and state.is_warm():
+        return state.list_status()
+    if DB_ASYNC:
+        return await latest_status_async(db)
+    return await run_in_threadpool(latest_status, db)
+
+
+# ------------------------------------------------------------
+# Stream de estado: snapshot inicial + sólo los nodos que cambian
+# ------------------------------------------------------------
+
+def _read_status() -> List[StatusItem]:
+    with ReadSessionLocal() as db:
+        return latest_status(db)
+
+
+async def _snapshot(nodes: Optional[List[str]]) -> List[StatusItem]:
+    if STATUS_CACHE and state.is_warm():
+        items = state.list_status()
+    else:
+        items = await run_in_threadpool(_read_status)
+    if nodes:
+        wanted = set(nodes)
+        items = [it for it in items if it.node_id in wanted]
+    return items
+
+
+def _items_json(items: List[StatusItem]) -> str:
+    return "[" + ",".join(it.model_dump_json() for it in items) + "]"
+
+
+def _subscribe(node_id: Optional[List[str]]) -> tuple[StatusBroker, Subscriber]:
+    broker = get_broker()
+    if broker is None:
+        raise HTTPException(status_code=404, detail="Stream de estado desactivado (STATUS_STREAM=0).")
+    try:
+        return broker, broker.subscribe(node_id)
+    except TooManySubscribers:
+        raise HTTPException(
+            status_code=503,
+            detail="Demasiados suscriptores; reintenta más tarde.",
+            headers={"Retry-After": "5"},
+        )
+
+
+def _sse(event: str, data: str) -> bytes:
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+@router.get("/status/stream", summary="Stream SSE del último estado por nodo (sólo cambios)")
+async def status_stream(
+    node_id: Optional[List[str]] = Query(None, description="Filtra por nodo (repetible)"),
+    interval: float = Query(STATUS_STREAM_INTERVAL, ge=0, le=60, description="Segundos mínimos entre envíos"),
+) -> StreamingResponse:
+    """
+    Server-Sent Events:
+    - `snapshot`: estado actual de los nodos pedidos (lista de StatusItem).
+    - `update`: sólo los nodos que cambiaron desde el último envío; varias
+      lecturas de un nodo dentro de `interval` llegan como la última.
+    - `dropped`: el cliente no consumía a tiempo; se cierra el stream (el
+      cliente debe reconectar y recibe un snapshot nuevo). Al apagar el
+      servidor el stream se cierra sin este evento.
+    - Comentario `: ping` cada STATUS_STREAM_HEARTBEAT s sin cambios.
+    """
+    broker, sub = _subscribe(node_id)
+
+    async def events() -> AsyncIterator[bytes]:
+        # Suscrito antes del snapshot: lo que entre mientras se lee no se pierde
+        try:
+            yield _sse("snapshot", _items_json(await _snapshot(node_id)))
+            async for batch in broker.updates(sub, interval, STATUS_STREAM_HEARTBEAT):
+                if batch is None:
+                    yield b": ping\n\n"
+                else:
+                    yield _sse("update", "[" + ",".join(batch) + "]")
+            if sub.dropped:
+                yield _sse("dropped", '{"reason":"slow consumer"}')
+        finally:
+            broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/status/ws")
+async def status_ws(
+    websocket: WebSocket,
+    node_id: Optional[List[str]] = Query(None),
+    interval: float = Query(STATUS_STREAM_INTERVAL, ge=0, le=60),
+) -> None:
     """
-    Devuelve el último registro por nodo desde la base de datos.
+    Igual que /status/stream sobre WebSocket; cada mensaje es
+    {"type": "snapshot" | "update" | "ping", "items": [...]}. A un suscriptor
+    lento se le cierra con código 1013 (reintentar más tarde); al apagar el
+    servidor, con 1001.
     """
-    return latest_status(db)
+    try:
+        broker, sub = _subscribe(node_id)
+    except HTTPException as e:
+        await websocket.close(code=1013 if e.status_code == 503 else 1008, reason=e.detail)
+        return
+    try:
+        await websocket.accept()
+        await websocket.send_text('{"type":"snapshot","items":' + _items_json(await _snapshot(node_id)) + "}")
+        async for batch in broker.updates(sub, interval, STATUS_STREAM_HEARTBEAT):
+            if batch is None:
+                await websocket.send_text('{"type":"ping","items":[]}')
+            else:
+                await websocket.send_text('{"type":"update","items":[' + ",".join(batch) + "]}")
+        if sub.dropped:
+            await websocket.close(code=1013, reason="slow consumer")
+        else:
+            await websocket.close(code=1001, reason="server shutdown")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broker.unsubscribe(sub)
@@ -2,11 +2,11 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 #El BaseModel es lo mínimo para definir modelos de datos, field es para metadatos y validaciones
 #por campo, rangos longitudes, y field_validator transforma los campos
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 
 class ReadingIn(BaseModel):
@@ -88,4 +88,84 @@ class StatusItem(BaseModel):
     #Los esquemas definen que entra y que sale, cuando pasemos de memoria a sql la api sigue identica
     #Las validaciones de ge=0 latencia en ms y jitter en ms evitan valores negativos imposibles
     #node_id con minima y máxima longitud evitan entradas basura y readings con min_items =1 evita que se lea nada o mas que eso
-    
\ No newline at end of file
+    
+
+class PredictRequest(BaseModel):
+    """
+    Contrato de entrada de POST /predict. Uno de los dos:
+    - node_ids: nodos cuya última ventana se agrega desde la BD.
+    - rows: features ya calculadas (claves = feature_spec.json).
+    """
+    node_ids: Optional[List[str]] = Field(None, min_length=1)
+    rows: Optional[List[Dict[str, float]]] = Field(None, min_length=1)
+
+    @model_validator(mode="after")
+    def exactly_one(self) -> "PredictRequest":
+        if (self.node_ids is None) == (self.rows is None):
+            raise ValueError("Indica exactamente uno de 'node_ids' o 'rows'")
+        return self
+
+
+class PredictionItem(BaseModel):
+    """
+    Predicción de fallo para una ventana.
+    - node_id / window_start: sólo cuando se agregó desde la BD.
+    - p_failure: None si la ventana no tiene lecturas suficientes (std indefinida).
+    - model_version: versión del registro que hizo la predicción.
+    """
+    node_id: Optional[str] = None
+    window_start: Optional[datetime] = None
+    p_failure: Optional[float] = None
+    failure: Optional[bool] = None
+    model_version: Optional[str] = None
+
+
+class ReadingPoint(BaseModel):
+    """Lectura cruda de GET /nodes/{node_id}/readings (sin step). Métricas NaN/inf ⇒ null."""
+    id: int
+    ts: datetime
+    latency_ms: Optional[float]
+    jitter_ms: Optional[float]
+    rssi_dbm: Optional[float]
+    noise_dbm: Optional[float]
+    failure: bool
+
+
+class ReadingBucket(BaseModel):
+    """
+    Bucket agregado de GET /nodes/{node_id}/readings?step=...
+    - ts: inicio del bucket; n: lecturas en él.
+    - <métrica>_avg/_min/_max/_p95 para latency_ms, jitter_ms, rssi_dbm, noise_dbm
+      (null si el agregado no es finito: NaN/inf no son JSON válido).
+    - failures: lecturas con failure=true.
+    """
+    ts: datetime
+    n: int
+    latency_ms_avg: Optional[float]
+    latency_ms_min: Optional[float]
+    latency_ms_max: Optional[float]
+    latency_ms_p95: Optional[float]
+    jitter_ms_avg: Optional[float]
+    jitter_ms_min: Optional[float]
+    jitter_ms_max: Optional[float]
+    jitter_ms_p95: Optional[float]
+    rssi_dbm_avg: Optional[float]
+    rssi_dbm_min: Optional[float]
+    rssi_dbm_max: Optional[float]
+    rssi_dbm_p95: Optional[float]
+    noise_dbm_avg: Optional[float]
+    noise_dbm_min: Optional[float]
+    noise_dbm_max: Optional[float]
+    noise_dbm_p95: Optional[float]
+    failures: int
+
+
+class NodeReadingsPage(BaseModel):
+    """
+    Página del histórico de un nodo. next_cursor se pasa como ?cursor=
+    para la página siguiente (None = no hay más).
+    """
+    node_id: str
+    step: Optional[str] = None
+    items: List[ReadingPoint] | List[ReadingBucket]
+    next_cursor: Optional[str] = None
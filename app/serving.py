@@ -0,0 +1,444 @@
+# app/serving.py
+# ------------------------------------------------------------
+# Serving del modelo entrenado por ml/train.py:
+#  - carga model.joblib + feature_spec.json UNA vez
+#  - construye filas de features (mismo orden que feature_spec.json)
+#    a partir de la última ventana de cada nodo
+#  - MicroBatcher: agrupa peticiones concurrentes en un único
+#    predict_proba vectorizado (tamaño máximo o espera máxima)
+#  - ModelWatcher: vigila LATEST del registro (ml/registry.py), carga
+#    la versión nueva en segundo plano, la valida y la intercambia sin
+#    cortar peticiones (cada petición termina con el modelo que empezó)
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .models import NodeLatest, SensorReading
+from ml.features import FEATURE_COLS, window_stats
+from ml import registry
+
+logger = logging.getLogger(__name__)
+
+# Nodos por consulta en latest_window_features (lejos del límite de
+# variables de SQLite y sin árboles de expresión por nodo)
+_NODES_PER_QUERY = 500
+
+
+class ModelValidationError(ValueError):
+    """El artefacto cargado no es servible con las features de la API."""
+
+
+@dataclass
+class LoadedModel:
+    """Pipeline de sklearn + orden de columnas con el que se entrenó."""
+    pipeline: Any
+    feature_columns: List[str]
+    version: str = "legacy"
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def window(self) -> Optional[str]:
+        """Ventana de entrenamiento (None en artefactos sin metadatos)."""
+        return self.metadata.get("window")
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probabilidad de fallo (clase 1) para cada fila de X."""
+        frame = pd.DataFrame(X, columns=self.feature_columns)
+        return self.pipeline.predict_proba(frame)[:, 1]
+
+
+def load_model(
+    model_path: str,
+    spec_path: str,
+    metadata_path: Optional[str] = None,
+    version: str = "legacy",
+    mmap: bool = True,
+) -> LoadedModel:
+    """
+    Carga un artefacto. Con `mmap` los arrays de NumPy del pickle se mapean
+    en memoria (joblib sólo lo permite en ficheros sin comprimir; si no,
+    se cargan normalmente).
+    """
+    pipeline = joblib.load(model_path, mmap_mode="r" if mmap else None)
+    with open(spec_path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    metadata: Dict[str, Any] = {}
+    if metadata_path and os.path.exists(metadata_path):
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+    return LoadedModel(
+        pipeline=pipeline,
+        feature_columns=list(spec["feature_columns"]),
+        version=version,
+        metadata=metadata,
+    )
+
+
+def load_version(root: str, version: str, mmap: bool = True) -> LoadedModel:
+    """Carga una versión del registro (ml/registry.py)."""
+    path = registry.version_dir(root, version)
+    return load_model(
+        os.path.join(path, registry.MODEL_FILE),
+        os.path.join(path, registry.SPEC_FILE),
+        os.path.join(path, registry.METADATA_FILE),
+        version=version,
+        mmap=mmap,
+    )
+
+
+def validate_model(model: LoadedModel) -> None:
+    """
+    Comprueba que el modelo es servible antes de ponerlo en producción:
+    - sus columnas existen en FEATURE_COLS (las que sabe calcular la API)
+    - el pipeline espera ese mismo nº de features
+    - la ventana de los metadatos es válida
+    - predict_proba sobre una fila de prueba devuelve una probabilidad
+    """
+    cols = model.feature_columns
+    unknown = [c for c in cols if c not in FEATURE_COLS]
+    if not cols or unknown or len(set(cols)) != len(cols):
+        raise ModelValidationError(f"feature_spec inválido: columnas desconocidas/duplicadas {unknown or cols}")
+
+    n_in = getattr(model.pipeline, "n_features_in_", len(cols))
+    if n_in != len(cols):
+        raise ModelValidationError(f"El pipeline espera {n_in} features y el spec define {len(cols)}")
+
+    if model.window is not None:
+        try:
+            pd.tseries.frequencies.to_offset(model.window)
+        except ValueError as e:
+            raise ModelValidationError(f"Ventana inválida en metadata: {model.window!r}") from e
+
+    proba = model.predict_proba(np.zeros((1, len(cols))))
+    if proba.shape != (1,) or not np.all((proba >= 0) & (proba <= 1)):
+        raise ModelValidationError(f"predict_proba devolvió {proba!r}")
+
+
+# --- construcción de features desde la BD ---
+
+def latest_window_features(
+    db: Session, window: str, node_ids: Optional[Sequence[str]] = None
+) -> pd.DataFrame:
+    """
+    Features de la ventana más reciente de cada nodo (la que contiene su
+    última lectura según node_latest). Devuelve un DataFrame con columnas
+    ts (inicio de ventana), FEATURE_COLS, failure y node_id; las ventanas
+    con menos de 2 lecturas quedan con NaN (std indefinida).
+    """
+    step = pd.Timedelta(pd.tseries.frequencies.to_offset(window))
+
+    stmt = select(NodeLatest.node_id, NodeLatest.ts)
+    if node_ids is not None:
+        stmt = stmt.where(NodeLatest.node_id.in_(list(node_ids)))
+    latest = db.execute(stmt).all()
+    if not latest:
+        return pd.DataFrame(columns=["ts", *FEATURE_COLS, "failure", "node_id"])
+
+    # Inicio de la ventana de cada nodo (ts naive en SQLite ⇒ UTC, como en el
+    # resto de la app). Una consulta node_id IN (...) AND ts >= inicio por
+    # cada inicio distinto (los nodos activos comparten casi siempre el
+    # mismo): ningún nodo lee más allá de su propia ventana (índice node_ts).
+    by_start: Dict[pd.Timestamp, List[str]] = {}
+    for node, ts in latest:
+        by_start.setdefault(pd.to_datetime(ts, utc=True).floor(step), []).append(node)
+    cols = [SensorReading.ts, SensorReading.node_id, SensorReading.latency_ms,
+            SensorReading.jitter_ms, SensorReading.rssi_dbm, SensorReading.noise_dbm,
+            SensorReading.failure]
+    rows = []
+    for start, nodes in by_start.items():
+        for i in range(0, len(nodes), _NODES_PER_QUERY):
+            stmt = select(*cols).where(
+                SensorReading.node_id.in_(nodes[i : i + _NODES_PER_QUERY]),
+                SensorReading.ts >= start.to_pydatetime(),
+            )
+            rows.extend(db.execute(stmt).all())
+    raw = pd.DataFrame(rows, columns=[c.key for c in cols])
+    if raw.empty:
+        return pd.DataFrame(columns=["ts", *FEATURE_COLS, "failure", "node_id"])
+    raw["ts"] = pd.to_datetime(raw["ts"], utc=True)
+    raw["failure"] = raw["failure"].fillna(0).astype(int)
+    raw = raw.sort_values(["node_id", "ts"])
+
+    bucket = raw["ts"].dt.floor(step)
+    bucket.name = "ts"
+    return window_stats(raw, bucket)
+
+
+# --- micro-batching ---
+
+class MicroBatcher:
+    """
+    Agrupa filas de peticiones concurrentes y las resuelve con UNA llamada
+    a predict_proba. Toma lo ya encolado hasta `max_batch` filas y, si
+    `max_wait_ms` > 0, espera como mucho eso desde la primera fila pendiente.
+
+    Cada petición fija el modelo al encolarse (`self.model` en ese momento):
+    `swap` sólo afecta a las peticiones nuevas, y un lote que mezcle
+    versiones hace un predict_proba por versión.
+    """
+
+    def __init__(self, model: LoadedModel, max_batch: int = 256, max_wait_ms: float = 0.0) -> None:
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: asyncio.Queue[Tuple[np.ndarray, LoadedModel, asyncio.Future]] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.rows = 0
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def swap(self, model: LoadedModel) -> LoadedModel:
+        """Cambia el modelo para las peticiones nuevas; devuelve el anterior."""
+        old, self.model = self.model, model
+        return old
+
+    async def predict(self, X: np.ndarray, model: Optional[LoadedModel] = None) -> np.ndarray:
+        """
+        Encola las filas de X y espera su probabilidad de fallo. `model`
+        permite fijar la versión con la que se construyeron las features.
+        """
+        if len(X) == 0:
+            return np.empty(0)
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((X, model or self.model, fut))
+        return await fut
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            n = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            while n < self.max_batch:
+                # Primero lo ya encolado (sin esperar); luego, hasta el deadline.
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                items.append(item)
+                n += len(item[0])
+
+            # Normalmente un único grupo; varios sólo durante un swap.
+            groups: Dict[int, List[Tuple[np.ndarray, LoadedModel, asyncio.Future]]] = {}
+            for item in items:
+                groups.setdefault(id(item[1]), []).append(item)
+            for group in groups.values():
+                await self._predict_group(group)
+
+    async def _predict_group(self, items: List[Tuple[np.ndarray, LoadedModel, asyncio.Future]]) -> None:
+        X = np.vstack([x for x, _, _ in items])
+        try:
+            proba = await run_in_threadpool(items[0][1].predict_proba, X)
+        except Exception as e:
+            for _, _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(X)
+        pos = 0
+        for x, _, fut in items:
+            if not fut.done():
+                fut.set_result(proba[pos: pos + len(x)])
+            pos += len(x)
+
+
+# --- recarga en caliente ---
+
+class ModelWatcher:
+    """
+    Tarea asyncio que consulta LATEST del registro cada `interval` segundos.
+    Si cambia, carga la versión en un hilo (el event loop sigue sirviendo
+    con el modelo actual), la valida y hace `swap` en el batcher. Una
+    versión que falla la validación no se reintenta hasta que cambie LATEST.
+    """
+
+    def __init__(self, batcher: MicroBatcher, root: str, interval: float = 2.0, mmap: bool = True) -> None:
+        self.batcher = batcher
+        self.root = root
+        self.interval = interval
+        self.mmap = mmap
+        self.last_error: Optional[str] = None
+        self._rejected: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def check(self) -> bool:
+        """Una comprobación: True si se ha cambiado de versión."""
+        version = await run_in_threadpool(registry.latest_version, self.root)
+        if version is None or version in (self.batcher.model.version, self._rejected):
+            return False
+        try:
+            model = await run_in_threadpool(_load_and_validate, self.root, version, self.mmap)
+        except Exception as e:
+            self._rejected = version
+            self.last_error = f"{version}: {e}"
+            logger.error("model-watcher: versión %s rechazada: %s", version, e)
+            return False
+        old = self.batcher.swap(model)
+        self.last_error = None
+        logger.info("model-watcher: %s -> %s", old.version, model.version)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("model-watcher: fallo al consultar %s", self.root)
+
+
+def _load_and_validate(root: str, version: str, mmap: bool) -> LoadedModel:
+    model = load_version(root, version, mmap=mmap)
+    validate_model(model)
+    return model
+
+
+# Estado del proceso (None si no hay modelo cargado).
+_batcher: Optional[MicroBatcher] = None
+_watcher: Optional[ModelWatcher] = None
+_waiter: Optional[asyncio.Task] = None
+
+
+def get_batcher() -> Optional[MicroBatcher]:
+    return _batcher
+
+
+def get_watcher() -> Optional[ModelWatcher]:
+    return _watcher
+
+
+def initial_model(registry_root: str, model_path: str, spec_path: str, mmap: bool = True) -> Optional[LoadedModel]:
+    """
+    Modelo con el que arrancar: la versión publicada del registro o, si no
+    hay registro, los artefactos sueltos de ml/train.py (versión "legacy").
+    """
+    version = registry.latest_version(registry_root)
+    if version is not None:
+        return _load_and_validate(registry_root, version, mmap)
+    if os.path.exists(model_path) and os.path.exists(spec_path):
+        model = load_model(model_path, spec_path, mmap=mmap)
+        validate_model(model)
+        return model
+    return None
+
+
+async def start_serving(
+    registry_root: str,
+    model_path: str,
+    spec_path: str,
+    max_batch: int,
+    max_wait_ms: float,
+    poll_interval: float = 2.0,
+    mmap: bool = True,
+) -> Optional[MicroBatcher]:
+    """
+    Carga el modelo inicial y arranca el micro-batcher y, si
+    `poll_interval` > 0, el watcher del registro. Sin modelo inicial, el
+    watcher espera a que se publique uno y entonces arranca el batcher.
+    Un modelo inicial que no carga o no valida se rechaza como en el
+    watcher: la API arranca igual y /predict responde 503.
+    """
+    global _batcher, _watcher, _waiter
+    rejected: Optional[str] = None
+    try:
+        model = await run_in_threadpool(initial_model, registry_root, model_path, spec_path, mmap)
+    except Exception as e:
+        model = None
+        rejected = await run_in_threadpool(registry.latest_version, registry_root)
+        logger.error("serving: modelo inicial %s rechazado: %s", rejected or model_path, e)
+    if model is not None:
+        _batcher = MicroBatcher(model, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        _batcher.start()
+
+    if poll_interval > 0:
+        if _batcher is None:
+            _waiter = asyncio.get_running_loop().create_task(
+                _wait_first_model(registry_root, max_batch, max_wait_ms, poll_interval, mmap, rejected)
+            )
+        else:
+            _watcher = ModelWatcher(_batcher, registry_root, interval=poll_interval, mmap=mmap)
+            _watcher.start()
+    return _batcher
+
+
+async def _wait_first_model(
+    root: str, max_batch: int, max_wait_ms: float, interval: float, mmap: bool, rejected: Optional[str] = None
+) -> None:
+    """Arranque sin modelo: espera la primera versión publicada (distinta de `rejected`)."""
+    global _batcher, _watcher
+    while _batcher is None:
+        await asyncio.sleep(interval)
+        version = await run_in_threadpool(registry.latest_version, root)
+        if version is None or version == rejected:
+            continue
+        try:
+            model = await run_in_threadpool(_load_and_validate, root, version, mmap)
+        except Exception as e:
+            rejected = version
+            logger.error("model-watcher: versión %s rechazada: %s", version, e)
+            continue
+        _batcher = MicroBatcher(model, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        _batcher.start()
+        _watcher = ModelWatcher(_batcher, root, interval=interval, mmap=mmap)
+        _watcher.start()
+
+
+async def stop_serving() -> None:
+    global _batcher, _watcher, _waiter
+    if _waiter is not None:
+        _waiter.cancel()
+        try:
+            await _waiter
+        except asyncio.CancelledError:
+            pass
+        _waiter = None
+    if _watcher is not None:
+        await _watcher.stop()
+        _watcher = None
+    if _batcher is not None:
+        await _batcher.stop()
+        _batcher = None
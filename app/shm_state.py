@@ -0,0 +1,320 @@
+# app/shm_state.py
+# ------------------------------------------------------------
+# Último estado por nodo compartido entre workers de uvicorn
+# (STATUS_SHARED=1), en multiprocessing.shared_memory, sin servicios externos:
+#  - segmento: cabecera + tabla de nombres (node_id por slot) + registros de
+#    tamaño fijo (seq, ts_us y las 4 métricas de StatusItem)
+#  - slots: un node_id recibe un slot la primera vez que se escribe y no lo
+#    pierde; cada proceso cachea node_id -> slot y lee los slots nuevos de la
+#    tabla de nombres (se publican subiendo `count` después de escribirlos)
+#  - escrituras: un lote entero bajo un threading.Lock + flock (entre
+#    procesos) sobre un fichero de lock; se ignoran lecturas más antiguas que
+#    la guardada, como en app/state.py
+#  - lecturas sin lock (seqlock): el escritor pone seq impar, escribe y la
+#    deja par; el lector copia seq, los registros y seq otra vez y sólo acepta
+#    los registros con seq par e igual en las dos copias (los demás se
+#    releen). Cuenta con el orden de escrituras de x86 (TSO): en otras
+#    arquitecturas (aarch64...) las lecturas también toman el flock. Cada proceso
+#    guarda el StatusItem de cada slot con su seq y sólo rehace los que
+#    cambiaron
+#  - lleno (más nodos que capacity): se marca `overflow` y la tabla deja de
+#    estar "caliente": /status vuelve a leer node_latest
+#  - clear() sube la generación: los procesos tiran su caché de slots
+#  - el segmento no se borra al salir (otros workers lo usan); cada proceso
+#    apunta su pid en la cabecera y el primero en conectarse sin ningún otro
+#    vivo (nuevo despliegue) lo vacía antes de recargarlo desde node_latest
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta, timezone
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .schemas import StatusItem
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"SNSTATE1"
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAME_BYTES = 256          # node_id: hasta 64 caracteres en UTF-8
+_HEADER_BYTES = 256
+_MAX_PIDS = 48             # procesos conectados que se recuerdan
+_READ_SPINS = 1000         # reintentos de un registro a medio escribir
+# Sólo con orden de escrituras TSO se puede leer sin lock (ver cabecera)
+_LOCK_FREE_READS = platform.machine().lower() in ("x86_64", "amd64", "i386", "i686")
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("capacity", "<u4"),
+    ("count", "<u4"),          # slots publicados
+    ("generation", "<u4"),     # sube con clear()
+    ("warm", "<u4"),           # cargada desde node_latest
+    ("overflow", "<u4"),       # algún nodo no cupo
+    ("pids", "<i4", (_MAX_PIDS,)),
+])
+RECORD_DTYPE = np.dtype([
+    ("seq", "<u8"),            # par = estable, impar = escribiéndose, 0 = vacío
+    ("ts_us", "<i8"),
+    ("latency_ms", "<f8"),
+    ("jitter_ms", "<f8"),
+    ("rssi_dbm", "<f8"),
+    ("noise_dbm", "<f8"),
+])
+
+
+class SharedStateError(RuntimeError):
+    """El segmento existente no es compatible (otra versión o capacidad)."""
+
+
+def default_name(db_url: str) -> str:
+    """Un segmento por BD: dos apps sobre BDs distintas no se mezclan."""
+    return "smartnet_state_" + hashlib.sha1(db_url.encode()).hexdigest()[:12]
+
+
+def _ts_us(ts: datetime) -> int:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - _EPOCH) // timedelta(microseconds=1)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _open_segment(name: str, size: int) -> shared_memory.SharedMemory:
+    # Sin resource_tracker: al salir un worker no debe borrar el segmento
+    # que siguen usando los demás (track=False existe desde 3.13)
+    kwargs = {"track": False} if sys.version_info >= (3, 13) else {}
+    try:
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size, **kwargs)
+    except FileExistsError:
+        shm = shared_memory.SharedMemory(name=name, **kwargs)
+    if sys.version_info < (3, 13):
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class SharedNodeTable:
+    """Tabla node_id -> último StatusItem en memoria compartida."""
+
+    def __init__(self, name: str, capacity: int = 4096) -> None:
+        self.name = name
+        self.capacity = capacity
+        names_off = _HEADER_BYTES
+        recs_off = names_off + capacity * _NAME_BYTES
+        size = recs_off + capacity * RECORD_DTYPE.itemsize
+
+        self._shm = _open_segment(name, size)
+        if self._shm.size < size:
+            self._shm.close()
+            raise SharedStateError(f"segmento {name} de {self._shm.size} B; se necesitan {size} B")
+        buf = self._shm.buf
+        self._hdr = np.ndarray((), HEADER_DTYPE, buffer=buf, offset=0)
+        self._names = np.ndarray((capacity,), f"S{_NAME_BYTES}", buffer=buf, offset=names_off)
+        self._recs = np.ndarray((capacity,), RECORD_DTYPE, buffer=buf, offset=recs_off)
+
+        self._tlock = threading.Lock()
+        self._lock_fd = os.open(os.path.join(tempfile.gettempdir(), f"{name}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        self._gen = -1
+        self._slots: Dict[str, int] = {}
+        self._node_ids: List[str] = []
+        self._seen = np.zeros(0, dtype="<u8")          # seq de cada item cacheado
+        self._items: List[Optional[StatusItem]] = []
+        self._sorted: List[StatusItem] = []
+        self._overflow_logged = False
+        self.fresh = False
+        self.lock_free_reads = _LOCK_FREE_READS
+
+        with self._locked():
+            if self._hdr["magic"] == b"":
+                self._hdr["magic"] = _MAGIC
+                self._hdr["capacity"] = capacity
+            elif self._hdr["magic"] != _MAGIC or int(self._hdr["capacity"]) != capacity:
+                self.close()
+                raise SharedStateError(
+                    f"el segmento {name} tiene otro formato o capacidad; usa otro STATUS_SHM_NAME "
+                    f"o bórralo (/dev/shm/{name}) con la API parada"
+                )
+            # Ningún proceso vivo conectado: lo que haya es de un arranque
+            # anterior (quizá sobre otra BD) y se descarta
+            pid = os.getpid()
+            pids = [p for p in self._hdr["pids"].tolist() if p and (p == pid or _alive(p))]
+            if not pids:
+                self.fresh = True
+                self._reset()
+            if pid not in pids:
+                pids = (pids + [pid])[-_MAX_PIDS:]
+            self._hdr["pids"] = pids + [0] * (_MAX_PIDS - len(pids))
+
+    # --- locks ---
+    @contextmanager
+    def _locked(self):
+        # flock no excluye a hilos del mismo proceso (mismo fd): de ahí el threading.Lock
+        with self._tlock, self._flock():
+            yield
+
+    @contextmanager
+    def _flock(self):
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    # --- caché local de slots ---
+    def _sync(self) -> None:
+        """Trae a la caché local los slots publicados por cualquier proceso (llamar con _tlock)."""
+        gen = int(self._hdr["generation"])
+        if gen != self._gen:
+            self._gen = gen
+            self._slots = {}
+            self._node_ids = []
+            self._seen = np.zeros(0, dtype="<u8")
+            self._items = []
+            self._sorted = []
+        count = min(int(self._hdr["count"]), self.capacity)
+        for slot in range(len(self._node_ids), count):
+            node_id = self._names[slot].decode("utf-8")
+            self._node_ids.append(node_id)
+            self._slots[node_id] = slot
+
+    def _alloc(self, node_id: str) -> Optional[int]:
+        count = int(self._hdr["count"])
+        if count >= self.capacity:
+            self._hdr["overflow"] = 1
+            if not self._overflow_logged:
+                self._overflow_logged = True
+                logger.warning("shm-state: %d nodos llenan la tabla %s; /status vuelve a node_latest", count, self.name)
+            return None
+        self._names[count] = node_id.encode("utf-8")
+        self._hdr["count"] = count + 1      # publica el slot después del nombre
+        self._node_ids.append(node_id)
+        self._slots[node_id] = count
+        return count
+
+    # --- escritura ---
+    def upsert(self, rows: List[dict]) -> None:
+        """Lecturas (dicts con node_id, ts y las métricas de StatusItem) de un lote."""
+        recs = self._recs
+        seqs = recs["seq"]
+        with self._locked():
+            self._sync()
+            for row in rows:
+                node_id = row["node_id"]
+                slot = self._slots.get(node_id)
+                if slot is None:
+                    slot = self._alloc(node_id)
+                    if slot is None:
+                        continue
+                ts_us = _ts_us(row["ts"])
+                seq = int(seqs[slot])
+                if seq and int(recs["ts_us"][slot]) > ts_us:
+                    continue
+                seq += seq & 1      # impar: un escritor murió a medias
+                seqs[slot] = seq + 1
+                recs[slot] = (seq + 1, ts_us, row["latency_ms"], row["jitter_ms"], row["rssi_dbm"], row["noise_dbm"])
+                seqs[slot] = seq + 2
+
+    # --- lectura (sin lock entre procesos) ---
+    def list_status(self) -> List[StatusItem]:
+        recs = self._recs
+        with self._tlock, (nullcontext() if self.lock_free_reads else self._flock()):
+            while True:
+                self._sync()
+                gen, n = self._gen, len(self._node_ids)
+                s1 = recs["seq"][:n].copy()
+                if n == len(self._seen) and np.array_equal(s1, self._seen):
+                    return list(self._sorted)      # nada nuevo desde la última lectura
+                data = recs[:n].copy()
+                s2 = recs["seq"][:n].copy()
+                if int(self._hdr["generation"]) == gen:
+                    break
+                # clear() a mitad de la lectura: se empieza de nuevo
+
+            for i in np.flatnonzero((s1 != s2) | (s1 & 1)).tolist():
+                data[i] = self._read_one(i)
+            seqs = data["seq"]
+            seen = np.zeros(n, dtype="<u8")
+            seen[: len(self._seen)] = self._seen
+            self._items.extend([None] * (n - len(self._items)))
+            for i in np.flatnonzero(seqs != seen).tolist():
+                seq, ts_us, latency, jitter, rssi, noise = data[i].tolist()
+                if seq & 1:
+                    seqs[i] = seen[i]     # ilegible: se queda el anterior
+                    continue
+                self._items[i] = StatusItem.model_construct(
+                    node_id=self._node_ids[i], ts=_EPOCH + timedelta(microseconds=ts_us),
+                    latency_ms=latency, jitter_ms=jitter, rssi_dbm=rssi, noise_dbm=noise,
+                )
+            self._seen = seqs
+            self._sorted = sorted((it for it in self._items if it is not None), key=lambda x: x.node_id)
+            return list(self._sorted)
+
+    def _read_one(self, slot: int):
+        recs = self._recs
+        for _ in range(_READ_SPINS):
+            a = int(recs["seq"][slot])
+            rec = recs[slot].copy()
+            if not a & 1 and int(recs["seq"][slot]) == a:
+                return rec
+        rec["seq"] = 1    # sigue impar: se omite
+        return rec
+
+    # --- estado de la caché ---
+    def clear(self) -> None:
+        with self._locked():
+            self._reset()
+
+    def _reset(self) -> None:
+        self._hdr["generation"] = int(self._hdr["generation"]) + 1
+        self._hdr["warm"] = 0
+        self._hdr["overflow"] = 0
+        self._hdr["count"] = 0
+        self._recs[:] = 0
+        self._names[:] = b""
+        self._overflow_logged = False
+        self._sync()
+
+    def mark_warm(self) -> None:
+        self._hdr["warm"] = 1
+
+    def is_warm(self) -> bool:
+        return bool(self._hdr["warm"]) and not self._hdr["overflow"]
+
+    def close(self) -> None:
+        """Suelta el mapeo (el segmento sigue existiendo para los demás procesos)."""
+        self._hdr = self._names = self._recs = None
+        self._shm.close()
+        os.close(self._lock_fd)
+
+    def unlink(self) -> None:
+        shared_memory.SharedMemory(name=self.name).unlink()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "capacity": self.capacity,
+            "nodes": int(self._hdr["count"]),
+            "generation": int(self._hdr["generation"]),
+            "warm": bool(self._hdr["warm"]),
+            "overflow": bool(self._hdr["overflow"]),
+            "pids": [p for p in self._hdr["pids"].tolist() if p],
+            "lock_free_reads": self.lock_free_reads,
+        }
@@ -0,0 +1,262 @@
+# app/sqlite_writer.py
+# ------------------------------------------------------------
+# Escritor único para SQLite (SQLITE_WRITER=1):
+#  - un hilo dueño de UNA conexión (WAL) aplica todas las escrituras de
+#    /ingest en orden de llegada: no hay transacciones de escritura
+#    compitiendo por el lock de SQLite ("database is locked")
+#  - /ingest encola sus filas y espera un Future (responde tras el commit,
+#    igual que sin escritor) sin ocupar un hilo del threadpool
+#  - group commit: lo que se acumula mientras se escribe un lote va en la
+#    siguiente transacción (un INSERT + un upsert de node_latest; con
+#    INGEST_DEDUP, un INSERT por petición para saber cuántas filas entraron)
+#  - si la transacción de grupo falla, se reintenta cada petición por
+#    separado: el error sólo llega a la petición culpable
+#  - cola acotada: si está llena, `submit` lanza WriterFull (503)
+#  - una petición cancelada (cliente desconectado, apagado) no anula la
+#    escritura de sus filas: sólo se deja de resolver su Future
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .crud import insert_row_groups, insert_rows
+from .db import make_engine
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriterFull(Exception):
+    """La cola del escritor no admite más peticiones (backpressure)."""
+
+
+class SQLiteWriter:
+    """
+    Serializa las escrituras de sensor_readings/node_latest en un hilo.
+
+    - max_pending: peticiones en cola como máximo.
+    - max_batch_rows: filas máximas por transacción de grupo.
+    - busy_timeout_ms: espera ante locks de OTROS procesos (ml.maintenance...).
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        max_pending: int = 10_000,
+        max_batch_rows: int = 5_000,
+        busy_timeout_ms: int = 5_000,
+    ) -> None:
+        self.db_url = db_url
+        self.max_batch_rows = max_batch_rows
+        self.busy_timeout_ms = busy_timeout_ms
+        self._queue: "queue.Queue[object]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        # `_stopping` y el put de `submit` van juntos: nada entra detrás de _STOP
+        self._submit_lock = threading.Lock()
+
+        # Métricas
+        self._commits = 0
+        self._rows = 0
+        self._jobs = 0
+        self._errors = 0
+        self._rejected = 0
+        self._max_group = 0
+        self._last_commit_ms = 0.0
+        self._max_commit_ms = 0.0
+        self._total_commit_ms = 0.0
+
+    # --- ciclo de vida ---
+    def start(self) -> None:
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Deja de aceptar peticiones, escribe las pendientes y cierra la conexión."""
+        if self._thread is None:
+            return
+        with self._submit_lock:
+            self._stopping = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # --- productores (/ingest, buffer write-behind) ---
+    def submit(self, rows: List[dict]) -> "Future[int]":
+        """
+        Encola `rows` (dicts de `crud.reading_rows`); el Future se resuelve
+        con el nº de filas insertadas tras el commit (con INGEST_DEDUP, sin
+        las repetidas) o con la excepción de la BD.
+        """
+        fut: "Future[int]" = Future()
+        if not rows:
+            fut.set_result(0)
+            return fut
+        with self._submit_lock:
+            if self._stopping:
+                self._rejected += 1
+                raise WriterFull()
+            try:
+                self._queue.put_nowait((rows, fut))
+            except queue.Full:
+                self._rejected += 1
+                raise WriterFull() from None
+        return fut
+
+    # --- consumidor (hilo del escritor) ---
+    def _run(self) -> None:
+        engine = make_engine(self.db_url, pool_size=1, max_overflow=0)
+
+        @event.listens_for(engine, "connect")
+        def _busy_timeout(dbapi_conn, _record):
+            cur = dbapi_conn.cursor()
+            cur.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            cur.close()
+
+        conn = None
+        try:
+            conn = engine.connect()
+            while True:
+                jobs, stop = self._next_group()
+                if jobs:
+                    try:
+                        self._write(conn, jobs)
+                    except Exception as e:
+                        # Un fallo inesperado no debe matar el hilo
+                        logger.exception("sqlite-writer: error inesperado en un grupo de %d peticiones", len(jobs))
+                        for job_rows, fut in jobs:
+                            self._fail(fut, len(job_rows), e)
+                if stop:
+                    return
+        finally:
+            # Lo que quede (conexión fallida o error al salir) no se queda sin respuesta
+            for job_rows, fut in self._drain():
+                fut.set_running_or_notify_cancel()
+                self._fail(fut, len(job_rows), WriterFull())
+            if conn is not None:
+                conn.close()
+            engine.dispose()
+
+    def _next_group(self) -> Tuple[List[Tuple[List[dict], Future]], bool]:
+        """Bloquea hasta la primera petición y añade las ya encoladas (hasta max_batch_rows)."""
+        jobs: List[Tuple[List[dict], Future]] = []
+        item = self._queue.get()
+        n = 0
+        while True:
+            if item is _STOP:
+                # Lo que quede detrás del centinela también se escribe.
+                rest = self._drain()
+                for _, fut in rest:
+                    fut.set_running_or_notify_cancel()
+                return jobs + rest, True
+            # RUNNING: desde aquí el Future ya no se puede cancelar (si ya lo
+            # estaba, las filas se escriben igual y no se resuelve)
+            item[1].set_running_or_notify_cancel()
+            jobs.append(item)
+            n += len(item[0])
+            if n >= self.max_batch_rows:
+                return jobs, False
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return jobs, False
+
+    def _drain(self) -> List[Tuple[List[dict], Future]]:
+        out = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return out
+            if item is not _STOP:
+                out.append(item)
+
+    def _write(self, conn, jobs: List[Tuple[List[dict], Future]]) -> None:
+        t = time.perf_counter()
+        try:
+            with Session(bind=conn) as db:
+                counts = insert_row_groups(db, [job_rows for job_rows, _ in jobs])
+        except Exception as e:
+            conn.rollback()
+            if len(jobs) == 1:
+                self._fail(jobs[0][1], len(jobs[0][0]), e)
+                return
+            # Reintento petición a petición: sólo falla la que no entra.
+            for job_rows, fut in jobs:
+                try:
+                    with Session(bind=conn) as db:
+                        n = insert_rows(db, job_rows)
+                except Exception as e:
+                    conn.rollback()
+                    self._fail(fut, len(job_rows), e)
+                else:
+                    self._done([(job_rows, fut)], [n], t)
+            return
+        self._done(jobs, counts, t)
+
+    def _done(self, jobs: List[Tuple[List[dict], Future]], counts: List[int], t0: float) -> None:
+        ms = (time.perf_counter() - t0) * 1000.0
+        self._commits += 1
+        self._jobs += len(jobs)
+        self._rows += sum(counts)
+        self._max_group = max(self._max_group, len(jobs))
+        self._last_commit_ms = ms
+        self._max_commit_ms = max(self._max_commit_ms, ms)
+        self._total_commit_ms += ms
+        for (_, fut), n in zip(jobs, counts):
+            if not fut.done():
+                fut.set_result(n)
+
+    def _fail(self, fut: Future, n: int, exc: Exception) -> None:
+        self._errors += 1
+        logger.error("sqlite-writer: fallo al escribir %d filas", n, exc_info=exc)
+        if not fut.done():
+            fut.set_exception(exc)
+
+    # --- observabilidad ---
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize(),
+            "commits": self._commits,
+            "jobs": self._jobs,
+            "rows": self._rows,
+            "errors": self._errors,
+            "rejected": self._rejected,
+            "max_group_jobs": self._max_group,
+            "avg_group_jobs": round(self._jobs / self._commits, 2) if self._commits else 0.0,
+            "last_commit_ms": round(self._last_commit_ms, 3),
+            "max_commit_ms": round(self._max_commit_ms, 3),
+            "avg_commit_ms": round(self._total_commit_ms / self._commits, 3) if self._commits else 0.0,
+        }
+
+
+# Instancia única del proceso (None si el escritor está desactivado).
+_writer: Optional[SQLiteWriter] = None
+
+
+def get_writer() -> Optional[SQLiteWriter]:
+    return _writer
+
+
+def start_writer(db_url: str, **kwargs) -> SQLiteWriter:
+    global _writer
+    _writer = SQLiteWriter(db_url, **kwargs)
+    _writer.start()
+    return _writer
+
+
+def stop_writer() -> None:
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
@@ -1,13 +1,32 @@
 
 from __future__ import annotations
 from datetime import datetime, timezone
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional
 from .schemas import ReadingIn, StatusItem
 
+if TYPE_CHECKING:
+    from .shm_state import SharedNodeTable
+
 # Diccionario que actúa como base de datos temporal:
 # la clave es el node_id y el valor es la última lectura (ReadingIn) recibida.
 _last_by_node: Dict[str, ReadingIn] = {}
 
+# Marca si la caché ya se cargó desde la BD (ver crud.warm_status_cache).
+# Mientras sea False, /status consulta la tabla node_latest.
+_warm: bool = False
+
+# Con STATUS_SHARED, la tabla en memoria compartida entre workers
+# (app/shm_state.py) sustituye al diccionario del proceso.
+_shared: Optional["SharedNodeTable"] = None
+
+
+def use_shared(table: Optional["SharedNodeTable"]) -> None:
+    """Pasa a la tabla compartida (None: vuelve al diccionario y suelta la anterior)."""
+    global _shared
+    if _shared is not None and table is None:
+        _shared.close()
+    _shared = table
+
 
 def upsert_reading(r: ReadingIn) -> None:
     """
@@ -18,6 +37,9 @@ def upsert_reading(r: ReadingIn) -> None:
     
     # Si el sensor no envía 'ts', le asignamos la hora actual en UTC.
     ts = r.ts or datetime.now(timezone.utc)
+    if _shared is not None:
+        _shared.upsert([{**r.model_dump(), "ts": ts}])
+        return
     # Obtenemos la lectura actual almacenada para ese nodo (si existe).
     current = _last_by_node.get(r.node_id)
 
@@ -29,11 +51,25 @@ def upsert_reading(r: ReadingIn) -> None:
         _last_by_node[r.node_id] = r
 
 
+def upsert_rows(rows: List[dict]) -> None:
+    """
+    Varias lecturas a la vez (dicts con node_id, ts UTC y las métricas): con
+    la tabla compartida, un solo lock entre procesos por lote.
+    """
+    if _shared is not None:
+        _shared.upsert(rows)
+        return
+    for row in rows:
+        upsert_reading(ReadingIn.model_construct(**row))
+
+
 def list_status() -> List[StatusItem]:
     """
     Devuelve el último estado por nodo, listo para serializar en /status.
     Ordenamos por node_id para respuestas deterministas (útil en pruebas).
     """
+    if _shared is not None:
+        return _shared.list_status()
     # Convertimos cada ReadingIn en un StatusItem (contrato de salida).
     items = [
         StatusItem(
@@ -48,3 +84,28 @@ def list_status() -> List[StatusItem]:
     ]
     # Ordenamos los resultados por node_id para respuestas deterministas.
     return sorted(items, key=lambda x: x.node_id)
+
+
+def clear() -> None:
+    """
+    Vacía la caché y la marca como no cargada. La compartida no se toca: la
+    vacía el primer worker que se conecta (cada worker la recarga al arrancar
+    y no debe borrar lo que los demás ya escribieron).
+    """
+    global _warm
+    _last_by_node.clear()
+    _warm = False
+
+
+def mark_warm() -> None:
+    """Marca la caché como cargada: a partir de aquí /status sale de memoria."""
+    global _warm
+    _warm = True
+    if _shared is not None:
+        _shared.mark_warm()
+
+
+def is_warm() -> bool:
+    if _shared is not None:
+        return _shared.is_warm()
+    return _warm
@@ -0,0 +1,248 @@
+# app/status_stream.py
+# ------------------------------------------------------------
+# Difusión push de /status (GET /status/stream por SSE, /status/ws):
+#  - publish(): lo llama crud._cache_latest tras cada commit (threadpool,
+#    escritor único, buffer o event loop); acumula la última fila por nodo
+#    y programa UN volcado en el event loop
+#  - el volcado descarta lecturas más antiguas que la ya difundida,
+#    serializa cada StatusItem una sola vez y lo reparte a los suscriptores
+#    (con o sin filtro de node_id)
+#  - cada suscriptor tiene un dict node_id -> JSON: las actualizaciones
+#    rápidas de un nodo se pisan (coalescing) y el envío respeta un
+#    intervalo mínimo por suscriptor
+#  - acotado: por el coalescing, lo pendiente de un suscriptor nunca pasa
+#    de un JSON por nodo; si lleva más de max_lag segundos sin vaciarlo (o
+#    supera max_pending nodos), se le da de baja (recibe "dropped" y puede
+#    reconectar) en lugar de retener memoria y retrasar al resto
+#  - con varios workers de uvicorn cada proceso sólo difunde sus ingestas
+#    (igual que la caché de /status)
+#  - apagado: uvicorn espera a que terminen las respuestas en curso antes de
+#    los hooks de shutdown, y un stream no termina nunca; por eso close() se
+#    engancha a SIGINT/SIGTERM (close_on_exit_signals) y cierra los streams
+# ------------------------------------------------------------
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+import threading
+import time
+from datetime import timezone
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from .metrics import STREAM_DROPPED, STREAM_SUBSCRIBERS
+from .schemas import StatusItem
+
+logger = logging.getLogger(__name__)
+
+
+class TooManySubscribers(Exception):
+    """Se alcanzó el máximo de suscriptores del proceso."""
+
+
+class Subscriber:
+    __slots__ = ("nodes", "pending", "pending_since", "event", "dropped", "last_sent")
+
+    def __init__(self, nodes: Optional[Set[str]]) -> None:
+        self.nodes = nodes                    # None = todos los nodos
+        self.pending: Dict[str, str] = {}     # node_id -> StatusItem JSON (el último)
+        self.pending_since = 0.0
+        self.event = asyncio.Event()
+        self.dropped = False
+        self.last_sent = 0.0
+
+
+class StatusBroker:
+    def __init__(self, max_subscribers: int = 10_000, max_pending: int = 10_000, max_lag: float = 30.0) -> None:
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self.max_lag = max_lag
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subs: Set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self._incoming: Dict[str, dict] = {}
+        self._scheduled = False
+        self._last_ts: Dict[str, object] = {}
+        self.closed = False
+
+        # Métricas
+        self._published = 0
+        self._flushes = 0
+        self._dropped = 0
+
+    # --- ciclo de vida (event loop de la app) ---
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def close(self) -> None:
+        """Termina todos los streams (en el event loop); no admite más suscriptores."""
+        self.closed = True
+        for sub in self._subs:
+            sub.event.set()
+        self._subs = set()
+        STREAM_SUBSCRIBERS.set(0)
+
+    def subscribe(self, nodes: Optional[Iterable[str]] = None) -> Subscriber:
+        if self.closed or len(self._subs) >= self.max_subscribers:
+            raise TooManySubscribers()
+        sub = Subscriber(set(nodes) if nodes else None)
+        self._subs.add(sub)
+        STREAM_SUBSCRIBERS.set(len(self._subs))
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subs.discard(sub)
+        STREAM_SUBSCRIBERS.set(len(self._subs))
+
+    # --- productores (cualquier hilo) ---
+    def publish(self, rows: List[dict]) -> None:
+        """Filas de node_latest recién confirmadas (dicts con _LATEST_COLS)."""
+        loop = self._loop
+        if not rows or not self._subs or loop is None:
+            return
+        with self._lock:
+            for row in rows:
+                self._incoming[row["node_id"]] = row
+            self._published += len(rows)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        try:
+            loop.call_soon_threadsafe(self._flush)
+        except RuntimeError:
+            # Loop cerrado (apagado): no hay a quién difundir
+            self._scheduled = False
+
+    # --- event loop ---
+    def _flush(self) -> None:
+        with self._lock:
+            incoming, self._incoming = self._incoming, {}
+            self._scheduled = False
+        self._flushes += 1
+
+        # 1) Una serialización por nodo, sólo si avanza respecto a lo difundido
+        changed: Dict[str, str] = {}
+        for node_id, row in incoming.items():
+            ts = row["ts"]
+            if ts.tzinfo is None:
+                ts = ts.replace(tzinfo=timezone.utc)
+            last = self._last_ts.get(node_id)
+            if last is not None and ts < last:
+                continue
+            self._last_ts[node_id] = ts
+            changed[node_id] = StatusItem(**{**row, "ts": ts}).model_dump_json()
+        if not changed:
+            return
+
+        # 2) Reparto: dict.update para los suscriptores sin filtro; con filtro,
+        #    se recorre el conjunto más pequeño de los dos
+        now = time.monotonic()
+        for sub in list(self._subs):
+            if sub.nodes is None:
+                delta = changed
+            elif len(sub.nodes) < len(changed):
+                delta = {n: changed[n] for n in sub.nodes if n in changed}
+            else:
+                delta = {n: j for n, j in changed.items() if n in sub.nodes}
+            if not delta:
+                continue
+            if not sub.pending:
+                sub.pending_since = now
+            sub.pending.update(delta)
+            if len(sub.pending) > self.max_pending or now - sub.pending_since > self.max_lag:
+                self._drop(sub)
+            sub.event.set()
+
+    def _drop(self, sub: Subscriber) -> None:
+        logger.info("status-stream: suscriptor lento dado de baja (%d pendientes)", len(sub.pending))
+        sub.dropped = True
+        sub.pending = {}
+        self.unsubscribe(sub)
+        self._dropped += 1
+        STREAM_DROPPED.inc()
+
+    async def updates(self, sub: Subscriber, interval: float, heartbeat: float) -> AsyncIterator[Optional[List[str]]]:
+        """
+        Lotes de StatusItem JSON (uno por nodo cambiado) cada `interval` s como
+        mínimo; None cada `heartbeat` s sin cambios. Termina si se da de baja
+        (sub.dropped) o al cerrar el broker.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(sub.event.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            # Coalescing: lo que llegue durante la espera se pisa en pending
+            delay = sub.last_sent + interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sub.event.clear()
+            if sub.dropped or self.closed:
+                return
+            batch, sub.pending = sub.pending, {}
+            sub.last_sent = loop.time()
+            if batch:
+                yield list(batch.values())
+
+    # --- observabilidad ---
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subs),
+            "published_rows": self._published,
+            "flushes": self._flushes,
+            "dropped": self._dropped,
+            "max_pending": max((len(s.pending) for s in self._subs), default=0),
+        }
+
+
+# Instancia única del proceso (se enlaza al event loop al arrancar la app).
+_broker: Optional[StatusBroker] = None
+
+
+def get_broker() -> Optional[StatusBroker]:
+    return _broker
+
+
+def start_broker(loop: asyncio.AbstractEventLoop, **kwargs) -> StatusBroker:
+    global _broker
+    _broker = StatusBroker(**kwargs)
+    _broker.bind(loop)
+    return _broker
+
+
+def stop_broker() -> None:
+    global _broker
+    if _broker is not None:
+        _broker.close()
+    _broker = None
+
+
+def close_on_exit_signals(broker: StatusBroker) -> None:
+    """
+    Encadena close() a los manejadores de SIGINT/SIGTERM ya instalados (los
+    de uvicorn): al pedir el apagado, los streams abiertos terminan y uvicorn
+    puede cerrar sus conexiones. Sólo en el hilo principal (no en TestClient).
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = broker._loop
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous) -> None:
+            if loop is not None and not loop.is_closed():
+                loop.call_soon_threadsafe(broker.close)
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
+
+
+def publish(rows: List[dict]) -> None:
+    """Atajo para crud: no hace nada si el broker no está arrancado."""
+    broker = _broker
+    if broker is not None:
+        broker.publish(rows)
@@ -0,0 +1,126 @@
+# ------------------------------------------------------------
+# Prueba de carga: acceso a BD sync (threadpool) vs async (DB_ASYNC=1):
+#  - arranca uvicorn con la API sobre una SQLite temporal, una vez por modo
+#  - C clientes concurrentes (httpx.AsyncClient) durante --seconds contra:
+#      status: GET /status con STATUS_CACHE=0 (lee node_latest en cada petición)
+#      ingest: POST /ingest con lotes de --batch lecturas
+#  - imprime peticiones/s, p50 y p99 por modo, escenario y concurrencia
+#
+# Uso:
+#   python -m bench.bench_db_async
+#   python -m bench.bench_db_async --concurrency 8 32 128 --seconds 5
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+
+import httpx
+import numpy as np
+
+
+def start_server(db_path: str, port: int, **extra_env: str) -> subprocess.Popen:
+    """uvicorn con la API sobre `db_path` (STATUS_CACHE=0 + `extra_env`); espera a /health."""
+    env = {
+        **os.environ,
+        "DB_URL": f"sqlite:///{db_path}",
+        "STATUS_CACHE": "0",
+        "ARTIFACTS": os.path.join(os.path.dirname(db_path), "artifacts"),
+        **extra_env,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("uvicorn no arrancó")
+
+
+def ingest_payload(batch: int) -> Callable[[int], dict]:
+    t0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def make(i: int) -> dict:
+        return {"readings": [
+            {
+                "node_id": f"node-{(i * batch + k) % 50:02d}",
+                "ts": (t0 + timedelta(seconds=i * batch + k)).isoformat(),
+                "latency_ms": 20.0, "jitter_ms": 3.0, "rssi_dbm": -65.0, "noise_dbm": -90.0,
+            }
+            for k in range(batch)
+        ]}
+    return make
+
+
+async def load(port: int, scenario: str, concurrency: int, seconds: float, batch: int) -> tuple:
+    latencies: List[float] = []
+    errors = 0
+    counter = 0
+    make = ingest_payload(batch)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def worker() -> None:
+            nonlocal errors, counter
+            while time.perf_counter() < deadline:
+                counter += 1
+                t = time.perf_counter()
+                try:
+                    if scenario == "status":
+                        r = await client.get("/status")
+                    else:
+                        r = await client.post("/ingest", json=make(counter))
+                    errors += r.status_code >= 400
+                except httpx.HTTPError:
+                    # Con el servidor saturado: desconexiones/timeouts cuentan como error.
+                    errors += 1
+                latencies.append(time.perf_counter() - t)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    lat = np.asarray(latencies) * 1000
+    return len(lat) / seconds, *np.percentile(lat, [50, 99]), errors
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Throughput de la API con BD sync vs async")
+    ap.add_argument("--concurrency", nargs="+", type=int, default=[8, 32, 128])
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--batch", type=int, default=10, help="Lecturas por POST /ingest")
+    ap.add_argument("--scenarios", nargs="+", default=["status", "ingest"], choices=["status", "ingest"])
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+
+    print(f"{'modo':>6} {'escenario':>9} {'conc':>5} {'req/s':>9} {'p50_ms':>8} {'p99_ms':>8} {'errores':>8}")
+    for db_async in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            proc = start_server(os.path.join(tmp, "bench.db"), args.port, DB_ASYNC="1" if db_async else "0")
+            try:
+                # node_latest con filas para que /status lea algo
+                httpx.post(f"http://127.0.0.1:{args.port}/ingest", json=ingest_payload(50)(0))
+                for scenario in args.scenarios:
+                    for c in args.concurrency:
+                        rps, p50, p99, errors = asyncio.run(load(args.port, scenario, c, args.seconds, args.batch))
+                        mode = "async" if db_async else "sync"
+                        print(f"{mode:>6} {scenario:>9} {c:5d} {rps:9.0f} {p50:8.2f} {p99:8.2f} {errors:8d}")
+            finally:
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
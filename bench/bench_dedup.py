@@ -0,0 +1,89 @@
+# ------------------------------------------------------------
+# Coste de la ingesta idempotente (INGEST_DEDUP) en la ruta bulk:
+#  - "off": INSERT normal (sin índice único)
+#  - "on": índice único (node_id, ts) + ON CONFLICT DO NOTHING + filtro en
+#    memoria de claves recientes
+#  - para cada modo: lotes nuevos (filas/s) y, con dedup, los mismos lotes
+#    reenviados (reintentos) descartados por el filtro en memoria y por la
+#    BD (filtro vaciado: como tras reiniciar o desde otro proceso)
+#  - INGEST_DEDUP se lee al importar app.crud: cada modo corre en un
+#    proceso hijo con su propia SQLite temporal
+#
+# Uso:
+#   python -m bench.bench_dedup
+#   python -m bench.bench_dedup --batch 1000 --batches 50
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def child(batch: int, batches: int) -> dict:
+    from sqlalchemy.orm import sessionmaker
+
+    from app import crud
+    from app.config import INGEST_DEDUP
+    from app.db import make_engine
+    from app.models import Base
+    from bench.bench_ingest import make_readings
+    from ml.maintenance import ensure_dedup_index
+
+    engine = make_engine(os.environ["DB_URL"])
+    Base.metadata.create_all(bind=engine)
+    if INGEST_DEDUP:
+        ensure_dedup_index(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    readings = make_readings(batch * batches)
+    groups = [crud.reading_rows(readings[i : i + batch]) for i in range(0, len(readings), batch)]
+
+    def run(label: str) -> dict:
+        inserted = 0
+        t = time.perf_counter()
+        for rows in groups:
+            with Session() as db:
+                inserted += crud.insert_rows(db, rows)
+        s = time.perf_counter() - t
+        return {"case": label, "rows_per_s": round(len(readings) / s), "inserted": inserted}
+
+    out = [run("nuevas")]
+    if INGEST_DEDUP:
+        out.append(run("reintento (filtro)"))
+        crud._recent_keys._keys.clear()
+        out.append(run("reintento (BD)"))
+    return {"dedup": INGEST_DEDUP, "results": out}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Coste de INGEST_DEDUP en la escritura bulk")
+    ap.add_argument("--batch", type=int, default=500, help="Filas por lote")
+    ap.add_argument("--batches", type=int, default=100)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.batch, args.batches)))
+        return
+
+    for mode in ("0", "1"):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {**os.environ, "DB_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}", "INGEST_DEDUP": mode}
+            proc = subprocess.run(
+                [sys.executable, "-W", "ignore", "-m", "bench.bench_dedup", "--child",
+                 "--batch", str(args.batch), "--batches", str(args.batches)],
+                env=env, capture_output=True, text=True, check=True,
+            )
+        res = json.loads(proc.stdout.strip().splitlines()[-1])
+        for r in res["results"]:
+            label = f"dedup={'on' if res['dedup'] else 'off'} {r['case']}"
+            print(f"{label:>32}: {r['rows_per_s']:>9,} filas/s  (insertadas {r['inserted']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# ------------------------------------------------------------
+# Benchmark de formatos de cuerpo para /ingest:
+#  - JSON + IngestBatch (ruta por defecto)
+#  - JSON + validación columnar
+#  - binario (app/binfmt.py): decode sin copia + validación en bloque
+#  Mide bytes por lectura y lecturas/s hasta tener las filas planas
+#  que recibe crud.insert_rows (sin BD, para aislar el coste de decodificar).
+#
+# Uso:
+#   python -m bench.bench_formats
+#   python -m bench.bench_formats --sizes 1000 100000 --repeat 5
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Callable, List
+
+from app import binfmt
+from app.columnar import validate_columnar
+from app.crud import reading_rows
+from app.schemas import IngestBatch
+from bench.bench_validation import make_payload
+
+
+def json_pydantic(body: bytes) -> List[dict]:
+    return reading_rows(IngestBatch.model_validate(json.loads(body)).readings)
+
+
+def json_columnar(body: bytes) -> List[dict]:
+    rows, errors = validate_columnar(json.loads(body))
+    assert not errors
+    return rows
+
+
+def binary(body: bytes) -> List[dict]:
+    rows, errors = binfmt.validate_records(*binfmt.decode(body))
+    assert not errors
+    return rows
+
+
+def best_of(fn: Callable[[bytes], List[dict]], body: bytes, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(body)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main(sizes: List[int], repeat: int) -> None:
+    print(f"{'batch':>8} {'format':>14} {'B/reading':>10} {'best_s':>10} {'rows/s':>12}")
+    for n in sizes:
+        readings = make_payload(n)["readings"]
+        json_body = json.dumps({"readings": readings}).encode("utf-8")
+        bin_body = binfmt.encode(readings)
+        cases = (
+            ("json+pydantic", json_pydantic, json_body),
+            ("json+columnar", json_columnar, json_body),
+            ("binary", binary, bin_body),
+        )
+        for name, fn, body in cases:
+            best = best_of(fn, body, repeat)
+            print(f"{n:>8} {name:>14} {len(body) / n:>10.1f} {best:>10.4f} {n / best:>12.0f}")
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Benchmark JSON vs binario para /ingest")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000], help="Tamaños de lote")
+    ap.add_argument("--repeat", type=int, default=3, help="Repeticiones por caso (se reporta la mejor)")
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(sizes=args.sizes, repeat=args.repeat)
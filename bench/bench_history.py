@@ -0,0 +1,118 @@
+# ------------------------------------------------------------
+# Benchmark de GET /nodes/{node_id}/readings (app/history.py):
+#  - SQLite temporal con un año de lecturas de un nodo (por defecto una
+#    cada 5 min, ~105k filas) y otros nodos de relleno en la misma tabla
+#  - recorre el histórico completo siguiendo next_cursor para cada step
+#    (crudo, 1h, 1D) y mide tiempo total, páginas y puntos devueltos
+#  - compara la página keyset más profunda con la misma página por OFFSET
+#
+# Uso:
+#   python -m bench.bench_history
+#   python -m bench.bench_history --every 60 --limit 5000
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import insert, select
+
+from app.db import make_engine
+from app.history import Cursor, stream_page
+from app.models import Base, SensorReading
+
+
+def fill(engine, every_s: int, nodes: int, seed: int = 0) -> int:
+    """Un año de lecturas cada `every_s` segundos para node-00 (+ otros nodos intercalados)."""
+    rng = np.random.default_rng(seed)
+    t0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    n = 365 * 86400 // every_s
+    total = 0
+    with engine.begin() as conn:
+        for start in range(0, n, 50_000):
+            idx = np.arange(start, min(start + 50_000, n))
+            rows = [
+                {
+                    "ts": t0 + timedelta(seconds=int(i) * every_s),
+                    "node_id": f"node-{k:02d}",
+                    "latency_ms": float(abs(rng.normal(20, 5))),
+                    "jitter_ms": 3.0,
+                    "rssi_dbm": -65.0,
+                    "noise_dbm": -90.0,
+                    "failure": bool(rng.random() < 0.05),
+                }
+                for i in idx
+                for k in range(nodes)
+            ]
+            conn.execute(insert(SensorReading.__table__), rows)
+            total += len(rows)
+    return total
+
+
+def walk(engine, step: Optional[str], limit: int) -> tuple:
+    """Recorre todas las páginas; devuelve (segundos, páginas, puntos, último cursor)."""
+    t = time.perf_counter()
+    cursor, pages, points, last = None, 0, 0, None
+    while True:
+        body = json.loads(b"".join(stream_page(engine, "node-00", None, None, step, limit, cursor)))
+        pages += 1
+        points += len(body["items"])
+        last = cursor or last
+        cursor = body["next_cursor"]
+        if not cursor:
+            return time.perf_counter() - t, pages, points, last
+
+
+def deepest_page(engine, cursor: str, limit: int) -> None:
+    """Última página cruda: keyset (ts, id) frente a OFFSET."""
+    t = time.perf_counter()
+    b"".join(stream_page(engine, "node-00", None, None, None, limit, cursor))
+    keyset = time.perf_counter() - t
+
+    c = Cursor.decode(cursor)
+    s = SensorReading
+    with engine.connect() as conn:
+        offset = conn.execute(
+            select(s.id).where(s.node_id == "node-00", s.ts < datetime(1970, 1, 1) + timedelta(microseconds=c.ts_us))
+        ).all()
+        t = time.perf_counter()
+        conn.execute(
+            select(s).where(s.node_id == "node-00").order_by(s.ts, s.id).offset(len(offset)).limit(limit)
+        ).all()
+        off = time.perf_counter() - t
+    print(f"{'última página':>14}: keyset={keyset * 1000:8.2f} ms  offset={off * 1000:8.2f} ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark del histórico por nodo")
+    ap.add_argument("--every", type=int, default=300, help="Segundos entre lecturas del nodo")
+    ap.add_argument("--nodes", type=int, default=3, help="Nodos en la tabla (node-00 es el consultado)")
+    ap.add_argument("--limit", type=int, default=1000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        total = fill(engine, args.every, args.nodes)
+        print(f"[bench] {total} lecturas ({args.nodes} nodos, una cada {args.every}s durante un año) | limit={args.limit}")
+
+        last_raw = None
+        for step in (None, "1h", "1D"):
+            seconds, pages, points, last = walk(engine, step, args.limit)
+            if step is None:
+                last_raw = last
+            print(f"{step or 'crudo':>14}: {seconds:7.2f} s  páginas={pages:5d}  puntos={points:7d}")
+        if last_raw:
+            deepest_page(engine, last_raw, args.limit)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
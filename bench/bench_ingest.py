@@ -0,0 +1,94 @@
+# ------------------------------------------------------------
+# Benchmark de escritura de /ingest:
+#  - compara la ruta ORM (add_all) con la ruta bulk (Core executemany)
+#  - tamaños de lote 10, 1k y 50k
+#  - cada medición usa una SQLite temporal recién creada
+#
+# Uso:
+#   python -m bench.bench_ingest
+#   python -m bench.bench_ingest --sizes 10 1000 50000 --repeat 3 --no-pragmas
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+
+from app.db import make_engine
+from app.models import Base
+from app.schemas import ReadingIn
+from app.crud import insert_readings
+
+
+def make_readings(n: int, nodes: int = 50, seed: int = 0) -> List[ReadingIn]:
+    """Genera `n` lecturas ya validadas (ReadingIn) repartidas entre `nodes` nodos."""
+    rng = np.random.default_rng(seed)
+    t0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    lat = np.abs(rng.normal(20, 5, n))
+    jit = np.abs(rng.normal(3, 1, n))
+    rssi = rng.normal(-65, 4, n)
+    noise = rng.normal(-90, 3, n)
+    fail = rng.random(n) < 0.1
+    return [
+        ReadingIn(
+            node_id=f"node-{i % nodes:02d}",
+            ts=t0 + timedelta(seconds=i),
+            latency_ms=float(lat[i]),
+            jitter_ms=float(jit[i]),
+            rssi_dbm=float(rssi[i]),
+            noise_dbm=float(noise[i]),
+            failure=bool(fail[i]),
+        )
+        for i in range(n)
+    ]
+
+
+def time_insert(mode: str, readings: List[ReadingIn], pragmas: bool) -> float:
+    """Inserta `readings` en una BD temporal nueva con el modo dado y devuelve segundos."""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = make_engine(url, sqlite_pragmas=pragmas)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        db = Session()
+        try:
+            t = time.perf_counter()
+            inserted = insert_readings(db, readings, mode=mode)
+            elapsed = time.perf_counter() - t
+        finally:
+            db.close()
+            engine.dispose()
+
+    assert inserted == len(readings)
+    return elapsed
+
+
+def main(sizes: List[int], repeat: int, pragmas: bool) -> None:
+    print(f"[bench] pragmas WAL/NORMAL: {pragmas} | repeticiones: {repeat}")
+    print(f"{'batch':>8} {'mode':>5} {'best_s':>10} {'rows/s':>12}")
+    for n in sizes:
+        readings = make_readings(n)
+        for mode in ("orm", "bulk"):
+            best = min(time_insert(mode, readings, pragmas) for _ in range(repeat))
+            print(f"{n:>8} {mode:>5} {best:>10.4f} {n / best:>12.0f}")
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Benchmark ORM vs bulk para insert_readings")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 50_000], help="Tamaños de lote")
+    ap.add_argument("--repeat", type=int, default=3, help="Repeticiones por caso (se reporta la mejor)")
+    ap.add_argument("--no-pragmas", action="store_true", help="No aplicar PRAGMAs WAL/NORMAL")
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(sizes=args.sizes, repeat=args.repeat, pragmas=not args.no_pragmas)
@@ -0,0 +1,108 @@
+# ------------------------------------------------------------
+# Coste de la instrumentación de app/metrics.py:
+#  - primitivas: Counter.inc, Histogram.observe, db_timer (ns por llamada)
+#  - middleware: la misma app Starlette (una ruta) llamada por ASGI
+#    directamente, sin y con MetricsMiddleware; la diferencia por petición
+#    es el overhead del middleware (sin red ni cliente HTTP de por medio)
+#  - render de /metrics con las series de la app
+#
+# Uso:
+#   python -m bench.bench_metrics
+#   python -m bench.bench_metrics --requests 50000
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app import metrics
+
+
+def per_call_ns(fn, n: int) -> float:
+    t = time.perf_counter_ns()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter_ns() - t) / n
+
+
+def primitives(n: int) -> None:
+    counter = metrics.Counter("bench_counter_total", "bench")
+    hist = metrics.Histogram("bench_seconds", "bench", ("op",)).labels("x")
+
+    def timer() -> None:
+        with metrics.db_timer("bench"):
+            pass
+
+    print(f"{'Counter.inc':>20}: {per_call_ns(counter.inc, n):8.0f} ns")
+    print(f"{'Histogram.observe':>20}: {per_call_ns(lambda: hist.observe(0.003), n):8.0f} ns")
+    print(f"{'db_timer':>20}: {per_call_ns(timer, n):8.0f} ns")
+
+
+async def asgi_loop(app, n: int) -> float:
+    """Segundos por petición GET /items/{id} llamando a la app ASGI directamente."""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(i: int) -> dict:
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/items/{i % 100}", "raw_path": f"/items/{i % 100}".encode(),
+            "query_string": b"", "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("t", 80),
+        }
+
+    for i in range(1000):  # calentamiento
+        await app(scope(i), receive, send)
+    t = time.perf_counter()
+    for i in range(n):
+        await app(scope(i), receive, send)
+    return (time.perf_counter() - t) / n
+
+
+def middleware(n: int, rounds: int) -> None:
+    async def item(request):
+        return PlainTextResponse("ok")
+
+    plain = Starlette(routes=[Route("/items/{item_id}", item)])
+    instrumented = Starlette(routes=[Route("/items/{item_id}", item)])
+    instrumented.add_middleware(metrics.MetricsMiddleware)
+
+    # Rondas alternas: el mínimo de cada lado descarta el ruido de la máquina
+    base, inst = [], []
+    for _ in range(rounds):
+        base.append(asyncio.run(asgi_loop(plain, n)))
+        inst.append(asyncio.run(asgi_loop(instrumented, n)))
+    b, m = min(base) * 1e6, min(inst) * 1e6
+    print(f"{'sin middleware':>20}: {b:8.2f} µs/petición")
+    print(f"{'con middleware':>20}: {m:8.2f} µs/petición")
+    print(f"{'overhead':>20}: {m - b:8.2f} µs/petición")
+
+
+def render() -> None:
+    t = time.perf_counter()
+    body = metrics.render()
+    print(f"{'render /metrics':>20}: {(time.perf_counter() - t) * 1e3:8.2f} ms ({len(body.splitlines())} líneas)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Overhead de la instrumentación (/metrics)")
+    ap.add_argument("--calls", type=int, default=200_000, help="Llamadas por primitiva")
+    ap.add_argument("--requests", type=int, default=20_000, help="Peticiones ASGI por ronda")
+    ap.add_argument("--rounds", type=int, default=5)
+    args = ap.parse_args()
+
+    primitives(args.calls)
+    middleware(args.requests, args.rounds)
+    render()
+
+
+if __name__ == "__main__":
+    main()
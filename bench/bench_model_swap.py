@@ -0,0 +1,100 @@
+# ------------------------------------------------------------
+# Benchmark de recarga en caliente del modelo de /predict:
+#  - registro temporal con dos versiones (ml/registry.py)
+#  - C clientes asyncio contra app.serving.MicroBatcher mientras un
+#    ModelWatcher alterna LATEST entre ellas cada --swap-every segundos
+#  - compara p50/p99/máx de latencia con y sin swaps y cuenta errores
+#    (el objetivo: 0 errores y sin picos en la cola de latencia)
+#
+# Uso:
+#   python -m bench.bench_model_swap
+#   python -m bench.bench_model_swap --concurrency 64 --seconds 5 --swap-every 0.2
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from app.serving import MicroBatcher, ModelWatcher, load_version
+from bench.bench_predict import make_model
+from ml import registry
+from ml.features import FEATURE_COLS
+
+
+async def run(root: str, versions: List[str], concurrency: int, seconds: float, swap_every: float | None) -> None:
+    registry.publish(root, versions[0])
+    batcher = MicroBatcher(load_version(root, versions[0]))
+    batcher.start()
+    watcher = ModelWatcher(batcher, root, interval=0.05)
+    watcher.start()
+
+    X = np.random.default_rng(1).normal(size=(1, len(FEATURE_COLS)))
+    latencies: List[float] = []
+    errors = 0
+    swaps = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                await batcher.predict(X)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    async def swapper() -> None:
+        nonlocal swaps
+        i = 0
+        while swap_every and time.perf_counter() < deadline:
+            await asyncio.sleep(swap_every)
+            i += 1
+            # Publicar en un hilo: el fsync de LATEST no debe parar el event loop.
+            await asyncio.to_thread(registry.publish, root, versions[i % len(versions)])
+            swaps += 1
+
+    versions_seen = set()
+
+    async def observe() -> None:
+        while time.perf_counter() < deadline:
+            versions_seen.add(batcher.model.version)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)), swapper(), observe())
+    await watcher.stop()
+    await batcher.stop()
+
+    lat = np.asarray(latencies) * 1000
+    p50, p99 = np.percentile(lat, [50, 99])
+    label = f"swap cada {swap_every:.2f}s" if swap_every else "sin swaps"
+    print(
+        f"{label:>18}: p50={p50:6.2f} ms  p99={p99:6.2f} ms  max={lat.max():7.2f} ms  "
+        f"{len(lat) / seconds:8.0f} pred/s  errores={errors}  publicadas={swaps}  vistas={len(versions_seen)}"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark de hot swap del modelo")
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--swap-every", type=float, default=0.25)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        versions = [
+            registry.save_version(make_model(seed=s).pipeline, {"window": "15min"}, root, version=f"v{s}")
+            for s in (0, 1)
+        ]
+        asyncio.run(run(root, versions, args.concurrency, args.seconds, None))
+        asyncio.run(run(root, versions, args.concurrency, args.seconds, args.swap_every))
+
+
+if __name__ == "__main__":
+    main()
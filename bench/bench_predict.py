@@ -0,0 +1,104 @@
+# ------------------------------------------------------------
+# Benchmark del serving de /predict (en proceso, sin HTTP ni BD):
+#  - "direct":  cada petición llama a predict_proba con su fila
+#  - "batched": app.serving.MicroBatcher agrupa las peticiones
+#    concurrentes en un único predict_proba
+#  - C clientes asyncio lanzan peticiones de 1 fila en bucle cerrado;
+#    se reportan p50/p99 de latencia por petición y predicciones/s
+#  - comprueba que ambos caminos devuelven las mismas probabilidades
+#
+# Uso:
+#   python -m bench.bench_predict
+#   python -m bench.bench_predict --concurrency 1 32 256 --requests 5000
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+
+import numpy as np
+import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from app.serving import LoadedModel, MicroBatcher
+from ml.features import FEATURE_COLS
+
+
+def make_model(n: int = 5000, seed: int = 0) -> LoadedModel:
+    """Mismo pipeline que ml/train.py, ajustado sobre features aleatorias."""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, len(FEATURE_COLS))), columns=FEATURE_COLS)
+    y = (X.iloc[:, 0] + rng.normal(scale=0.5, size=n) > 1).astype(int)
+    pipe = Pipeline([("scaler", StandardScaler()), ("clf", LogisticRegression(max_iter=1000))])
+    pipe.fit(X, y)
+    return LoadedModel(pipeline=pipe, feature_columns=list(FEATURE_COLS))
+
+
+async def run_clients(
+    predict: Callable[[np.ndarray], Awaitable[np.ndarray]],
+    X: np.ndarray,
+    concurrency: int,
+) -> tuple[float, np.ndarray, np.ndarray]:
+    """Reparte las filas de X entre `concurrency` clientes; devuelve (segundos, latencias, probas)."""
+    latencies = np.empty(len(X))
+    proba = np.empty(len(X))
+
+    async def client(idx: List[int]) -> None:
+        for i in idx:
+            t0 = time.perf_counter()
+            proba[i] = (await predict(X[i: i + 1]))[0]
+            latencies[i] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(list(range(k, len(X), concurrency))) for k in range(concurrency)))
+    return time.perf_counter() - t0, latencies, proba
+
+
+async def bench(model: LoadedModel, X: np.ndarray, concurrency: int, max_batch: int, max_wait_ms: float) -> None:
+    async def direct(x: np.ndarray) -> np.ndarray:
+        return await run_in_threadpool(model.predict_proba, x)
+
+    batcher = MicroBatcher(model, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    batcher.start()
+    try:
+        results = {
+            "direct": await run_clients(direct, X, concurrency),
+            "batched": await run_clients(batcher.predict, X, concurrency),
+        }
+    finally:
+        await batcher.stop()
+
+    # Paridad: el batching no cambia las probabilidades (salvo redondeo de BLAS).
+    np.testing.assert_allclose(results["batched"][2], results["direct"][2], rtol=1e-9, atol=1e-12)
+
+    for name, (secs, lat, _) in results.items():
+        p50, p99 = np.percentile(lat * 1000, [50, 99])
+        extra = f"  avg_batch={batcher.rows / max(batcher.batches, 1):6.1f}" if name == "batched" else ""
+        print(
+            f"c={concurrency:>4}  {name:>7}: p50={p50:7.2f} ms  p99={p99:7.2f} ms  "
+            f"{len(X) / secs:9.0f} pred/s{extra}"
+        )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark de /predict: direct vs micro-batching")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256])
+    ap.add_argument("--requests", type=int, default=4000, help="Peticiones (de 1 fila) por escenario")
+    ap.add_argument("--max-batch", type=int, default=256)
+    ap.add_argument("--max-wait-ms", type=float, default=0.0)
+    args = ap.parse_args()
+
+    model = make_model()
+    X = np.random.default_rng(1).normal(size=(args.requests, len(FEATURE_COLS)))
+    for c in args.concurrency:
+        asyncio.run(bench(model, X, c, args.max_batch, args.max_wait_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# ------------------------------------------------------------
+# Estado de /status en memoria compartida (app/shm_state.py) frente al
+# diccionario del proceso (app/state.py):
+#  - upsert de lotes como los de crud._cache_latest (filas/s)
+#  - list_status() con N nodos (lecturas/s), sin escritores y con
+#    procesos escritores en paralelo (como otros workers ingiriendo)
+#  - consistencia: con escritores que ponen las 4 métricas al mismo valor
+#    que el ts, cualquier registro mezclado (lectura a medias) se cuenta
+#
+# Uso:
+#   python -m bench.bench_shm_state
+#   python -m bench.bench_shm_state --nodes 2000 --writers 2 --seconds 5
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from app import state
+from app.shm_state import SharedNodeTable
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def rows_for(nodes, i: int) -> list:
+    # ts y métricas iguales a i: un registro mezclado no cuadra
+    ts = T0 + timedelta(microseconds=i)
+    return [
+        {"node_id": n, "ts": ts, "latency_ms": float(i), "jitter_ms": float(i), "rssi_dbm": float(i), "noise_dbm": float(i)}
+        for n in nodes
+    ]
+
+
+def writer(name: str, capacity: int, nodes, batch: int, k: int, stop) -> None:
+    table = SharedNodeTable(name, capacity)
+    i = 0
+    while not stop.is_set():
+        i += 1
+        start = (i * batch) % len(nodes)
+        table.upsert(rows_for(nodes[start : start + batch], i * 16 + k))
+    table.close()
+
+
+def torn(items) -> int:
+    bad = 0
+    for it in items:
+        i = (it.ts - T0) // timedelta(microseconds=1)
+        if not it.latency_ms == it.jitter_ms == it.rssi_dbm == it.noise_dbm == float(i):
+            bad += 1
+    return bad
+
+
+def rate(fn, seconds: float) -> float:
+    n = 0
+    t = time.perf_counter()
+    while time.perf_counter() - t < seconds:
+        fn()
+        n += 1
+    return n / (time.perf_counter() - t)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Estado de /status en memoria compartida vs. diccionario")
+    ap.add_argument("--nodes", type=int, default=500)
+    ap.add_argument("--batch", type=int, default=50, help="Filas por upsert (nodos distintos)")
+    ap.add_argument("--writers", type=int, default=2, help="Procesos escritores en la fase concurrente")
+    ap.add_argument("--seconds", type=float, default=2.0, help="Duración de cada medida")
+    args = ap.parse_args()
+
+    nodes = [f"node-{i:05d}" for i in range(args.nodes)]
+    name = f"smartnet_state_bench_{os.getpid()}"
+    capacity = args.nodes
+    table = SharedNodeTable(name, capacity)
+    try:
+        # 1) Escritura: lotes de `batch` filas
+        counter = [0]
+
+        def upsert_into(fn):
+            def step():
+                counter[0] += 1
+                start = (counter[0] * args.batch) % args.nodes
+                fn(rows_for(nodes[start : start + args.batch], counter[0]))
+            return step
+
+        state.use_shared(None)
+        dict_up = rate(upsert_into(state.upsert_rows), args.seconds) * args.batch
+        shm_up = rate(upsert_into(table.upsert), args.seconds) * args.batch
+        print(f"nodos: {args.nodes}, lote: {args.batch}")
+        print(f"{'upsert diccionario':>26}: {dict_up:>12,.0f} filas/s")
+        print(f"{'upsert compartido':>26}: {shm_up:>12,.0f} filas/s")
+
+        # 2) Lectura sin escritores
+        dict_rd = rate(state.list_status, args.seconds)
+        shm_rd = rate(table.list_status, args.seconds)
+        print(f"{'list_status diccionario':>26}: {dict_rd:>12,.0f} lecturas/s")
+        print(f"{'list_status compartido':>26}: {shm_rd:>12,.0f} lecturas/s")
+
+        # 3) Lectura con escritores en otros procesos
+        stop = mp.Event()
+        procs = [
+            mp.Process(target=writer, args=(name, capacity, nodes, args.batch, k + 1, stop))
+            for k in range(args.writers)
+        ]
+        for p in procs:
+            p.start()
+        time.sleep(0.5)
+        bad = [0]
+        reads = [0]
+
+        def read_checked():
+            items = table.list_status()
+            reads[0] += 1
+            bad[0] += torn(items)
+
+        busy = rate(read_checked, args.seconds)
+        stop.set()
+        for p in procs:
+            p.join()
+        print(f"{'list_status + escritores':>26}: {busy:>12,.0f} lecturas/s ({args.writers} procesos escribiendo)")
+        print(f"{'registros inconsistentes':>26}: {bad[0]} en {reads[0]} lecturas")
+    finally:
+        table.close()
+        table.unlink()
+        try:
+            os.unlink(os.path.join(tempfile.gettempdir(), f"{name}.lock"))
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# ------------------------------------------------------------
+# Carga mixta lectura/escritura sobre SQLite, sin y con escritor único:
+#  - arranca uvicorn (SQLITE_WRITER=0 y luego =1) sobre una BD temporal
+#  - W clientes escriben (POST /ingest, lotes de --batch lecturas) y
+#    R clientes leen (GET /status sin caché y GET /nodes/{id}/readings?step=1min)
+#    a la vez durante --seconds
+#  - imprime por modo y operación: peticiones/s, p50, p99, p99.9, máx y
+#    errores (500 por "database is locked" o 503 por cola llena)
+#
+# Uso:
+#   python -m bench.bench_sqlite_writer
+#   python -m bench.bench_sqlite_writer --writers 32 --readers 16 --batch 100 --seconds 10
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+from bench.bench_db_async import ingest_payload, start_server
+
+
+async def mixed(port: int, writers: int, readers: int, seconds: float, batch: int) -> Dict[str, tuple]:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    make = ingest_payload(batch)
+    counter = 0
+    limits = httpx.Limits(max_connections=writers + readers, max_keepalive_connections=writers + readers)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def run(op: str) -> None:
+            nonlocal counter
+            while time.perf_counter() < deadline:
+                counter += 1
+                t = time.perf_counter()
+                try:
+                    if op == "ingest":
+                        r = await client.post("/ingest", json=make(counter))
+                    elif op == "status":
+                        r = await client.get("/status")
+                    else:
+                        r = await client.get("/nodes/node-00/readings", params={"step": "1min", "limit": 100})
+                    errors[op] += r.status_code >= 400
+                except httpx.HTTPError:
+                    errors[op] += 1
+                latencies[op].append(time.perf_counter() - t)
+
+        ops = ["ingest"] * writers + ["status", "history"] * (readers // 2) + ["status"] * (readers % 2)
+        await asyncio.gather(*(run(op) for op in ops))
+
+    out = {}
+    for op, lat in latencies.items():
+        ms = np.asarray(lat) * 1000
+        out[op] = (len(ms) / seconds, *np.percentile(ms, [50, 99, 99.9]), ms.max(), errors[op])
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Latencia de cola con carga mixta, con y sin escritor único")
+    ap.add_argument("--writers", type=int, default=16)
+    ap.add_argument("--readers", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--batch", type=int, default=500, help="Lecturas por POST /ingest")
+    ap.add_argument("--port", type=int, default=8766)
+    args = ap.parse_args()
+
+    print(f"[bench] escritores={args.writers} lectores={args.readers} lote={args.batch} duración={args.seconds}s")
+    print(f"{'modo':>8} {'op':>8} {'req/s':>8} {'p50_ms':>8} {'p99_ms':>8} {'p999_ms':>8} {'max_ms':>8} {'errores':>8}")
+    for writer in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            proc = start_server(os.path.join(tmp, "bench.db"), args.port, SQLITE_WRITER="1" if writer else "0")
+            try:
+                httpx.post(f"http://127.0.0.1:{args.port}/ingest", json=ingest_payload(50)(0))
+                res = asyncio.run(mixed(args.port, args.writers, args.readers, args.seconds, args.batch))
+            finally:
+                proc.terminate()
+                proc.wait()
+        mode = "writer" if writer else "pool"
+        for op in ("ingest", "status", "history"):
+            if op in res:
+                rps, p50, p99, p999, mx, err = res[op]
+                print(f"{mode:>8} {op:>8} {rps:8.0f} {p50:8.2f} {p99:8.2f} {p999:8.2f} {mx:8.2f} {err:8d}")
+
+
+if __name__ == "__main__":
+    main()
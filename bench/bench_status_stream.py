@@ -0,0 +1,139 @@
+# ------------------------------------------------------------
+# Fan-out del stream de estado (app/status_stream.py) en un solo proceso:
+#  - N suscriptores en el event loop (una fracción con filtro de node_id),
+#    cada uno consumiendo broker.updates() como lo hacen /status/stream y
+#    /status/ws (sin la red: sólo el coste del broker)
+#  - un hilo productor publica lotes de node_latest como haría
+#    crud._cache_latest tras cada commit
+#  - mide: coste de publish() en el productor, duración de cada volcado
+#    (serialización + reparto en el loop), latencia publish -> entrega al
+#    suscriptor, memoria por suscriptor y bajas de los que no consumen
+#
+# Uso:
+#   python -m bench.bench_status_stream
+#   python -m bench.bench_status_stream --subscribers 5000 --nodes 500 --slow 100
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from app.status_stream import StatusBroker
+
+
+def pct(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+async def run(args) -> None:
+    loop = asyncio.get_running_loop()
+    broker = StatusBroker(
+        max_subscribers=args.subscribers + args.slow, max_pending=args.max_pending, max_lag=args.max_lag,
+    )
+    broker.bind(loop)
+
+    # Volcados: se envuelve _flush para medir su duración en el loop
+    flush_ms = []
+    flush = broker._flush
+
+    def timed_flush() -> None:
+        t = time.perf_counter()
+        flush()
+        flush_ms.append((time.perf_counter() - t) * 1000.0)
+
+    broker._flush = timed_flush
+
+    nodes = [f"node-{i:05d}" for i in range(args.nodes)]
+    sent_at = {}          # ronda -> perf_counter del publish
+    latency_ms = []
+    received = [0]
+
+    async def consume(sub) -> None:
+        async for batch in broker.updates(sub, args.interval, 3600.0):
+            if batch:
+                received[0] += len(batch)
+                latency_ms.append((time.perf_counter() - sent_at[len(sent_at) - 1]) * 1000.0)
+
+    # 1) Suscriptores (memoria medida con tracemalloc)
+    tracemalloc.start()
+    base = tracemalloc.take_snapshot()
+    tasks = []
+    for i in range(args.subscribers):
+        filtered = i < args.subscribers * args.filtered
+        sub = broker.subscribe(nodes[i % args.nodes: i % args.nodes + args.filter_size] if filtered else None)
+        tasks.append(asyncio.create_task(consume(sub)))
+    slow = [broker.subscribe() for _ in range(args.slow)]   # nunca consumen
+    await asyncio.sleep(0.1)
+    mem = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(base, "filename"))
+    tracemalloc.stop()
+
+    # 2) Productor en otro hilo (como el escritor único o el threadpool)
+    publish_us = []
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def produce() -> None:
+        for r in range(args.rounds):
+            start = (r * args.batch) % args.nodes
+            rows = [
+                {
+                    "node_id": nodes[(start + k) % args.nodes], "ts": t0 + timedelta(seconds=r),
+                    "latency_ms": 10.0 + k, "jitter_ms": 1.0, "rssi_dbm": -60.0, "noise_dbm": -90.0,
+                }
+                for k in range(args.batch)
+            ]
+            sent_at[len(sent_at)] = time.perf_counter()
+            t = time.perf_counter()
+            broker.publish(rows)
+            publish_us.append((time.perf_counter() - t) * 1e6)
+            time.sleep(args.period)
+
+    t = time.perf_counter()
+    producer = threading.Thread(target=produce)
+    producer.start()
+    while producer.is_alive():
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(max(0.5, args.interval * 2))
+    wall = time.perf_counter() - t
+
+    stats = broker.stats()
+    broker.close()
+    await asyncio.gather(*tasks)
+
+    print(f"suscriptores: {args.subscribers} (+{args.slow} sin consumir), nodos: {args.nodes}, "
+          f"rondas: {args.rounds} x {args.batch} filas")
+    print(f"{'memoria':>22}: {mem / 1024:8.1f} KiB ({mem / max(1, args.subscribers + args.slow):.0f} B/suscriptor)")
+    print(f"{'publish()':>22}: p50 {pct(publish_us, 0.5):8.1f} µs   p99 {pct(publish_us, 0.99):8.1f} µs")
+    print(f"{'volcado (loop)':>22}: p50 {pct(flush_ms, 0.5):8.2f} ms   p99 {pct(flush_ms, 0.99):8.2f} ms   "
+          f"({len(flush_ms)} volcados)")
+    print(f"{'latencia entrega':>22}: p50 {pct(latency_ms, 0.5):8.2f} ms   p99 {pct(latency_ms, 0.99):8.2f} ms")
+    print(f"{'entregados':>22}: {received[0]} StatusItem en {wall:.1f} s "
+          f"({received[0] / wall:,.0f}/s, media {statistics.mean(latency_ms or [0]):.2f} ms)")
+    print(f"{'bajas (lentos)':>22}: {stats['dropped']} de {len(slow)}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Fan-out del stream de estado (SSE/WebSocket) en proceso")
+    ap.add_argument("--subscribers", type=int, default=2000)
+    ap.add_argument("--filtered", type=float, default=0.5, help="Fracción de suscriptores con filtro de node_id")
+    ap.add_argument("--filter-size", type=int, default=5, help="Nodos por filtro")
+    ap.add_argument("--slow", type=int, default=50, help="Suscriptores que no consumen (deben darse de baja)")
+    ap.add_argument("--nodes", type=int, default=200)
+    ap.add_argument("--batch", type=int, default=50, help="Filas de node_latest por publish()")
+    ap.add_argument("--rounds", type=int, default=100)
+    ap.add_argument("--period", type=float, default=0.02, help="Segundos entre publish()")
+    ap.add_argument("--interval", type=float, default=0.0, help="Intervalo mínimo por suscriptor")
+    ap.add_argument("--max-pending", type=int, default=10_000)
+    ap.add_argument("--max-lag", type=float, default=1.0, help="Segundos sin consumir antes de la baja")
+    args = ap.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# ------------------------------------------------------------
+# Benchmark de validación del cuerpo de /ingest:
+#  - "pydantic": IngestBatch.model_validate (un ReadingIn por lectura)
+#    + reading_rows para llegar a los mismos dicts planos
+#  - "columnar": app.columnar.validate_columnar (min_rows=0, siempre columnar)
+#  - ambos parten del JSON ya decodificado (json.loads)
+#
+# Uso:
+#   python -m bench.bench_validation
+#   python -m bench.bench_validation --sizes 1000 100000 --repeat 5
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List
+
+import numpy as np
+
+from app.schemas import IngestBatch
+from app.crud import reading_rows
+from app.columnar import validate_columnar
+
+
+def make_payload(n: int, nodes: int = 50, seed: int = 0) -> Any:
+    """Cuerpo de /ingest con `n` lecturas válidas, tal como lo deja json.loads."""
+    rng = np.random.default_rng(seed)
+    t0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    body = {
+        "readings": [
+            {
+                "node_id": f"node-{i % nodes:02d}",
+                "ts": (t0 + timedelta(seconds=i)).isoformat().replace("+00:00", "Z"),
+                "latency_ms": abs(float(rng.normal(20, 5))),
+                "jitter_ms": abs(float(rng.normal(3, 1))),
+                "rssi_dbm": float(rng.normal(-65, 4)),
+                "noise_dbm": float(rng.normal(-90, 3)),
+                "failure": bool(rng.random() < 0.1),
+            }
+            for i in range(n)
+        ]
+    }
+    return json.loads(json.dumps(body))
+
+
+def pydantic_path(data: Any) -> List[dict]:
+    return reading_rows(IngestBatch.model_validate(data).readings)
+
+
+def columnar_path(data: Any) -> List[dict]:
+    rows, errors = validate_columnar(data)
+    assert not errors
+    return rows
+
+
+def best_of(fn: Callable[[Any], List[dict]], data: Any, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main(sizes: List[int], repeat: int) -> None:
+    print(f"{'batch':>8} {'path':>9} {'best_s':>10} {'rows/s':>12} {'speedup':>8}")
+    for n in sizes:
+        data = make_payload(n)
+        # Ambos caminos deben producir las mismas filas.
+        a, b = pydantic_path(data), columnar_path(data)
+        assert [{**r, "ts": r["ts"].timestamp()} for r in a] == [{**r, "ts": r["ts"].timestamp()} for r in b]
+
+        t_pyd = best_of(pydantic_path, data, repeat)
+        t_col = best_of(columnar_path, data, repeat)
+        print(f"{n:>8} {'pydantic':>9} {t_pyd:>10.4f} {n / t_pyd:>12.0f} {1.0:>8.2f}")
+        print(f"{n:>8} {'columnar':>9} {t_col:>10.4f} {n / t_col:>12.0f} {t_pyd / t_col:>8.2f}")
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Benchmark IngestBatch vs validación columnar")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000], help="Tamaños de lote")
+    ap.add_argument("--repeat", type=int, default=3, help="Repeticiones por caso (se reporta la mejor)")
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(sizes=args.sizes, repeat=args.repeat)
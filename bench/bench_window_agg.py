@@ -0,0 +1,84 @@
+# ------------------------------------------------------------
+# Benchmark + paridad de ml.features.window_agg:
+#  - "loop": window_agg_loop (resample por nodo + lambda p95)
+#  - "vectorized": window_agg (groupby único + cuantil por segmentos)
+#  - para cada caso comprueba que X, y, full son IDÉNTICOS
+#    (assert_*_equal con check_exact=True, índice incluido)
+#
+# Uso:
+#   python -m bench.bench_window_agg
+#   python -m bench.bench_window_agg --cases 10x10000 200x200000 --window 1h --days 7
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ml.features import window_agg, window_agg_loop
+
+
+def make_history(nodes: int, rows: int, days: float = 3.0, seed: int = 0) -> pd.DataFrame:
+    """Histórico sintético con el mismo esquema que devuelve load_dataframe()."""
+    rng = np.random.default_rng(seed)
+    t0 = pd.Timestamp("2024-01-01 00:03:17", tz="UTC")
+    offsets = rng.integers(0, int(days * 86_400), rows)
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "ts": t0 + pd.to_timedelta(offsets, unit="s"),
+        "node_id": [f"node-{i:03d}" for i in rng.integers(0, nodes, rows)],
+        "latency_ms": np.abs(rng.normal(20, 5, rows)),
+        "jitter_ms": np.abs(rng.normal(3, 1, rows)),
+        "rssi_dbm": rng.normal(-65, 4, rows),
+        "noise_dbm": rng.normal(-90, 3, rows),
+        "failure": (rng.random(rows) < 0.1).astype(int),
+    })
+
+
+def check_parity(a: Tuple, b: Tuple) -> None:
+    for x, y in zip(a, b):
+        if isinstance(x, pd.Series):
+            pd.testing.assert_series_equal(x, y, check_exact=True)
+        else:
+            pd.testing.assert_frame_equal(x, y, check_exact=True)
+
+
+def timed(fn: Callable, df: pd.DataFrame, window: str) -> Tuple[float, Tuple]:
+    t = time.perf_counter()
+    out = fn(df, window=window)
+    return time.perf_counter() - t, out
+
+
+def main(cases: List[Tuple[int, int]], window: str, days: float) -> None:
+    print(f"[bench] window={window} | días de histórico={days}")
+    print(f"{'nodes':>6} {'rows':>10} {'windows':>9} {'loop_s':>9} {'vector_s':>9} {'speedup':>8} parity")
+    for nodes, rows in cases:
+        df = make_history(nodes, rows, days=days)
+        t_loop, a = timed(window_agg_loop, df, window)
+        t_vec, b = timed(window_agg, df, window)
+        check_parity(a, b)
+        print(f"{nodes:>6} {rows:>10} {len(b[2]):>9} {t_loop:>9.3f} {t_vec:>9.3f} {t_loop / t_vec:>8.1f} ok")
+
+
+def parse_case(text: str) -> Tuple[int, int]:
+    nodes, rows = text.lower().split("x")
+    return int(nodes), int(rows)
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Benchmark y paridad de window_agg")
+    ap.add_argument("--cases", type=parse_case, nargs="+",
+                    default=[parse_case(c) for c in ("10x10000", "50x100000")],
+                    help="Casos NODOSxFILAS")
+    ap.add_argument("--window", default="15min", help="Ventana de agregación")
+    ap.add_argument("--days", type=float, default=3.0, help="Días de histórico (la ruta loop escala con nodos × ventanas)")
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(cases=args.cases, window=args.window, days=args.days)
@@ -0,0 +1,356 @@
+# ------------------------------------------------------------
+# Suite de benchmarks en proceso (sin uvicorn) con salida JSON comparable:
+#  - por cada tamaño NODOSxLECTURAS_POR_NODO crea una SQLite temporal con
+#    datos sintéticos deterministas (mismo modelo que el simulador, una
+#    lectura por minuto y nodo)
+#  - casos, cada uno en un proceso hijo con su DB_URL/ARTIFACTS (la config
+#    se lee al importar la app y así la memoria de un caso no contamina otro):
+#      status      GET /status vía ASGI (TestClient), caché por defecto
+#      status_db   GET /status con STATUS_CACHE=0 (lee node_latest)
+#      load        ml.features.load_dataframe
+#      window_agg  ml.features.window_agg(15min) sobre el histórico cargado
+#      train       ml.train.main (wall time de punta a punta)
+#      ingest      POST /ingest vía ASGI, lotes JSON (el último: escribe en la BD)
+#  - métricas: wall_s (mediana de --repeat) o, en los casos HTTP, p50/p99 y
+#    req/s (ingest también filas/s), peak_alloc_mb (pico de tracemalloc en una pasada extra) y
+#    peak_rss_mb del proceso hijo
+#  - --out escribe el JSON; --compare base.json marca regresiones por encima
+#    de --threshold y sale con código 1 si las hay
+#
+# Uso:
+#   python -m bench.suite --out bench-results.json
+#   python -m bench.suite --sizes 10x1000 50x20000 --cases load window_agg train
+#   python -m bench.suite --out new.json --compare bench-results.json --threshold 0.2
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+CASES = ["status", "status_db", "load", "window_agg", "train", "ingest"]
+DEFAULT_SIZES = ["10x1000", "10x10000", "50x10000"]
+
+# Métricas donde más es mejor; el resto (tiempos, memoria) mejor cuanto menos.
+HIGHER_IS_BETTER = {"req_per_s", "rows_per_s"}
+
+T0_US = 1_704_067_200_000_000  # 2024-01-01T00:00:00Z
+STEP_US = 60_000_000           # una lectura por minuto y nodo
+
+
+def parse_size(size: str) -> Tuple[int, int]:
+    nodes, per_node = size.lower().split("x")
+    return int(nodes), int(per_node)
+
+
+# ------------------------------------------------------------
+# Proceso hijo: siembra y casos (importa la app con su DB_URL)
+# ------------------------------------------------------------
+
+def _batch_cols(node_ids: List[str], start: int, n: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """Lecturas [start, start+n) en round-robin de nodos, ts = T0 + (i // nodos) minutos."""
+    from app.data.synthetic_generator import generate_batch
+
+    cols = generate_batch(node_ids, n, degrade_chance=0.12, failure_bias=0.05, rng=rng, start=start)
+    cols["ts_us"] = T0_US + ((start + np.arange(n)) // len(node_ids)) * STEP_US
+    return cols
+
+
+def _rows(node_ids: List[str], cols: Dict[str, np.ndarray]) -> List[dict]:
+    ts = cols["ts_us"].astype("datetime64[us]").astype(datetime).tolist()
+    return [
+        {"ts": t, "node_id": node_ids[k], "latency_ms": lat, "jitter_ms": jit,
+         "rssi_dbm": rssi, "noise_dbm": noise, "failure": f}
+        for t, k, lat, jit, rssi, noise, f in zip(
+            ts, cols["node"].tolist(), cols["latency_ms"].tolist(), cols["jitter_ms"].tolist(),
+            cols["rssi_dbm"].tolist(), cols["noise_dbm"].tolist(), cols["failure"].tolist(),
+        )
+    ]
+
+
+def seed(nodes: int, per_node: int, seed: int = 0, chunk: int = 50_000) -> Dict[str, Any]:
+    """Crea las tablas y siembra nodes × per_node lecturas deterministas."""
+    from sqlalchemy.orm import Session
+
+    from app.crud import insert_rows
+    from app.db import engine
+    from app.models import Base
+
+    Base.metadata.create_all(bind=engine)
+    rng = np.random.default_rng(seed)
+    node_ids = [f"node-{i:02d}" for i in range(nodes)]
+    total = nodes * per_node
+    t = time.perf_counter()
+    for start in range(0, total, chunk):
+        cols = _batch_cols(node_ids, start, min(chunk, total - start), rng)
+        with Session(engine) as db:
+            insert_rows(db, _rows(node_ids, cols))
+    wall = time.perf_counter() - t
+    return {"wall_s": wall, "rows_per_s": total / wall}
+
+
+def measure(fn: Callable[[], Any], repeat: int, memory: bool) -> Dict[str, float]:
+    """Mediana de `repeat` ejecuciones; con memory, una pasada más bajo tracemalloc."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    out = {"wall_s": float(np.median(times)), "wall_min_s": float(min(times))}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        out["peak_alloc_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return out
+
+
+def _latencies(samples: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99)), "mean_ms": float(ms.mean())}
+
+
+def case_status(requests: int) -> Dict[str, float]:
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        client.get("/status").raise_for_status()  # calentamiento
+        lat = []
+        t0 = time.perf_counter()
+        for _ in range(requests):
+            t = time.perf_counter()
+            client.get("/status").raise_for_status()
+            lat.append(time.perf_counter() - t)
+        wall = time.perf_counter() - t0
+    return {"req_per_s": requests / wall, **_latencies(lat)}
+
+
+def case_ingest(nodes: int, per_node: int, requests: int, batch_rows: int) -> Dict[str, float]:
+    from fastapi.testclient import TestClient
+    from app.data.synthetic_generator import encode_batch
+    from app.main import app
+
+    # Lotes posteriores al histórico sembrado, codificados antes de medir.
+    rng = np.random.default_rng(1)
+    node_ids = [f"node-{i:02d}" for i in range(nodes)]
+    bodies = []
+    for r in range(requests):
+        cols = _batch_cols(node_ids, nodes * per_node + r * batch_rows, batch_rows, rng)
+        bodies.append(encode_batch(node_ids, cols, "json"))
+
+    with TestClient(app) as client:
+        lat = []
+        t0 = time.perf_counter()
+        for body, headers in bodies:
+            t = time.perf_counter()
+            client.post("/ingest", content=body, headers=headers).raise_for_status()
+            lat.append(time.perf_counter() - t)
+        wall = time.perf_counter() - t0
+    return {"req_per_s": requests / wall, "rows_per_s": requests * batch_rows / wall, **_latencies(lat)}
+
+
+def case_load(repeat: int, memory: bool) -> Dict[str, float]:
+    from ml.features import load_dataframe
+    return measure(load_dataframe, repeat, memory)
+
+
+def case_window_agg(repeat: int, memory: bool) -> Dict[str, float]:
+    from ml.features import load_dataframe, window_agg
+    df = load_dataframe()
+    return measure(lambda: window_agg(df, window="15min"), repeat, memory)
+
+
+def case_train(repeat: int, memory: bool) -> Dict[str, float]:
+    from ml import train
+
+    def run() -> None:
+        # ml.train imprime el informe de clasificación: fuera de la salida de la suite
+        with contextlib.redirect_stdout(io.StringIO()):
+            train.main(window="15min")
+    return measure(run, repeat, memory)
+
+
+def run_child(args: argparse.Namespace) -> None:
+    # Avisos de sklearn/starlette en cada repetición: no aportan a la medición
+    warnings.filterwarnings("ignore")
+    if args.child == "seed":
+        metrics = seed(args.nodes, args.per_node)
+    elif args.child in ("status", "status_db"):
+        metrics = case_status(args.requests)
+    elif args.child == "ingest":
+        metrics = case_ingest(args.nodes, args.per_node, args.requests, args.batch_rows)
+    elif args.child == "load":
+        metrics = case_load(args.repeat, args.memory)
+    elif args.child == "window_agg":
+        metrics = case_window_agg(args.repeat, args.memory)
+    else:
+        metrics = case_train(max(1, args.repeat // 3), args.memory)
+    # ru_maxrss: KiB en Linux
+    metrics["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with open(args.result_file, "w") as f:
+        json.dump(metrics, f)
+
+
+# ------------------------------------------------------------
+# Proceso padre: orquesta, escribe el JSON y compara
+# ------------------------------------------------------------
+
+def _spawn(case: str, db_path: str, nodes: int, per_node: int, args: argparse.Namespace) -> Dict[str, float]:
+    tmp = os.path.dirname(db_path)
+    result_file = os.path.join(tmp, f"{case}.json")
+    env = {
+        **os.environ,
+        "DB_URL": f"sqlite:///{db_path}",
+        "ARTIFACTS": os.path.join(tmp, "artifacts"),
+        "MAINTENANCE": "0",
+    }
+    if case == "status_db":
+        env["STATUS_CACHE"] = "0"
+    cmd = [
+        sys.executable, "-m", "bench.suite", "--child", case,
+        "--nodes", str(nodes), "--per-node", str(per_node),
+        "--repeat", str(args.repeat), "--requests", str(args.requests),
+        "--batch-rows", str(args.batch_rows), "--result-file", result_file,
+    ]
+    if not args.no_memory:
+        cmd.append("--memory")
+    subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+    with open(result_file) as f:
+        return json.load(f)
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    import pandas as pd
+    import sklearn
+    import sqlalchemy
+
+    doc: Dict[str, Any] = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "versions": {"numpy": np.__version__, "pandas": pd.__version__,
+                         "sqlalchemy": sqlalchemy.__version__, "sklearn": sklearn.__version__},
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+        "results": [],
+    }
+
+    print(f"{'tamaño':>10} {'caso':>10} {'wall_s':>9} {'p50_ms':>8} {'p99_ms':>8} {'filas/s':>9} {'alloc_MB':>9} {'rss_MB':>8}")
+    for size in args.sizes:
+        nodes, per_node = parse_size(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            results = {"seed": _spawn("seed", db_path, nodes, per_node, args)}
+            # ingest escribe en la BD: siempre el último del tamaño
+            for case in sorted(args.cases, key=lambda c: c == "ingest"):
+                results[case] = _spawn(case, db_path, nodes, per_node, args)
+
+        for case, m in results.items():
+            doc["results"].append({
+                "case": case, "size": size, "nodes": nodes,
+                "readings_per_node": per_node, "rows": nodes * per_node, "metrics": m,
+            })
+            print(f"{size:>10} {case:>10} {m.get('wall_s', float('nan')):9.3f} {m.get('p50_ms', float('nan')):8.2f} "
+                  f"{m.get('p99_ms', float('nan')):8.2f} {m.get('rows_per_s', float('nan')):9.0f} "
+                  f"{m.get('peak_alloc_mb', float('nan')):9.1f} {m['peak_rss_mb']:8.1f}")
+    return doc
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Compara métrica a métrica (mismo caso y tamaño). Devuelve las regresiones:
+    empeoran más de `threshold` (0.2 = 20 %) en la dirección de la métrica.
+    """
+    for key in ("repeat", "requests", "batch_rows"):
+        a, b = baseline["meta"]["args"].get(key), current["meta"]["args"].get(key)
+        if a != b:
+            print(f"[suite] aviso: --{key.replace('_', '-')} distinto de la línea base ({a} -> {b})")
+    base = {(r["case"], r["size"]): r["metrics"] for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'tamaño':>10} {'caso':>10} {'métrica':>14} {'base':>10} {'actual':>10} {'cambio':>8}")
+    for r in current["results"]:
+        old = base.get((r["case"], r["size"]))
+        if old is None:
+            continue
+        for name, value in r["metrics"].items():
+            if name not in old or not old[name]:
+                continue
+            change = (value - old[name]) / old[name]
+            worse = -change if name in HIGHER_IS_BETTER else change
+            flag = "  REGRESIÓN" if worse > threshold else ""
+            print(f"{r['size']:>10} {r['case']:>10} {name:>14} {old[name]:10.3f} {value:10.3f} {change:+8.1%}{flag}")
+            if flag:
+                regressions.append({"case": r["case"], "size": r["size"], "metric": name,
+                                    "baseline": old[name], "current": value, "change": change})
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Suite de benchmarks (ingest, status, features, entrenamiento)")
+    ap.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="NODOSxLECTURAS_POR_NODO")
+    ap.add_argument("--cases", nargs="+", default=CASES, choices=CASES)
+    ap.add_argument("--repeat", type=int, default=3, help="Repeticiones por caso (train: un tercio, mínimo 1)")
+    ap.add_argument("--requests", type=int, default=200, help="Peticiones en status/ingest")
+    ap.add_argument("--batch-rows", type=int, default=500, help="Lecturas por POST /ingest")
+    ap.add_argument("--no-memory", action="store_true", help="Sin pasada de tracemalloc (peak_alloc_mb)")
+    ap.add_argument("--out", default=None, help="Fichero JSON de resultados")
+    ap.add_argument("--compare", default=None, help="JSON de una ejecución anterior (línea base)")
+    ap.add_argument("--threshold", type=float, default=0.2, help="Empeoramiento relativo que cuenta como regresión")
+    # Internos: ejecución de un caso en el proceso hijo
+    ap.add_argument("--child", choices=["seed", *CASES], help=argparse.SUPPRESS)
+    ap.add_argument("--nodes", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--per-node", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--memory", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    doc = run_suite(args)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(doc, f, indent=2)
+        print(f"\n[suite] resultados en {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(doc, json.load(f), args.threshold)
+        if regressions:
+            print(f"[suite] {len(regressions)} regresiones por encima del {args.threshold:.0%}")
+            sys.exit(1)
+        print("[suite] sin regresiones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+# ------------------------------------------------------------
+# Feature store incremental de ventanas:
+#  - tabla feature_windows: FEATURE_COLS + failure por (window, node_id, ts)
+#  - tabla feature_watermarks: último sensor_readings.id procesado por window
+#  - update_feature_store lee SÓLO las lecturas con id > watermark,
+#    recalcula las ventanas que tocan (con todas sus lecturas) y las
+#    reemplaza en una transacción junto con el nuevo watermark
+#  - fuera de SQLite (un solo escritor: los id se confirman en orden) un
+#    id bajo puede confirmarse después de otros más altos; cada
+#    actualización vuelve a leer los FEATURE_STORE_ID_MARGIN id anteriores
+#    al watermark (recalcular una ventana es idempotente). Una lectura que
+#    se confirme más de ese margen por detrás no se agrega
+#  - load_features devuelve X, y, full como window_agg, sin leer el histórico
+#  - iter_features recorre las ventanas en orden temporal por chunks
+#    (entrenamiento out-of-core, ml/train_stream.py)
+#  - retention_state: horizonte de compactación (ml/maintenance.py). Las
+#    lecturas crudas anteriores se han borrado, así que las ventanas de
+#    antes del horizonte ya no se recalculan (lecturas tardías ignoradas)
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Tuple
+
+import pandas as pd
+from sqlalchemy import (
+    Column, DateTime, Float, Index, Integer, String, Table,
+    and_, delete, func, insert, select, tuple_,
+)
+from sqlalchemy.engine import Connection
+
+from ml.features import FEATURE_COLS, get_engine, metadata, sensor_readings, window_stats
+
+feature_windows = Table(
+    "feature_windows", metadata,
+    Column("window", String(16), primary_key=True),
+    Column("node_id", String(64), primary_key=True),
+    Column("ts", DateTime(timezone=True), primary_key=True),   # borde de la ventana
+    *[Column(c, Float, nullable=False) for c in FEATURE_COLS],
+    Column("failure", Integer, nullable=False),
+)
+
+# Recorrido temporal (iter_features): (window, ts, node_id) sin ordenar en memoria.
+ix_feature_windows_window_ts = Index(
+    "ix_feature_windows_window_ts",
+    feature_windows.c.window, feature_windows.c.ts, feature_windows.c.node_id,
+)
+
+feature_watermarks = Table(
+    "feature_watermarks", metadata,
+    Column("window", String(16), primary_key=True),
+    Column("last_id", Integer, nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
+
+retention_state = Table(
+    "retention_state", metadata,
+    Column("table_name", String(64), primary_key=True),
+    Column("compacted_before", DateTime(timezone=True), nullable=False),
+    Column("deleted_rows", Integer, nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
+
+# Id por debajo del watermark que se vuelven a leer fuera de SQLite
+# (transacciones que se confirman fuera de orden de id).
+ID_MARGIN = int(os.getenv("FEATURE_STORE_ID_MARGIN", "10000"))
+
+# Huecos (sin lecturas nuevas) que se absorben en un mismo rango de recálculo.
+MERGE_GAP = pd.Timedelta("1h")
+
+_RAW = [sensor_readings.c[c] for c in ("id", "ts", "node_id", "latency_ms", "jitter_ms", "rssi_dbm", "noise_dbm", "failure")]
+
+
+def _ensure_tables(engine) -> None:
+    metadata.create_all(engine, tables=[feature_windows, feature_watermarks, retention_state])
+    # create_all no añade índices nuevos a tablas que ya existían.
+    ix_feature_windows_window_ts.create(engine, checkfirst=True)
+
+
+def compacted_before(conn: Connection) -> pd.Timestamp | None:
+    """Horizonte de compactación de sensor_readings (None si nunca se ha compactado)."""
+    ts = conn.execute(
+        select(retention_state.c.compacted_before).where(retention_state.c.table_name == "sensor_readings")
+    ).scalar()
+    return None if ts is None else pd.to_datetime(ts, utc=True)
+
+
+def id_margin(conn: Connection) -> int:
+    """
+    Id por debajo del watermark que pueden no estar agregados todavía: 0 en
+    SQLite (escritor único, los id se confirman en orden), ID_MARGIN en el resto.
+    """
+    return 0 if conn.dialect.name == "sqlite" else ID_MARGIN
+
+
+def rollups_required(db_url: str | None = None) -> bool:
+    """
+    True si sensor_readings ya se ha compactado: el histórico crudo está
+    incompleto y las features deben leerse de feature_windows.
+    """
+    engine = get_engine(db_url)
+    _ensure_tables(engine)
+    with engine.connect() as conn:
+        return compacted_before(conn) is not None
+
+
+def window_step(window: str) -> pd.Timedelta:
+    """
+    Paso de la ventana. Sólo se admiten ventanas fijas que dividen el día
+    (5min, 15min, 1h...): así el borde de cada ventana no depende de la
+    primera lectura del nodo y coincide con window_agg.
+    """
+    freq = pd.tseries.frequencies.to_offset(window)
+    if not isinstance(freq, pd.offsets.Tick) or pd.Timedelta("1D") % pd.Timedelta(freq):
+        raise ValueError(f"Ventana no soportada por el feature store: {window!r} (debe dividir 1 día)")
+    return pd.Timedelta(freq)
+
+
+def _read_sql(stmt, conn: Connection) -> pd.DataFrame:
+    df = pd.read_sql(stmt, conn)
+    # Los nombres llegan como quoted_name de SQLAlchemy; sklearn sólo
+    # registra feature_names_in_ si son str exactos.
+    df.columns = [str(c) for c in df.columns]
+    return df
+
+
+def _read_raw(conn: Connection, stmt) -> pd.DataFrame:
+    df = _read_sql(stmt, conn)
+    df["ts"] = pd.to_datetime(df["ts"], utc=True)
+    if "failure" in df:
+        df["failure"] = df["failure"].fillna(0).astype(int)
+    return df
+
+
+def _touched_ranges(new: pd.DataFrame, step: pd.Timedelta) -> Dict[str, List[Tuple[pd.Timestamp, pd.Timestamp]]]:
+    """
+    Ventanas tocadas por las lecturas nuevas, agrupadas por nodo en rangos
+    [desde, hasta) (una consulta por rango). Huecos de hasta MERGE_GAP se
+    unen al rango: sus ventanas se recalculan igual, y con ventanas finas
+    (1min) y lecturas dispersas evita miles de consultas de una ventana.
+    """
+    gap = max(MERGE_GAP, step)
+    buckets = new.assign(b=new["ts"].dt.floor(step))[["node_id", "b"]].drop_duplicates()
+    ranges: Dict[str, List[Tuple[pd.Timestamp, pd.Timestamp]]] = {}
+    for node, g in buckets.sort_values(["node_id", "b"]).groupby("node_id", sort=False):
+        out: List[Tuple[pd.Timestamp, pd.Timestamp]] = []
+        for b in g["b"]:
+            if out and b - out[-1][1] < gap:
+                out[-1] = (out[-1][0], b + step)
+            else:
+                out.append((b, b + step))
+        ranges[node] = out
+    return ranges
+
+
+def update_feature_store(window: str = "15min", db_url: str | None = None) -> dict:
+    """
+    Actualiza feature_windows para `window` con las lecturas nuevas
+    (id > watermark - id_margin). El coste depende de las ventanas tocadas, no del
+    tamaño total del histórico. Devuelve un resumen de la actualización.
+    """
+    step = window_step(window)
+    engine = get_engine(db_url)
+    _ensure_tables(engine)
+
+    with engine.begin() as conn:
+        last_id = conn.execute(
+            select(feature_watermarks.c.last_id).where(feature_watermarks.c.window == window)
+        ).scalar()
+        last_id = last_id or 0
+        max_id = conn.execute(select(func.max(sensor_readings.c.id))).scalar()
+        if max_id is None or max_id <= last_id:
+            return {"window": window, "new_rows": 0, "windows": 0, "last_id": last_id}
+
+        # 1) Sólo lecturas nuevas (snapshot hasta max_id, más el margen de
+        #    id confirmados fuera de orden), posteriores al horizonte de
+        #    compactación (antes ya no hay lecturas completas).
+        horizon = compacted_before(conn)
+        stmt = select(sensor_readings.c.node_id, sensor_readings.c.ts).where(
+            sensor_readings.c.id > last_id - id_margin(conn), sensor_readings.c.id <= max_id
+        )
+        if horizon is not None:
+            stmt = stmt.where(sensor_readings.c.ts >= horizon.to_pydatetime())
+        new = _read_raw(conn, stmt)
+        ranges = _touched_ranges(new, step)
+
+        # 2) Todas las lecturas (viejas y nuevas) de las ventanas tocadas:
+        #    rangos por (node_id, ts) → usa ix_sensor_readings_node_ts.
+        parts = []
+        for node, spans in ranges.items():
+            for start, end in spans:
+                parts.append(_read_raw(conn, select(*_RAW).where(
+                    sensor_readings.c.node_id == node,
+                    sensor_readings.c.ts >= start.to_pydatetime(),
+                    sensor_readings.c.ts < end.to_pydatetime(),
+                    sensor_readings.c.id <= max_id,
+                )))
+
+        # 3) Recalculamos esas ventanas (mismas agregaciones que window_agg).
+        stats = pd.DataFrame()
+        if parts:
+            raw = pd.concat(parts, ignore_index=True).sort_values(["node_id", "ts"])
+            bucket = raw["ts"].dt.floor(step)
+            bucket.name = "ts"
+            stats = window_stats(raw, bucket).dropna(subset=FEATURE_COLS)
+
+        # 4) Reemplazo atómico: borrar ventanas tocadas, insertar, mover watermark.
+        for node, spans in ranges.items():
+            for start, end in spans:
+                conn.execute(delete(feature_windows).where(and_(
+                    feature_windows.c.window == window,
+                    feature_windows.c.node_id == node,
+                    feature_windows.c.ts >= start.to_pydatetime(),
+                    feature_windows.c.ts < end.to_pydatetime(),
+                )))
+        if len(stats):
+            records = stats.assign(window=window, ts=list(stats["ts"].dt.to_pydatetime()))
+            records["failure"] = records["failure"].astype(int)
+            conn.execute(insert(feature_windows), records.to_dict("records"))
+
+        now = datetime.now(timezone.utc)
+        updated = conn.execute(
+            feature_watermarks.update()
+            .where(feature_watermarks.c.window == window)
+            .values(last_id=max_id, updated_at=now)
+        ).rowcount
+        if not updated:
+            conn.execute(insert(feature_watermarks).values(window=window, last_id=max_id, updated_at=now))
+
+    return {
+        "window": window,
+        "new_rows": len(new),
+        "windows": len(stats),
+        "last_id": max_id,
+    }
+
+
+def load_features(window: str = "15min", db_url: str | None = None) -> Tuple[pd.DataFrame, pd.Series, pd.DataFrame]:
+    """
+    Lee el dataset de entrenamiento desde feature_windows.
+    Devuelve (X, y, full) con las mismas columnas y orden que window_agg.
+    """
+    engine = get_engine(db_url)
+    _ensure_tables(engine)
+    cols = [feature_windows.c[c] for c in ("ts", *FEATURE_COLS, "failure", "node_id")]
+    with engine.connect() as conn:
+        full = _read_sql(
+            select(*cols)
+            .where(feature_windows.c.window == window)
+            .order_by(feature_windows.c.node_id, feature_windows.c.ts),
+            conn,
+        )
+    if full.empty:
+        raise ValueError("El feature store está vacío; ejecuta update_feature_store primero.")
+    full["ts"] = pd.to_datetime(full["ts"], utc=True)
+
+    X = full[FEATURE_COLS].copy()
+    y = full["failure"].astype(int).copy()
+    return X, y, full
+
+
+def feature_time_range(window: str = "15min", db_url: str | None = None) -> Tuple[pd.Timestamp | None, pd.Timestamp | None]:
+    """(primera, última) ventana del store para `window`; (None, None) si está vacío."""
+    engine = get_engine(db_url)
+    _ensure_tables(engine)
+    with engine.connect() as conn:
+        lo, hi = conn.execute(
+            select(func.min(feature_windows.c.ts), func.max(feature_windows.c.ts))
+            .where(feature_windows.c.window == window)
+        ).one()
+    if lo is None:
+        return None, None
+    # ts naive en SQLite ⇒ UTC
+    return pd.to_datetime(lo, utc=True), pd.to_datetime(hi, utc=True)
+
+
+def iter_features(
+    window: str = "15min",
+    db_url: str | None = None,
+    chunk_size: int = 100_000,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Recorre feature_windows de `window` en orden (ts, node_id), por chunks
+    de como mucho `chunk_size` ventanas con ts en [start, end). Paginación
+    keyset sobre ix_feature_windows_window_ts: memoria acotada por chunk.
+    Cada chunk tiene las columnas de load_features (ts, FEATURE_COLS, failure, node_id).
+    """
+    engine = get_engine(db_url)
+    _ensure_tables(engine)
+    t = feature_windows
+    cols = [t.c[c] for c in ("ts", *FEATURE_COLS, "failure", "node_id")]
+
+    where = [t.c.window == window]
+    if start is not None:
+        where.append(t.c.ts >= start)
+    if end is not None:
+        where.append(t.c.ts < end)
+
+    last = None
+    with engine.connect() as conn:
+        while True:
+            stmt = select(*cols).where(*where)
+            if last is not None:
+                stmt = stmt.where(tuple_(t.c.ts, t.c.node_id) > tuple_(*last))
+            stmt = stmt.order_by(t.c.ts, t.c.node_id).limit(chunk_size)
+
+            df = _read_sql(stmt, conn)
+            if df.empty:
+                return
+            df["ts"] = pd.to_datetime(df["ts"], utc=True)
+            last = (df["ts"].iloc[-1].to_pydatetime(), df["node_id"].iloc[-1])
+            yield df
+            if len(df) < chunk_size:
+                return
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Actualiza el feature store incremental")
+    ap.add_argument("--window", default="15min", help="Ventana de agregación (debe dividir 1 día)")
+    args = ap.parse_args()
+    print(update_feature_store(window=args.window))
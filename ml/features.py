@@ -8,11 +8,18 @@
 
 from __future__ import annotations
 
-from typing import Tuple, List
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, Sequence, Tuple, List
 import os
 import json
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import (
+    Boolean, Column, DateTime, Float, Integer, MetaData, String, Table,
+    create_engine, select, tuple_,
+)
+from sqlalchemy.engine import Engine
 
 
 # Columnas crudas tal como están en la tabla
@@ -29,6 +36,49 @@ FEATURE_COLS = [
     "noise_dbm_mean",  "noise_dbm_std",  "noise_dbm_p95",
 ]
 
+# Vista Core (sólo lectura) de la tabla de la API, para construir consultas
+# tipadas (los ts se enlazan con el mismo formato con que se guardaron).
+metadata = MetaData()
+sensor_readings = Table(
+    "sensor_readings", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("ts", DateTime(timezone=True)),
+    Column("node_id", String(64)),
+    Column("latency_ms", Float),
+    Column("jitter_ms", Float),
+    Column("rssi_dbm", Float),
+    Column("noise_dbm", Float),
+    Column("failure", Boolean),
+)
+
+# Tipos compactos para la carga por chunks: ~4x menos memoria que
+# object + float64 (float32 conserva ~7 cifras significativas).
+COMPACT_DTYPES = {
+    "node_id": "category",
+    "latency_ms": "float32",
+    "jitter_ms": "float32",
+    "rssi_dbm": "float32",
+    "noise_dbm": "float32",
+    "failure": "int8",
+}
+
+def get_engine(db_url: str | None = None) -> Engine:
+    """
+    Engine para la BD de lecturas: db_url o el env DB_URL
+    (por defecto sqlite:///./smartnet.db). Uno por URL y proceso, así
+    los trabajos periódicos (ml.maintenance) reutilizan su pool.
+    """
+    return _engine_for(db_url or os.getenv("DB_URL", "sqlite:///./smartnet.db"))
+
+
+@lru_cache(maxsize=None)
+def _engine_for(db_url: str) -> Engine:
+    return create_engine(
+        db_url,
+        connect_args={"check_same_thread": False} if db_url.startswith("sqlite") else {}
+    )
+
+
 #crea el dataframe
 def load_dataframe(db_url: str | None = None) -> pd.DataFrame:
     """
@@ -38,11 +88,7 @@ def load_dataframe(db_url: str | None = None) -> pd.DataFrame:
     - db_url por defecto toma el env DB_URL (o sqlite:///./smartnet.db)
     - convierte 'ts' a datetime (timezone-aware si viene así)
     """
-    db_url = db_url or os.getenv("DB_URL", "sqlite:///./smartnet.db")
-    engine = create_engine(
-        db_url,
-        connect_args={"check_same_thread": False} if db_url.startswith("sqlite") else {}
-    )
+    engine = get_engine(db_url)
     #dataframe lee
     # Leemos toda la tabla (para proyecto educativo está bien).
     df = pd.read_sql("SELECT id, ts, node_id, latency_ms, jitter_ms, rssi_dbm, noise_dbm, failure FROM sensor_readings", engine)
@@ -55,15 +101,75 @@ def load_dataframe(db_url: str | None = None) -> pd.DataFrame:
     return df
 
 
+def iter_dataframe(
+    db_url: str | None = None,
+    chunk_size: int = 200_000,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    nodes: Sequence[str] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Lee sensor_readings por chunks de como mucho `chunk_size` filas, con
+    tipos compactos (COMPACT_DTYPES) y columnas RAW_COLS.
+
+    - Orden (node_id, ts, id) con paginación keyset sobre el índice
+      ix_sensor_readings_node_ts: cada consulta sigue donde acabó la
+      anterior (sin OFFSET) y la memoria queda acotada por chunk_size.
+    - start/end filtran por ts en [start, end); nodes restringe node_id.
+    - Es la entrada natural de `window_agg_chunked`.
+    """
+    engine = get_engine(db_url)
+    t = sensor_readings
+    cols = [t.c[c] for c in RAW_COLS]
+
+    where = []
+    if start is not None:
+        where.append(t.c.ts >= start)
+    if end is not None:
+        where.append(t.c.ts < end)
+    if nodes is not None:
+        where.append(t.c.node_id.in_(list(nodes)))
+
+    last = None
+    with engine.connect() as conn:
+        while True:
+            stmt = select(*cols).where(*where)
+            if last is not None:
+                stmt = stmt.where(tuple_(t.c.node_id, t.c.ts, t.c.id) > tuple_(*last))
+            stmt = stmt.order_by(t.c.node_id, t.c.ts, t.c.id).limit(chunk_size)
+
+            df = pd.read_sql(stmt, conn)
+            if df.empty:
+                return
+            df["ts"] = pd.to_datetime(df["ts"], utc=True)
+            df["failure"] = df["failure"].fillna(0)
+            df = df.astype(COMPACT_DTYPES)
+
+            tail = df.iloc[-1]
+            last = (tail["node_id"], tail["ts"].to_pydatetime(), int(tail["id"]))
+            yield df
+            if len(df) < chunk_size:
+                return
+
+
+# Métricas crudas que se agregan por ventana (en el orden de FEATURE_COLS)
+METRIC_COLS = ["latency_ms", "jitter_ms", "rssi_dbm", "noise_dbm"]
+
+
 def window_agg(df: pd.DataFrame, window: str = "15min") -> Tuple[pd.DataFrame, pd.Series, pd.DataFrame]:
     """
     Convierte histórico crudo a dataset de entrenamiento por ventanas.
 
     Para cada node_id:
-      - re-indexa por ts y hace resample en ventanas 'window'
+      - asigna cada lectura a su ventana 'window' (mismos bordes que resample)
       - calcula mean, std, p95 para cada métrica
       - la etiqueta 'failure' es el máximo en la ventana (hubo algún fallo?)
 
+    Implementación en una sola pasada: un groupby por (node_id, ventana) con
+    agregaciones nativas (sin lambdas por ventana). Devuelve exactamente lo
+    mismo que `window_agg_loop` (incluido el índice). Ventanas que no son de
+    frecuencia fija (p.ej. "1M") usan `window_agg_loop`.
+
     Devuelve:
       X : DataFrame de features (columnas FEATURE_COLS)
       y : Serie binaria de etiquetas (0/1)
@@ -72,6 +178,194 @@ def window_agg(df: pd.DataFrame, window: str = "15min") -> Tuple[pd.DataFrame, p
     if df.empty:
         raise ValueError("No hay datos en la base; ingesta primero.")
 
+    freq = pd.tseries.frequencies.to_offset(window)
+    if not isinstance(freq, pd.offsets.Tick):
+        return window_agg_loop(df, window=window)
+    step = pd.Timedelta(freq)
+
+    df = df.sort_values(["node_id", "ts"])
+    node = df["node_id"]
+    ts = df["ts"]
+
+    # 1) Borde de ventana por lectura. resample usa origin="start_day":
+    #    las ventanas de cada nodo parten de la medianoche de su primera lectura.
+    origin = ts.groupby(node, sort=False).transform("min").dt.floor("D")
+    bucket = origin + ((ts - origin) // step) * step
+    bucket.name = "ts"
+
+    # 2) Agregaciones nativas por (node_id, ventana).
+    full = window_stats(df, bucket)
+
+    # 3) Mismo índice que concatenar los resample por nodo: posición de la
+    #    ventana contando también las ventanas vacías de cada nodo.
+    bins = ((full["ts"] - full.groupby("node_id", sort=False)["ts"].transform("min")) // step).astype("int64")
+    span = full.groupby("node_id", sort=True)["ts"].agg(["min", "max"])
+    n_bins = ((span["max"] - span["min"]) // step).astype("int64") + 1
+    offset = n_bins.cumsum() - n_bins
+    full.index = pd.Index(full["node_id"].map(offset).to_numpy() + bins.to_numpy())
+
+    # Con ventanas vacías, resample deja NaN en 'failure' y la columna pasa a float.
+    if (n_bins > full.groupby("node_id", sort=True).size()).any():
+        full["failure"] = full["failure"].astype("float64")
+
+    # quitamos ventanas vacías (pueden introducir NaN en std/p95)
+    full = full.dropna(subset=FEATURE_COLS)
+
+    X = full[FEATURE_COLS].copy()
+    y = full["failure"].astype(int).copy()
+    return X, y, full
+
+
+def window_agg_chunked(
+    chunks: Iterable[pd.DataFrame], window: str = "15min"
+) -> Tuple[pd.DataFrame, pd.Series, pd.DataFrame]:
+    """
+    `window_agg` sobre un flujo de chunks ordenados por (node_id, ts), como
+    los de `iter_dataframe`. En memoria sólo hay un chunk más las lecturas
+    de la última ventana abierta (que se completa con el chunk siguiente).
+
+    Devuelve lo mismo que window_agg sobre la concatenación de los chunks
+    (índice incluido). Las métricas se agregan en float64.
+    """
+    freq = pd.tseries.frequencies.to_offset(window)
+    if not isinstance(freq, pd.offsets.Tick):
+        raise ValueError(f"window_agg_chunked necesita una ventana de frecuencia fija: {window!r}")
+    step = pd.Timedelta(freq)
+
+    origins: Dict[str, pd.Timestamp] = {}   # medianoche de la 1ª lectura (origin="start_day")
+    first_bucket: Dict[str, pd.Timestamp] = {}
+    last_bucket: Dict[str, pd.Timestamp] = {}
+    windows: Dict[str, int] = {}            # ventanas no vacías por nodo
+    offsets: Dict[str, int] = {}            # posición de la 1ª ventana del nodo en el índice
+    next_offset = 0
+    prev_node: str | None = None
+    parts: List[pd.DataFrame] = []
+    carry: pd.DataFrame | None = None
+
+    def process(df: pd.DataFrame) -> None:
+        nonlocal next_offset, prev_node
+        for n, first_ts in df.groupby("node_id", sort=False)["ts"].min().items():
+            origins.setdefault(n, first_ts.floor("D"))
+        origin = df["node_id"].map(origins).astype(df["ts"].dtype)
+        bucket = origin + ((df["ts"] - origin) // step) * step
+        bucket.name = "ts"
+        stats = window_stats(df, bucket)
+
+        span = stats.groupby("node_id", sort=False)["ts"].agg(["min", "max", "size"])
+        for n, (b_min, b_max, count) in span.iterrows():
+            if n not in first_bucket:
+                # nodo nuevo: el anterior ya terminó y su tramo de ventanas es fijo
+                if prev_node is not None:
+                    next_offset += int((last_bucket[prev_node] - first_bucket[prev_node]) // step) + 1
+                first_bucket[n] = b_min
+                offsets[n] = next_offset
+                windows[n] = 0
+                prev_node = n
+            last_bucket[n] = b_max
+            windows[n] += int(count)
+
+        bins = ((stats["ts"] - stats["node_id"].map(first_bucket).astype(stats["ts"].dtype)) // step).astype("int64")
+        stats.index = pd.Index(stats["node_id"].map(offsets).to_numpy() + bins.to_numpy())
+        parts.append(stats.dropna(subset=FEATURE_COLS))
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        chunk = chunk.astype({"node_id": str, **{c: "float64" for c in METRIC_COLS}})
+        df = chunk if carry is None else pd.concat([carry, chunk], ignore_index=True)
+
+        # La última ventana del último nodo puede continuar en el chunk siguiente.
+        tail_node = df["node_id"].iloc[-1]
+        tail_origin = origins.get(tail_node, df.loc[df["node_id"] == tail_node, "ts"].min().floor("D"))
+        tail_start = tail_origin + ((df["ts"].iloc[-1] - tail_origin) // step) * step
+        hold = (df["node_id"] == tail_node) & (df["ts"] >= tail_start)
+        carry = df[hold]
+        if (~hold).any():
+            process(df[~hold])
+
+    if carry is not None and len(carry):
+        process(carry)
+    if not parts:
+        raise ValueError("No hay datos en la base; ingesta primero.")
+
+    full = pd.concat(parts)
+    n_bins = {n: int((last_bucket[n] - first_bucket[n]) // step) + 1 for n in last_bucket}
+    if any(n_bins[n] > windows[n] for n in n_bins):
+        full["failure"] = full["failure"].astype("float64")
+
+    X = full[FEATURE_COLS].copy()
+    y = full["failure"].astype(int).copy()
+    return X, y, full
+
+
+def window_stats(df: pd.DataFrame, bucket: pd.Series) -> pd.DataFrame:
+    """
+    Estadísticas por (node_id, ventana) de las lecturas de `df`, con
+    `bucket` = borde de ventana de cada lectura (Serie llamada "ts").
+    Devuelve una fila por ventana NO vacía con columnas
+    ts, FEATURE_COLS, failure, node_id, ordenadas por (node_id, ts).
+    Las ventanas con una sola lectura quedan con std NaN (sin filtrar).
+    """
+    g = df.groupby([df["node_id"], bucket], sort=True)
+    mean = g[METRIC_COLS].mean()
+    std = g[METRIC_COLS].std()
+    codes = g.ngroup().to_numpy()
+    p95 = pd.DataFrame(
+        {col: _segment_quantile(df[col].to_numpy(dtype="float64"), codes, g.ngroups, 0.95) for col in METRIC_COLS},
+        index=mean.index,
+    )
+    failure = g["failure"].max()
+
+    full = pd.DataFrame(index=mean.index)
+    for col in METRIC_COLS:
+        full[f"{col}_mean"] = mean[col]
+        full[f"{col}_std"] = std[col]
+        full[f"{col}_p95"] = p95[col]
+    full["failure"] = failure
+    return full.reset_index()[["ts", *FEATURE_COLS, "failure", "node_id"]]
+
+
+def _segment_quantile(values: np.ndarray, codes: np.ndarray, n_groups: int, q: float) -> np.ndarray:
+    """
+    Cuantil `q` por grupo con la interpolación lineal de NumPy (la que usa
+    Series.quantile): un único sort por (grupo, valor) y lectura de los dos
+    vecinos de cada grupo. Ignora NaN como Series.quantile.
+    """
+    order = np.lexsort((values, codes))
+    v = values[order]
+    c = codes[order]
+
+    starts = np.searchsorted(c, np.arange(n_groups), side="left")
+    valid = np.bincount(codes[~np.isnan(values)], minlength=n_groups)
+
+    # Mismas operaciones (y en el mismo orden) que numpy.quantile(method="linear").
+    virtual = (valid - 1) * q
+    prev = np.floor(virtual)
+    nxt = prev + 1
+    gamma = virtual - prev
+    above = virtual >= valid - 1
+    prev[above] = valid[above] - 1
+    nxt[above] = valid[above] - 1
+
+    a = v[np.clip(starts + prev.astype(np.int64), 0, len(v) - 1)]
+    b = v[np.clip(starts + nxt.astype(np.int64), 0, len(v) - 1)]
+    diff = b - a
+    out = a + diff * gamma
+    hi = gamma >= 0.5
+    out[hi] = b[hi] - diff[hi] * (1 - gamma[hi])
+    out[valid == 0] = np.nan
+    return out
+
+
+def window_agg_loop(df: pd.DataFrame, window: str = "15min") -> Tuple[pd.DataFrame, pd.Series, pd.DataFrame]:
+    """
+    Implementación original de `window_agg`: un resample por nodo con p95
+    por lambda. Se mantiene como referencia (paridad/benchmarks) y para
+    ventanas de calendario que no son de frecuencia fija.
+    """
+    if df.empty:
+        raise ValueError("No hay datos en la base; ingesta primero.")
+
     df = df.sort_values(["node_id", "ts"]).copy()
 
     frames = []
@@ -0,0 +1,270 @@
+# ------------------------------------------------------------
+# Mantenimiento de sensor_readings:
+#  - rollups: mantiene feature_windows al día para 1min, 15min y 1h
+#    (mean/std/p95 + failure max, mismas columnas que FEATURE_COLS)
+#    con la actualización incremental del feature store
+#  - retención: borra (o archiva en CSV.gz y borra) las lecturas crudas
+#    más antiguas que `retention`, por lotes de `batch_rows` en
+#    transacciones cortas (el escritor de /ingest no espera más que un lote)
+#  - sólo se borran lecturas ya agregadas por TODOS los rollups
+#    (id <= watermark mínimo - feature_store.id_margin) y anteriores a un horizonte alineado al día,
+#    así ninguna ventana queda a medias
+#  - dedup: borra las lecturas repetidas (mismo node_id y ts; se queda la
+#    de menor id) y crea el índice único que exige INGEST_DEDUP
+#  - `stop` (threading.Event, app/maintenance.py) se comprueba entre
+#    rollups y entre lotes de borrado: al apagar no se empieza otro
+#
+# Uso:
+#   python -m ml.maintenance                       # sólo rollups
+#   python -m ml.maintenance --retention 30D --archive-dir archive/
+#   python -m ml.maintenance --dedup               # antes de INGEST_DEDUP=1
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import csv
+import gzip
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import delete, func, insert, inspect as sa_inspect, select, text
+from sqlalchemy.engine import Engine
+
+from ml.features import RAW_COLS, get_engine, sensor_readings
+from ml.feature_store import (
+    _ensure_tables, compacted_before, feature_watermarks, id_margin, retention_state, update_feature_store,
+)
+
+ROLLUP_WINDOWS = ["1min", "15min", "1h"]
+
+# Índice único de INGEST_DEDUP (no está en el modelo: sin dedup, create_all
+# no debe imponerlo sobre BDs que ya tengan repetidas)
+DEDUP_INDEX = "ux_sensor_readings_node_ts"
+
+
+class DuplicateReadings(RuntimeError):
+    """Hay lecturas repetidas (node_id, ts): no se puede crear el índice único."""
+
+
+def _stopped(stop: Optional[threading.Event]) -> bool:
+    return stop is not None and stop.is_set()
+
+
+def refresh_rollups(
+    windows: Sequence[str] = ROLLUP_WINDOWS,
+    db_url: str | None = None,
+    stop: Optional[threading.Event] = None,
+) -> List[dict]:
+    """Actualiza cada rollup con las lecturas nuevas (coste ∝ lecturas nuevas)."""
+    out = []
+    for w in windows:
+        if _stopped(stop):
+            break
+        out.append(update_feature_store(window=w, db_url=db_url))
+    return out
+
+
+def _archive(rows: List[tuple], archive_dir: str) -> str:
+    """Escribe un lote borrado en archive_dir/sensor_readings_<id0>_<id1>.csv.gz."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"sensor_readings_{rows[0][0]}_{rows[-1][0]}.csv.gz")
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wt", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(RAW_COLS)
+        w.writerows(rows)
+    os.replace(tmp, path)
+    return path
+
+
+def apply_retention(
+    retention: str,
+    windows: Sequence[str] = ROLLUP_WINDOWS,
+    db_url: str | None = None,
+    batch_rows: int = 5000,
+    pause: float = 0.01,
+    archive_dir: Optional[str] = None,
+    now: Optional[datetime] = None,
+    stop: Optional[threading.Event] = None,
+) -> Dict[str, object]:
+    """
+    Borra las lecturas crudas con ts < horizonte, donde
+    horizonte = (now - retention) redondeado hacia abajo al día.
+    Cada lote es su propia transacción (con `pause` segundos entre lotes);
+    si `stop` se activa, no se empieza el siguiente lote.
+    Devuelve un resumen: horizonte, filas borradas, lotes, ficheros
+    archivados y si se paró antes de terminar.
+    """
+    engine = get_engine(db_url)
+    _ensure_tables(engine)
+    now = pd.Timestamp(now or datetime.now(timezone.utc))
+    horizon = (now - pd.Timedelta(retention)).floor("1D")
+
+    with engine.begin() as conn:
+        # 1) Sólo lo ya agregado por todos los rollups (y por cualquier otra
+        #    ventana del feature store, p.ej. la de entrenamiento).
+        marks = dict(conn.execute(
+            select(feature_watermarks.c.window, feature_watermarks.c.last_id)
+        ).all())
+        missing = [w for w in windows if w not in marks]
+        if missing:
+            return {"horizon": None, "deleted": 0, "batches": 0, "archived": [], "skipped": f"sin rollup: {missing}"}
+        #    Fuera de SQLite, los id del margen bajo el watermark pueden
+        #    no estar agregados todavía (feature_store.id_margin).
+        safe_id = min(marks.values()) - id_margin(conn)
+
+        # 2) Publicamos el horizonte ANTES de borrar: a partir de aquí el
+        #    feature store ignora lecturas tardías anteriores a él.
+        previous = compacted_before(conn)
+        if previous is not None and previous >= horizon:
+            horizon = previous
+        values = dict(compacted_before=horizon.to_pydatetime(), updated_at=now.to_pydatetime())
+        updated = conn.execute(
+            retention_state.update()
+            .where(retention_state.c.table_name == "sensor_readings")
+            .values(**values)
+        ).rowcount
+        if not updated:
+            conn.execute(insert(retention_state).values(table_name="sensor_readings", deleted_rows=0, **values))
+
+    # 3) Borrado por lotes en orden de id (PK): transacciones cortas y un
+    #    cursor por id para no volver a recorrer lo ya visto.
+    t = sensor_readings
+    cols = [t.c[c] for c in RAW_COLS]
+    deleted, batches, archived, cursor = 0, 0, [], 0
+    while not _stopped(stop):
+        with engine.begin() as conn:
+            cond = (t.c.id > cursor) & (t.c.id <= safe_id) & (t.c.ts < horizon.to_pydatetime())
+            if archive_dir:
+                rows = conn.execute(select(*cols).where(cond).order_by(t.c.id).limit(batch_rows)).all()
+                ids = [r[0] for r in rows]
+            else:
+                ids = list(conn.execute(select(t.c.id).where(cond).order_by(t.c.id).limit(batch_rows)).scalars())
+            if not ids:
+                break
+            if archive_dir:
+                # Si el borrado falla, el fichero queda y el lote se reintenta
+                # (mismo nombre: se sobrescribe).
+                archived.append(_archive(rows, archive_dir))
+            # Los ids son los primeros que cumplen `cond`: basta acotar por el último.
+            conn.execute(delete(t).where(cond, t.c.id <= ids[-1]))
+            conn.execute(
+                retention_state.update()
+                .where(retention_state.c.table_name == "sensor_readings")
+                .values(deleted_rows=retention_state.c.deleted_rows + len(ids))
+            )
+        cursor = ids[-1]
+        deleted += len(ids)
+        batches += 1
+        if len(ids) < batch_rows:
+            break
+        time.sleep(pause)
+
+    return {
+        "horizon": horizon.isoformat(),
+        "deleted": deleted,
+        "batches": batches,
+        "archived": archived,
+        "stopped": _stopped(stop),
+    }
+
+
+def run_maintenance(
+    windows: Sequence[str] = ROLLUP_WINDOWS,
+    retention: Optional[str] = None,
+    db_url: str | None = None,
+    batch_rows: int = 5000,
+    pause: float = 0.01,
+    archive_dir: Optional[str] = None,
+    stop: Optional[threading.Event] = None,
+) -> Dict[str, object]:
+    """
+    Rollups primero (así el watermark cubre todo) y después retención.
+    `stop` corta entre rollups y entre lotes de borrado.
+    """
+    t0 = time.perf_counter()
+    out: Dict[str, object] = {"rollups": refresh_rollups(windows, db_url=db_url, stop=stop)}
+    if retention and not _stopped(stop):
+        out["retention"] = apply_retention(
+            retention, windows, db_url=db_url, batch_rows=batch_rows, pause=pause,
+            archive_dir=archive_dir, stop=stop,
+        )
+    out["seconds"] = round(time.perf_counter() - t0, 3)
+    return out
+
+
+def _duplicate_ids(conn) -> List[int]:
+    keep = select(func.min(sensor_readings.c.id)).group_by(sensor_readings.c.node_id, sensor_readings.c.ts)
+    return conn.execute(select(sensor_readings.c.id).where(sensor_readings.c.id.not_in(keep))).scalars().all()
+
+
+def ensure_dedup_index(engine: Engine) -> None:
+    """
+    Crea (si no existe) el índice único (node_id, ts) sobre el que trabaja el
+    INSERT ... ON CONFLICT DO NOTHING de la ingesta con INGEST_DEDUP.
+    Lanza DuplicateReadings si la tabla ya tiene repetidas.
+    """
+    with engine.connect() as conn:
+        if DEDUP_INDEX in {ix["name"] for ix in sa_inspect(conn).get_indexes("sensor_readings")}:
+            return
+        n = len(_duplicate_ids(conn))
+    if n:
+        raise DuplicateReadings(
+            f"sensor_readings tiene {n} lecturas repetidas (node_id, ts); "
+            "bórralas con `python -m ml.maintenance --dedup` antes de activar INGEST_DEDUP"
+        )
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {DEDUP_INDEX} ON sensor_readings (node_id, ts)"))
+
+
+def dedup_readings(db_url: str | None = None, batch_rows: int = 5000, pause: float = 0.01) -> Dict[str, object]:
+    """
+    Borra por lotes las lecturas repetidas (se conserva la de menor id) y crea
+    el índice único. Los rollups ya calculados no se recalculan.
+    """
+    t0 = time.perf_counter()
+    engine = get_engine(db_url)
+    with engine.connect() as conn:
+        ids = _duplicate_ids(conn)
+    for i in range(0, len(ids), batch_rows):
+        with engine.begin() as conn:
+            conn.execute(delete(sensor_readings).where(sensor_readings.c.id.in_(ids[i : i + batch_rows])))
+        time.sleep(pause)
+    ensure_dedup_index(engine)
+    return {"deleted": len(ids), "index": DEDUP_INDEX, "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def raw_row_count(db_url: str | None = None) -> int:
+    with get_engine(db_url).connect() as conn:
+        return conn.execute(select(func.count()).select_from(sensor_readings)).scalar()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Rollups + retención de sensor_readings")
+    ap.add_argument("--windows", nargs="+", default=ROLLUP_WINDOWS, help="Resoluciones de rollup (deben dividir 1 día)")
+    ap.add_argument("--retention", default=None, help="Antigüedad máxima de las lecturas crudas (p.ej. 30D); sin ella no se borra nada")
+    ap.add_argument("--batch-rows", type=int, default=5000, help="Filas por transacción de borrado")
+    ap.add_argument("--pause", type=float, default=0.01, help="Segundos entre lotes de borrado")
+    ap.add_argument("--archive-dir", default=None, help="Archiva cada lote en CSV.gz antes de borrarlo")
+    ap.add_argument("--dedup", action="store_true", help="Sólo borra lecturas repetidas (node_id, ts) y crea el índice único")
+    args = ap.parse_args()
+
+    if args.dedup:
+        print(dedup_readings(batch_rows=args.batch_rows, pause=args.pause))
+        print({"raw_rows": raw_row_count()})
+        raise SystemExit(0)
+
+    print(run_maintenance(
+        windows=args.windows,
+        retention=args.retention,
+        batch_rows=args.batch_rows,
+        pause=args.pause,
+        archive_dir=args.archive_dir,
+    ))
+    print({"raw_rows": raw_row_count()})
@@ -0,0 +1,126 @@
+# ------------------------------------------------------------
+# Registro versionado de modelos:
+#
+#   <root>/                       (por defecto artifacts/models)
+#     LATEST                      nombre de la versión publicada
+#     20261017T101500Z/
+#       model.joblib              pipeline de sklearn (sin comprimir → mmap)
+#       feature_spec.json         orden de columnas de features
+#       metadata.json             window, val_auc, tamaños, fecha...
+#
+#  - save_version escribe en un directorio temporal y lo renombra:
+#    una versión nunca es visible a medio escribir
+#  - publish actualiza LATEST con os.replace (atómico); la API sólo
+#    tiene que vigilar ese fichero para detectar versiones nuevas
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import joblib
+
+from ml.features import save_feature_spec
+
+MODEL_FILE = "model.joblib"
+SPEC_FILE = "feature_spec.json"
+METADATA_FILE = "metadata.json"
+LATEST_FILE = "LATEST"
+
+
+def new_version(now: Optional[datetime] = None) -> str:
+    """Nombre de versión ordenable: fecha UTC de entrenamiento."""
+    now = now or datetime.now(timezone.utc)
+    return now.strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def version_dir(root: str, version: str) -> str:
+    return os.path.join(root, version)
+
+
+def save_version(pipe: Any, metadata: Dict[str, Any], root: str, version: Optional[str] = None) -> str:
+    """
+    Guarda modelo + feature spec + metadatos como una versión nueva (sin
+    publicarla). Devuelve el nombre de la versión.
+    """
+    version = version or new_version()
+    final = version_dir(root, version)
+    if os.path.exists(final):
+        raise FileExistsError(f"La versión {version} ya existe en {root}")
+
+    tmp = version_dir(root, f".tmp-{version}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        # Sin compresión: así joblib.load(mmap_mode="r") mapea los arrays.
+        joblib.dump(pipe, os.path.join(tmp, MODEL_FILE))
+        save_feature_spec(os.path.join(tmp, SPEC_FILE))
+        with open(os.path.join(tmp, METADATA_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": version, **metadata}, f, indent=2, default=str)
+        os.rename(tmp, final)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return version
+
+
+def publish(root: str, version: str) -> None:
+    """Marca `version` como la versión servida (escritura atómica de LATEST)."""
+    if not os.path.isdir(version_dir(root, version)):
+        raise FileNotFoundError(f"No existe la versión {version} en {root}")
+    tmp = os.path.join(root, f".{LATEST_FILE}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, LATEST_FILE))
+
+
+def latest_version(root: str) -> Optional[str]:
+    """Versión publicada en LATEST (None si aún no hay ninguna)."""
+    try:
+        with open(os.path.join(root, LATEST_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(root: str) -> List[str]:
+    """Versiones completas del registro, de la más antigua a la más nueva."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if not name.startswith(".") and os.path.isdir(version_dir(root, name))
+    )
+
+
+def read_metadata(root: str, version: str) -> Dict[str, Any]:
+    with open(os.path.join(version_dir(root, version), METADATA_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Registro versionado de modelos")
+    ap.add_argument("--root", default=os.path.join(os.getenv("ARTIFACTS", "artifacts"), "models"))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="Lista las versiones (* = publicada)")
+    pub = sub.add_parser("publish", help="Publica una versión (p.ej. rollback)")
+    pub.add_argument("version")
+    args = ap.parse_args()
+
+    if args.cmd == "publish":
+        publish(args.root, args.version)
+        print(f"✔ Publicada {args.version}")
+    else:
+        current = latest_version(args.root)
+        for v in list_versions(args.root):
+            meta = read_metadata(args.root, v)
+            mark = "*" if v == current else " "
+            print(f"{mark} {v}  window={meta.get('window')}  val_auc={meta.get('val_auc')}")
@@ -0,0 +1,236 @@
+# ------------------------------------------------------------
+# Barrido de entrenamiento (ventanas × hiperparámetros):
+#  - carga el histórico UNA vez y agrega cada ventana UNA vez
+#  - publica X, y y la máscara de train de cada ventana en bloques de
+#    multiprocessing.shared_memory: los workers los ven como arrays de
+#    NumPy sin copiarlos ni serializarlos
+#  - reparte los fits (ventana, C, class_weight) en un ProcessPoolExecutor
+#  - escribe la tabla de resultados ordenada por val_auc y guarda +
+#    publica el mejor modelo (mismos artefactos que ml.train)
+#
+# Uso:
+#   python -m ml.sweep
+#   python -m ml.sweep --windows 5min 15min 1h --C 0.01 0.1 1 10 --workers 4
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+from threadpoolctl import threadpool_limits
+
+from ml.features import FEATURE_COLS, load_dataframe, window_agg
+from ml.feature_store import load_features, rollups_required, update_feature_store
+from ml.train import ART_DIR, build_pipeline, save_artifacts
+
+SWEEP_RESULTS_PATH = os.path.join(ART_DIR, "sweep_results.csv")
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Referencia picklable a un array en memoria compartida."""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def _share(arr: np.ndarray, blocks: List[shared_memory.SharedMemory]) -> SharedArray:
+    """Copia `arr` (una vez, en el padre) a un bloque compartido nuevo."""
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    blocks.append(shm)
+    return SharedArray(shm.name, arr.shape, arr.dtype.str)
+
+
+# --- estado de cada worker (se rellena en _init_worker) ---
+_BLOCKS: List[shared_memory.SharedMemory] = []
+_DATA: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+
+def _attach(ref: SharedArray) -> np.ndarray:
+    # Los workers comparten el resource tracker del padre: el registro del
+    # bloque es el mismo y sólo el padre hace unlink al terminar.
+    shm = shared_memory.SharedMemory(name=ref.name)
+    _BLOCKS.append(shm)
+    arr = np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=shm.buf)
+    arr.flags.writeable = False
+    return arr
+
+
+def _init_worker(refs: Dict[str, Tuple[SharedArray, SharedArray, SharedArray]]) -> None:
+    # Un hilo de BLAS por proceso: el paralelismo lo da el pool.
+    threadpool_limits(1)
+    for window, (x, y, train) in refs.items():
+        _DATA[window] = (_attach(x), _attach(y), _attach(train))
+
+
+def _fit_one(window: str, C: float, class_weight: Optional[str]) -> dict:
+    """Entrena y evalúa una combinación sobre los arrays compartidos."""
+    X, y, train = _DATA[window]
+    t0 = time.perf_counter()
+    pipe = build_pipeline(C=C, class_weight=class_weight)
+    pipe.fit(pd.DataFrame(X[train], columns=FEATURE_COLS), y[train])
+    p_val = pipe.predict_proba(pd.DataFrame(X[~train], columns=FEATURE_COLS))[:, 1]
+    return {
+        "window": window,
+        "C": C,
+        "class_weight": class_weight or "none",
+        "val_auc": float(roc_auc_score(y[~train], p_val)),
+        "n_train": int(train.sum()),
+        "n_val": int((~train).sum()),
+        "fit_seconds": round(time.perf_counter() - t0, 4),
+    }
+
+
+def prepare_windows(
+    load: Callable[[str], Tuple[pd.DataFrame, pd.Series, pd.DataFrame]],
+    windows: List[str],
+    test_size: float,
+    seed: int,
+) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Obtiene cada ventana una vez con `load(window)` -> (X, y, full) y fija
+    su split (el mismo que ml.train): devuelve
+    {window: (X float64, y int8, máscara de train)}.
+    Las ventanas con una sola clase se descartan.
+    """
+    out = {}
+    for window in windows:
+        X, y, _ = load(window)
+        if y.nunique() < 2:
+            print(f"⚠ {window}: todas las etiquetas son iguales, se omite")
+            continue
+        idx_train, _ = train_test_split(
+            np.arange(len(y)), test_size=test_size, random_state=seed, stratify=y
+        )
+        train = np.zeros(len(y), dtype=bool)
+        train[idx_train] = True
+        out[window] = (
+            np.ascontiguousarray(X.to_numpy(dtype=np.float64)),
+            y.to_numpy(dtype=np.int8),
+            train,
+        )
+    return out
+
+
+def run_sweep(
+    windows: List[str],
+    Cs: List[float],
+    class_weights: List[Optional[str]],
+    test_size: float = 0.25,
+    seed: int = 42,
+    workers: Optional[int] = None,
+    results_path: str = SWEEP_RESULTS_PATH,
+    save_best: bool = True,
+) -> pd.DataFrame:
+    # 1) Histórico una sola vez (o, si sensor_readings está compactado,
+    #    directamente los rollups del feature store)
+    t0 = time.perf_counter()
+    if rollups_required():
+        df = None
+        def load(window: str):
+            update_feature_store(window=window)
+            return load_features(window=window)
+    else:
+        df = load_dataframe()
+        if df.empty:
+            raise SystemExit("No hay datos en la BD. Ejecuta el generador sintético o ingesta manualmente.")
+        def load(window: str):
+            return window_agg(df, window=window)
+
+    # 2) Cada ventana se agrega una sola vez
+    t1 = time.perf_counter()
+    data = prepare_windows(load, windows, test_size, seed)
+    del df, load
+    t2 = time.perf_counter()
+    if not data:
+        raise SystemExit("Ninguna ventana tiene las dos clases. Ajusta el generador: --degrade/--failure-bias.")
+
+    # 3) Matrices a memoria compartida + fits en paralelo
+    grid = [(w, C, cw) for w in data for C in Cs for cw in class_weights]
+    blocks: List[shared_memory.SharedMemory] = []
+    try:
+        refs = {w: tuple(_share(a, blocks) for a in arrays) for w, arrays in data.items()}
+        with ProcessPoolExecutor(
+            max_workers=workers or min(len(grid), os.cpu_count() or 1),
+            initializer=_init_worker,
+            initargs=(refs,),
+        ) as pool:
+            rows = list(pool.map(_fit_one, *zip(*grid)))
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+    t3 = time.perf_counter()
+
+    # 4) Tabla ordenada por AUC de validación
+    results = (
+        pd.DataFrame(rows)
+        .sort_values(["val_auc", "fit_seconds"], ascending=[False, True], kind="stable")
+        .reset_index(drop=True)
+    )
+    results.insert(0, "rank", np.arange(1, len(results) + 1))
+    os.makedirs(os.path.dirname(results_path) or ".", exist_ok=True)
+    results.to_csv(results_path, index=False)
+    print(results.to_string(index=False))
+    print(f"✔ Resultados del barrido en: {results_path}")
+    print({
+        "fits": len(grid),
+        "load_s": round(t1 - t0, 3),
+        "aggregate_s": round(t2 - t1, 3),
+        "fit_s": round(t3 - t2, 3),
+    })
+
+    # 5) Re-entrena la mejor combinación (mismo split) y la guarda/publica
+    if save_best:
+        best = results.iloc[0]
+        X, y, train = data[best["window"]]
+        class_weight = None if best["class_weight"] == "none" else best["class_weight"]
+        pipe = build_pipeline(C=float(best["C"]), class_weight=class_weight)
+        pipe.fit(pd.DataFrame(X[train], columns=FEATURE_COLS), y[train])
+        save_artifacts(pipe, {
+            "window": best["window"],
+            "val_auc": float(best["val_auc"]),
+            "C": float(best["C"]),
+            "class_weight": class_weight,
+            "n_train": int(best["n_train"]),
+            "n_val": int(best["n_val"]),
+            "test_size": test_size,
+            "seed": seed,
+            "sweep_results": results_path,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Barrido de ventanas e hiperparámetros en paralelo")
+    ap.add_argument("--windows", nargs="+", default=["5min", "15min", "1h"])
+    ap.add_argument("--C", nargs="+", type=float, default=[0.01, 0.1, 1.0, 10.0], help="Regularización inversa de LogisticRegression")
+    ap.add_argument("--class-weight", nargs="+", default=["none", "balanced"], choices=["none", "balanced"])
+    ap.add_argument("--test-size", type=float, default=0.25)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workers", type=int, default=None, help="Procesos (por defecto: nº de CPUs)")
+    ap.add_argument("--results", default=SWEEP_RESULTS_PATH)
+    ap.add_argument("--no-save", action="store_true", help="Sólo la tabla, sin guardar el mejor modelo")
+    args = ap.parse_args()
+
+    run_sweep(
+        windows=args.windows,
+        Cs=args.C,
+        class_weights=[None if cw == "none" else cw for cw in args.class_weight],
+        test_size=args.test_size,
+        seed=args.seed,
+        workers=args.workers,
+        results_path=args.results,
+        save_best=not args.no_save,
+    )
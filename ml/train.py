@@ -4,6 +4,8 @@
 #  - agrega por ventanas (15min por defecto)
 #  - entrena pipeline: StandardScaler + LogisticRegression
 #  - evalúa (ROC-AUC) y guarda artefactos en artifacts/
+#  - registra una versión nueva (modelo + spec + metadatos) en
+#    artifacts/models/ y la publica para que la API la recargue
 # ------------------------------------------------------------
 
 from __future__ import annotations
@@ -17,21 +19,86 @@ from sklearn.pipeline import Pipeline
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import roc_auc_score, classification_report
 import joblib
+from datetime import datetime, timezone
 
-from ml.features import load_dataframe, window_agg, save_feature_spec
+from ml.features import load_dataframe, window_agg, save_feature_spec, iter_dataframe, window_agg_chunked
+from ml.feature_store import update_feature_store, load_features, rollups_required
+from ml.registry import save_version, publish
 
 ART_DIR = os.getenv("ARTIFACTS", "artifacts")
 MODEL_PATH = os.path.join(ART_DIR, "model.joblib")
 FEATURE_SPEC_PATH = os.path.join(ART_DIR, "feature_spec.json")
+MODEL_REGISTRY = os.getenv("MODEL_REGISTRY", os.path.join(ART_DIR, "models"))
 
-def main(window: str = "15min", test_size: float = 0.25, seed: int = 42):
-    # 1) Cargar histórico completo desde SQLite
-    df = load_dataframe()
-    if df.empty:
-        raise SystemExit("No hay datos en la BD. Ejecuta el generador sintético o ingesta manualmente.")
+# FEATURE_STORE=1: en vez de re-agregar todo el histórico, se actualiza el
+# feature store con las lecturas nuevas y se entrena leyendo de él.
+USE_FEATURE_STORE = os.getenv("FEATURE_STORE", "0").strip().lower() in ("1", "true", "yes", "on")
 
-    # 2) Agregar por ventanas -> X (features) y (labels)
-    X, y, full = window_agg(df, window=window)
+# LOAD_CHUNK_ROWS=N: lee el histórico por chunks de N filas con tipos compactos
+# y agrega ventana a ventana (memoria acotada por N en vez de por la tabla).
+LOAD_CHUNK_ROWS = int(os.getenv("LOAD_CHUNK_ROWS", "0")) or None
+
+def build_pipeline(C: float = 1.0, class_weight: str | None = None) -> Pipeline:
+    """Pipeline baseline: escalar + regresión logística."""
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("clf", LogisticRegression(C=C, class_weight=class_weight, max_iter=1000))
+    ])
+
+def save_artifacts(pipe: Pipeline, metadata: dict) -> str:
+    """
+    Guarda el modelo en ARTIFACTS (model.joblib + feature_spec.json) y
+    registra + publica una versión con `metadata`. Devuelve la versión.
+    """
+    os.makedirs(ART_DIR, exist_ok=True)
+    joblib.dump(pipe, MODEL_PATH)
+    save_feature_spec(FEATURE_SPEC_PATH)
+
+    print(f"✔ Modelo guardado en: {MODEL_PATH}")
+    print(f"✔ Especificación de features en: {FEATURE_SPEC_PATH}")
+
+    version = save_version(pipe, {
+        **metadata,
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+    }, root=MODEL_REGISTRY)
+    publish(MODEL_REGISTRY, version)
+    print(f"✔ Versión {version} publicada en: {MODEL_REGISTRY}")
+    return version
+
+def main(
+    window: str = "15min",
+    test_size: float = 0.25,
+    seed: int = 42,
+    use_store: bool = USE_FEATURE_STORE,
+    chunk_rows: int | None = LOAD_CHUNK_ROWS,
+):
+    # 0) Con retención aplicada (ml.maintenance) el histórico crudo está
+    #    incompleto: las features salen de los rollups de feature_windows.
+    if not use_store and rollups_required():
+        print("ℹ sensor_readings compactado: se entrena desde los rollups (feature store).")
+        use_store = True
+
+    if use_store:
+        # 1-2) Actualización incremental (sólo lecturas nuevas) + lectura del store
+        print(update_feature_store(window=window))
+        try:
+            X, y, full = load_features(window=window)
+        except ValueError:
+            raise SystemExit("No hay datos en la BD. Ejecuta el generador sintético o ingesta manualmente.")
+    elif chunk_rows:
+        # 1-2) Carga por chunks tipados + agregación en streaming
+        try:
+            X, y, full = window_agg_chunked(iter_dataframe(chunk_size=chunk_rows), window=window)
+        except ValueError:
+            raise SystemExit("No hay datos en la BD. Ejecuta el generador sintético o ingesta manualmente.")
+    else:
+        # 1) Cargar histórico completo desde SQLite
+        df = load_dataframe()
+        if df.empty:
+            raise SystemExit("No hay datos en la BD. Ejecuta el generador sintético o ingesta manualmente.")
+
+        # 2) Agregar por ventanas -> X (features) y (labels)
+        X, y, full = window_agg(df, window=window)
 
     # 3) Si todas las etiquetas son iguales, no se puede evaluar AUC
     if y.nunique() < 2:
@@ -43,10 +110,7 @@ def main(window: str = "15min", test_size: float = 0.25, seed: int = 42):
     )
 
     # 5) Pipeline: escalar + regresión logística
-    pipe = Pipeline([
-        ("scaler", StandardScaler()),
-        ("clf", LogisticRegression(max_iter=1000))
-    ])
+    pipe = build_pipeline()
 
     # 6) Entrenar
     pipe.fit(X_train, y_train)
@@ -60,13 +124,15 @@ def main(window: str = "15min", test_size: float = 0.25, seed: int = 42):
     yhat = (p_val >= 0.5).astype(int)
     print(classification_report(y_val, yhat, digits=3))
 
-    # 8) Guardar artefactos
-    os.makedirs(ART_DIR, exist_ok=True)
-    joblib.dump(pipe, MODEL_PATH)
-    save_feature_spec(FEATURE_SPEC_PATH)
-
-    print(f"✔ Modelo guardado en: {MODEL_PATH}")
-    print(f"✔ Especificación de features en: {FEATURE_SPEC_PATH}")
+    # 8) Guardar artefactos + versión en el registro (la API la recarga en caliente)
+    save_artifacts(pipe, {
+        "window": window,
+        "val_auc": float(auc),
+        "n_train": int(len(X_train)),
+        "n_val": int(len(X_val)),
+        "test_size": test_size,
+        "seed": seed,
+    })
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,183 @@
+# ------------------------------------------------------------
+# Entrenamiento out-of-core (incremental):
+#  - actualiza el feature store (sólo lecturas nuevas) y recorre sus
+#    ventanas por chunks en orden temporal (iter_features)
+#  - StandardScaler.partial_fit + SGDClassifier(log_loss).partial_fit:
+#    nunca hay en memoria más de un chunk de ventanas
+#  - holdout temporal: el último tramo (--holdout, fracción del rango
+#    de tiempo) se reserva para validar, en vez de un split aleatorio
+#  - --resume: parte del modelo publicado y lo actualiza sólo con las
+#    ventanas posteriores a su `trained_until`
+#
+# Uso:
+#   python -m ml.train_stream --window 15min
+#   python -m ml.train_stream --window 15min --resume
+# ------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import os
+from typing import Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from ml.features import FEATURE_COLS
+from ml.feature_store import feature_time_range, iter_features, update_feature_store, window_step
+from ml.registry import MODEL_FILE, latest_version, read_metadata, version_dir
+from ml.train import MODEL_REGISTRY, save_artifacts
+
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "100000"))
+CLASSES = np.array([0, 1])
+
+
+def build_stream_pipeline(alpha: float = 1e-4, seed: int = 42) -> Pipeline:
+    """
+    Escalado + regresión logística por SGD (ambos con partial_fit).
+    average=True (ASGD) hace el resultado mucho menos sensible al orden
+    de los chunks y a alpha que el SGD simple.
+    """
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("clf", SGDClassifier(loss="log_loss", alpha=alpha, average=True, random_state=seed)),
+    ])
+
+
+def load_previous(root: str = MODEL_REGISTRY) -> Tuple[Pipeline, dict]:
+    """Modelo publicado + metadatos; debe venir de un entrenamiento en streaming."""
+    version = latest_version(root)
+    if version is None:
+        raise SystemExit("No hay modelo publicado para --resume. Entrena primero sin --resume.")
+    meta = read_metadata(root, version)
+    if not meta.get("streaming"):
+        raise SystemExit(f"La versión {version} no es incremental (sin partial_fit); entrena sin --resume.")
+    pipe = joblib.load(os.path.join(version_dir(root, version), MODEL_FILE))
+    return pipe, meta
+
+
+def _xy(chunk: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+    # X con nombres de columna: el serving llama a predict_proba con un DataFrame.
+    return chunk[FEATURE_COLS].astype(np.float64), chunk["failure"].to_numpy(dtype=np.int8)
+
+
+def main(
+    window: str = "15min",
+    holdout: float = 0.25,
+    resume: bool = False,
+    epochs: int = 1,
+    alpha: float = 1e-4,
+    seed: int = 42,
+    chunk_rows: int = STREAM_CHUNK_ROWS,
+    db_url: Optional[str] = None,
+):
+    step = window_step(window)
+
+    # 1) Feature store al día (coste proporcional a las lecturas nuevas)
+    print(update_feature_store(window=window, db_url=db_url))
+
+    # 2) Punto de partida: modelo nuevo o el publicado (--resume)
+    if resume:
+        pipe, prev = load_previous()
+        if prev.get("window") != window:
+            raise SystemExit(f"El modelo publicado usa window={prev.get('window')!r}, no {window!r}.")
+        start = pd.Timestamp(prev["trained_until"])
+        n_trained = int(prev.get("n_train", 0))
+    else:
+        pipe, prev = build_stream_pipeline(alpha=alpha, seed=seed), {}
+        start = None
+        n_trained = 0
+    scaler, clf = pipe.named_steps["scaler"], pipe.named_steps["clf"]
+
+    # 3) Corte temporal: [start, cutoff) entrena, [cutoff, fin] valida
+    lo, hi = feature_time_range(window=window, db_url=db_url)
+    if lo is None:
+        raise SystemExit("No hay datos en la BD. Ejecuta el generador sintético o ingesta manualmente.")
+    if resume and hi <= pd.Timestamp(prev["data_until"]):
+        raise SystemExit(f"Sin ventanas nuevas desde {prev['data_until']}; nada que actualizar.")
+    # Ventanas antiguas reescritas por lecturas tardías no se re-entrenan.
+    lo = max(lo, start) if start is not None else lo
+    cutoff = (lo + (hi - lo) * (1 - holdout)).floor(step)
+    if cutoff <= lo:
+        cutoff = lo + step
+    train_range = dict(window=window, db_url=db_url, chunk_size=chunk_rows, start=lo.to_pydatetime(), end=cutoff.to_pydatetime())
+
+    # 4) Pasada 1: estadísticos del scaler (en --resume se siguen acumulando)
+    n_new = 0
+    for chunk in iter_features(**train_range):
+        X, _ = _xy(chunk)
+        scaler.partial_fit(X)
+        n_new += len(X)
+    if n_new == 0:
+        raise SystemExit("El tramo de entrenamiento no tiene ventanas; reduce --holdout.")
+
+    # 5) Pasada(s) 2: SGD por chunks, en orden temporal
+    for _ in range(epochs):
+        for chunk in iter_features(**train_range):
+            X, y = _xy(chunk)
+            clf.partial_fit(scaler.transform(X), y, classes=CLASSES)
+
+    # 6) Validación en el holdout temporal (sólo guardamos y, p por ventana)
+    ys, ps = [], []
+    for chunk in iter_features(window=window, db_url=db_url, chunk_size=chunk_rows, start=cutoff.to_pydatetime()):
+        X, y = _xy(chunk)
+        ys.append(y)
+        ps.append(pipe.predict_proba(X)[:, 1].astype(np.float32))
+    y_val = np.concatenate(ys) if ys else np.empty(0, dtype=np.int8)
+    p_val = np.concatenate(ps) if ps else np.empty(0, dtype=np.float32)
+    auc = float(roc_auc_score(y_val, p_val)) if len(np.unique(y_val)) == 2 else None
+    print({
+        "window": window,
+        "train_from": lo.isoformat(),
+        "trained_until": cutoff.isoformat(),
+        "new_windows": n_new,
+        "n_val": int(len(y_val)),
+        "val_auc": None if auc is None else round(auc, 4),
+        "resumed_from": prev.get("version"),
+    })
+    if auc is None:
+        print("⚠ El holdout no tiene las dos clases: val_auc no disponible.")
+
+    # 7) Artefactos + versión (la API la recarga en caliente). El holdout de
+    #    esta versión será entrenamiento de la siguiente con --resume.
+    save_artifacts(pipe, {
+        "window": window,
+        "val_auc": auc,
+        "streaming": True,
+        "estimator": "StandardScaler+SGDClassifier(log_loss)",
+        "alpha": clf.alpha,
+        "epochs": epochs,
+        "holdout": holdout,
+        "trained_until": cutoff.isoformat(),
+        "data_until": hi.isoformat(),
+        "n_train": n_trained + n_new,
+        "n_val": int(len(y_val)),
+        "resumed_from": prev.get("version"),
+    })
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Entrenamiento incremental (partial_fit) sobre el feature store")
+    ap.add_argument("--window", default="15min", help="Ventana de agregación (debe dividir 1 día)")
+    ap.add_argument("--holdout", type=float, default=0.25, help="Fracción final del rango temporal para validar")
+    ap.add_argument("--resume", action="store_true", help="Actualiza el modelo publicado con las ventanas nuevas")
+    ap.add_argument("--epochs", type=int, default=1, help="Pasadas de SGD sobre el tramo de entrenamiento")
+    ap.add_argument("--alpha", type=float, default=1e-4, help="Regularización L2 de SGDClassifier")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--chunk-rows", type=int, default=STREAM_CHUNK_ROWS, help="Ventanas por chunk")
+    args = ap.parse_args()
+
+    main(
+        window=args.window,
+        holdout=args.holdout,
+        resume=args.resume,
+        epochs=args.epochs,
+        alpha=args.alpha,
+        seed=args.seed,
+        chunk_rows=args.chunk_rows,
+    )